@@ -0,0 +1,96 @@
+import os
+from collections import deque
+from statistics import median
+from typing import Deque, Optional
+
+DEFAULT_SMOOTHING = 0.3  # współczynnik EMA dla drobnych zmian (1 = bez wygładzania)
+DEFAULT_DEADBAND = 0.005  # minimalna zmiana w ułamku zakresu pokoju, ok. 1 z 255 poziomów jasności
+NOISE_WINDOW = int(os.getenv('ADC_NOISE_WINDOW', 32))
+NOISE_FACTOR = float(os.getenv('ADC_NOISE_FACTOR', 3))
+
+
+class AdcFilter:
+    """Filtr surowych odczytów pokrętła - dalej idą tylko zmiany widoczne w świetle.
+
+    Odczyt normalizujemy do zakresu pokoju (min_adc..max_adc), więc progi nie zależą od przetwornika.
+    Wartość wygładza EMA z adaptacyjnym współczynnikiem: wahania wokół progu są mocno tłumione, a
+    wyraźny ruch pokrętła przechodzi od razu. Wynik wychodzi dopiero, gdy oddali się od ostatnio
+    wysłanego o próg (histereza) - większy z deadband pokoju i NOISE_FACTOR * poziom szumu.
+    Szum szacujemy z drugich różnic ostatnich odczytów: płynny obrót ich nie zwiększa, drgania tak.
+    """
+
+    def __init__(self, min_adc: int, max_adc: int, smoothing: Optional[float] = None,
+                 deadband: Optional[float] = None):
+        self.value: Optional[float] = None  # wygładzona wartość 0-1
+        self.output: Optional[float] = None  # ostatnio przepuszczona wartość
+        self.prev_sample: Optional[float] = None
+        self.prev_step = 0.0
+        self.jitter: Deque[float] = deque(maxlen=NOISE_WINDOW)
+        self.noise_floor = 0.0
+        self.samples = 0
+        self.emitted = 0
+        self.configure(min_adc, max_adc, smoothing, deadband)
+
+    def configure(self, min_adc: int, max_adc: int, smoothing: Optional[float] = None,
+                  deadband: Optional[float] = None) -> None:
+        """Nowe ustawienia z bazy - stan filtra (wygładzona wartość, szum) zostaje"""
+        self.min_adc = min_adc
+        self.max_adc = max_adc
+        self.smoothing = min(max(DEFAULT_SMOOTHING if smoothing is None else smoothing, 0.01), 1.0)
+        self.deadband = max(DEFAULT_DEADBAND if deadband is None else deadband, 0.0)
+
+    @property
+    def threshold(self) -> float:
+        return max(self.deadband, NOISE_FACTOR * self.noise_floor)
+
+    def normalize(self, adc_value: float) -> float:
+        span = self.max_adc - self.min_adc
+        if span <= 0:
+            return 0.0
+        return min(max((adc_value - self.min_adc) / span, 0.0), 1.0)
+
+    def feed(self, adc_value: float) -> Optional[float]:
+        """Surowy odczyt ADC -> wartość 0-1 do zastosowania albo None, gdy zmiana jest nieistotna"""
+        self.samples += 1
+        sample = self.normalize(adc_value)
+        if self.prev_sample is not None:
+            step = sample - self.prev_sample
+            self.jitter.append(abs(step - self.prev_step) / 2)
+            self.noise_floor = median(self.jitter)
+            self.prev_step = step
+        self.prev_sample = sample
+
+        threshold = self.threshold
+        if self.value is None:
+            self.value = sample
+        else:
+            delta = abs(sample - self.value)
+            # Im dalej ponad próg, tym współczynnik bliższy 1 - przy 2x progu wartość idzie za pokrętłem
+            boost = min(max((delta - threshold) / threshold, 0.0), 1.0) if threshold > 0 else 1.0
+            alpha = self.smoothing + (1 - self.smoothing) * boost
+            self.value += alpha * (sample - self.value)
+            if sample in (0.0, 1.0) and abs(sample - self.value) < threshold:
+                # EMA dochodzi do skrajnych położeń tylko asymptotycznie - pełne zgaszenie/jasność musi być osiągalne
+                self.value = sample
+
+        if self.output is not None:
+            change = abs(self.value - self.output)
+            if change == 0 or (change < threshold and self.value not in (0.0, 1.0)):
+                return None
+        self.output = self.value
+        self.emitted += 1
+        return self.output
+
+    def get_stats(self) -> dict:
+        return {
+            'samples': self.samples,
+            'emitted': self.emitted,
+            'suppressed': self.samples - self.emitted,
+            'pass_ratio': self.emitted / self.samples if self.samples else None,
+            'smoothing': self.smoothing,
+            'deadband': self.deadband,
+            'noise_floor': self.noise_floor,
+            'threshold': self.threshold,
+            'value': self.value,
+            'output': self.output,
+        }
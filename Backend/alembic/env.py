@@ -13,7 +13,7 @@ from sqlalchemy import engine_from_config, pool
 from logging.config import fileConfig
 from db.db_init import Base
 from pathlib import Path
-from db.models import room, house
+from db.models import room, house, scene
 
 
 load_dotenv()
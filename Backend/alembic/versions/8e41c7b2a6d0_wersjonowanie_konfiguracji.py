@@ -0,0 +1,37 @@
+"""Wersjonowanie konfiguracji i adresy szafek w domu
+
+Revision ID: 8e41c7b2a6d0
+Revises: 5d2a8f61c9e3
+Create Date: 2026-10-18 15:20:04.913562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41c7b2a6d0'
+down_revision: Union[str, None] = '5d2a8f61c9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Dotychczas zaszyte w kodzie (CLOSETS_IPS) - dostają je domy, które mają pokoje z szafkami
+LEGACY_CLOSET_URLS = 'http://192.168.100.43,http://192.168.100.54,http://192.168.100.57'
+
+
+def upgrade() -> None:
+    op.add_column('houses', sa.Column('closet_urls', sa.String(length=500), nullable=True))
+    op.add_column('houses', sa.Column('config_version', sa.Integer(), server_default='1', nullable=True))
+    op.add_column('rooms', sa.Column('config_version', sa.Integer(), server_default='1', nullable=True))
+    op.execute(
+        sa.text("UPDATE houses SET closet_urls = :urls WHERE id IN "
+                "(SELECT house_id FROM rooms WHERE type = 'WRGB_BLEXBOX_WITH_CLOSET')").bindparams(urls=LEGACY_CLOSET_URLS)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('rooms', 'config_version')
+    op.drop_column('houses', 'config_version')
+    op.drop_column('houses', 'closet_urls')
@@ -0,0 +1,28 @@
+"""Ustawienia filtra ADC pokoju
+
+Revision ID: c4f19a7e5b21
+Revises: 8e41c7b2a6d0
+Create Date: 2026-10-18 18:42:37.120584
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f19a7e5b21'
+down_revision: Union[str, None] = '8e41c7b2a6d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('rooms', sa.Column('adc_smoothing', sa.Float(), nullable=True))
+    op.add_column('rooms', sa.Column('adc_deadband', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('rooms', 'adc_deadband')
+    op.drop_column('rooms', 'adc_smoothing')
@@ -0,0 +1,114 @@
+"""Mikro-benchmarki kodowania kolorów: obecny Color kontra dawna implementacja.
+
+Uruchomienie (z katalogu Backend):
+    python -m benchmarks.bench_color
+"""
+import colorsys
+import random
+import sys
+import timeit
+
+from color import Color, encode_cct_batch, encode_rgbw_batch
+
+
+class LegacyColor:
+    """Dawna implementacja Color (przed __slots__ i tablicami hex) - punkt odniesienia"""
+
+    def __init__(self, h: float, s: float, v: float, w: float) -> None:
+        self.h = h
+        self.s = s
+        self.v = v
+        self.w = w
+
+    @staticmethod
+    def from_str_blebox(text: str):
+        r = int(text[0:2], 16)
+        g = int(text[2:4], 16)
+        b = int(text[4:6], 16)
+        w = int(text[6:8], 16)
+        ret = LegacyColor(r, g, b, w)
+        ret.from_rgb(r, g, b, w)
+        return ret
+
+    def from_rgb(self, r: int, g: int, b: int, w: int):
+        (h, s, v) = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+        self.h = h
+        self.s = s
+        self.v = v
+        self.w = w / 255
+
+    def to_rgbw(self):
+        (r, g, b) = colorsys.hsv_to_rgb(self.h, self.s, self.v)
+        r = int(255 * r)
+        g = int(255 * g)
+        b = int(255 * b)
+        w = int(255 * self.w * self.v)
+        return r, g, b, w
+
+    def to_cct(self):
+        cw = int(min(1.0, self.h * 2) * self.v * 255)
+        cc = int(min(1.0, abs(2.0 - 2 * self.h)) * self.v * 255)
+        return f'{cc:02x}{cw:02x}{cc:02x}{cw:02x}'
+
+    def __str__(self):
+        (r, g, b, w) = self.to_rgbw()
+        return f'{r:02x}{g:02x}{b:02x}{w:02x}00'
+
+
+def random_values(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    return [(rnd.random(), rnd.choice((0.0, 1.0, rnd.random())), rnd.random(), rnd.random()) for _ in range(n)]
+
+
+def check_identical(values) -> None:
+    for hsvw in values:
+        new, old = Color(*hsvw), LegacyColor(*hsvw)
+        assert str(new) == str(old), hsvw
+        assert new.to_cct() == old.to_cct(), hsvw
+        text = str(old)
+        assert str(Color.from_str_blebox(text)) == str(LegacyColor.from_str_blebox(text)), text
+
+
+def bench(label: str, fn, number: int, batch: int) -> float:
+    """Najlepszy z 5 pomiarów, w mikrosekundach na jeden kolor"""
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    per_color_us = best / number / batch * 1e6
+    print(f'{label:<40} {per_color_us:8.3f} us/kolor')
+    return per_color_us
+
+
+def main() -> int:
+    values = random_values(2000)
+    check_identical(values)
+    print('Wyniki identyczne z dawną implementacją dla', len(values), 'kolorów\n')
+
+    new_colors = [Color(*v) for v in values]
+    old_colors = [LegacyColor(*v) for v in values]
+    payloads = [str(c) for c in old_colors]
+    n = len(values)
+
+    results = {}
+    results['str/legacy'] = bench('str(color) legacy', lambda: [str(c) for c in old_colors], 50, n)
+    results['str/new'] = bench('str(color) nowy', lambda: [str(c) for c in new_colors], 50, n)
+    results['cct/legacy'] = bench('to_cct() legacy', lambda: [c.to_cct() for c in old_colors], 50, n)
+    results['cct/new'] = bench('to_cct() nowy', lambda: [c.to_cct() for c in new_colors], 50, n)
+    results['parse/legacy'] = bench('from_str_blebox legacy', lambda: [LegacyColor.from_str_blebox(p) for p in payloads], 50, n)
+    results['parse/new'] = bench('from_str_blebox nowy', lambda: [Color.from_str_blebox(p) for p in payloads], 50, n)
+
+    # Klatki efektu: ten sam krótki cykl kolorów powtórzony wiele razy
+    frames = [values[i % 8] for i in range(n)]
+    results['frames/legacy'] = bench('klatki efektu legacy', lambda: [str(LegacyColor(*f)) for f in frames], 50, n)
+    results['frames/batch'] = bench('klatki efektu encode_rgbw_batch', lambda: encode_rgbw_batch(frames), 50, n)
+    results['frames/batch_cct'] = bench('klatki efektu encode_cct_batch', lambda: encode_cct_batch(frames), 50, n)
+
+    print('\nPrzyspieszenie (legacy / nowy, na kolor):')
+    for name in ('str', 'cct', 'parse'):
+        print(f'  {name:<8} x{results[name + "/legacy"] / results[name + "/new"]:.2f}')
+    print(f'  {"frames":<8} x{results["frames/legacy"] / results["frames/batch"]:.2f}')
+    print(f'\nRozmiar instancji: legacy {sys.getsizeof(old_colors[0]) + sys.getsizeof(old_colors[0].__dict__)} B, '
+          f'nowy {sys.getsizeof(new_colors[0])} B')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Responsywność pętli zdarzeń przy wolnej bazie danych.
+
+Baza SQLite w katalogu tymczasowym jest sztucznie spowolniona - każde zapytanie SQL czeka
+--query-delay-ms w wątku, który je wykonuje (jak przeciążony MySQL). W tym czasie pętla zdarzeń
+co --tick-ms budzi zegar i mierzy spóźnienie (lag); równolegle leci --concurrency strumieni
+zapytań load_houses i update_rooms.
+
+Tryby:
+    blocking      zapytania synchroniczne prosto w pętli zdarzeń (jak dawny zapis kolorów do bazy)
+    async_db      zapytania przez AsyncDatabase (osobna pula wątków)
+
+Skrypt kończy się kodem 1, jeśli w trybie async_db maksymalny lag przekroczy --max-lag-ms.
+
+Uruchomienie (z katalogu Backend):
+    python -m benchmarks.bench_db_loop
+    python -m benchmarks.bench_db_loop --query-delay-ms 200 --concurrency 16 --json wyniki.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.bench_e2e import percentile
+
+MODES = ('blocking', 'async_db')
+
+
+def seed_database(rooms: int) -> None:
+    from db.db_init import Base, SessionLocal, engine
+    from db.models.house import House
+    from db.models.room import ColorType, Room
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        session.add(House(id=1, name='bench', description='benchmark'))
+        for i in range(rooms):
+            session.add(Room(id=i + 1, name=f'r{i}', url=f'http://127.0.0.1:{20000 + i}', desired_color='ffffff0000',
+                             house_id=1, type=ColorType.WRGB_BLEXBOX, detection_time=60, min_adc=0, max_adc=65535,
+                             closet_brightness=0))
+        session.commit()
+
+
+def slow_down_database(delay: float) -> None:
+    """Każde zapytanie SQL śpi `delay` sekund w wątku, który je wykonuje"""
+    from sqlalchemy import event
+
+    from db.db_init import engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(*args):
+        time.sleep(delay)
+
+
+async def measure_lag(tick: float, stop: asyncio.Event, lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    from db.async_db import AsyncDatabase, _load_houses, _update_rooms
+    from db.db_init import SessionLocal
+
+    database = AsyncDatabase()
+    rows = [{'id': i + 1, 'desired_color': 'ff00000000', 'closet_brightness': i % 256} for i in range(args.rooms)]
+
+    async def query(i: int) -> None:
+        if mode == 'async_db':
+            if i % 2:
+                await database.update_rooms(rows)
+            else:
+                await database.load_houses()
+            return
+        # Dawny sposób - zapytanie w pętli zdarzeń
+        with SessionLocal() as session:
+            if i % 2:
+                _update_rooms(session, rows)
+            else:
+                _load_houses(session)
+        await asyncio.sleep(0)
+
+    async def stream(worker: int) -> int:
+        done = 0
+        while loop.time() < deadline:
+            await query(worker + done)
+            done += 1
+        return done
+
+    loop = asyncio.get_running_loop()
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(args.tick_ms / 1000, stop, lags))
+    started = loop.time()
+    deadline = started + args.duration
+    counts = await asyncio.gather(*(stream(worker) for worker in range(args.concurrency)))
+    elapsed = loop.time() - started
+    stop.set()
+    await ticker
+    database.close()
+
+    ms = [lag * 1000 for lag in lags]
+    return {
+        'mode': mode,
+        'queries': sum(counts),
+        'queries_per_second': sum(counts) / elapsed,
+        'ticks': len(ms),
+        'lag_p50_ms': percentile(ms, 0.50),
+        'lag_p99_ms': percentile(ms, 0.99),
+        'lag_max_ms': max(ms) if ms else None,
+        'database': database.get_stats() if mode == 'async_db' else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=MODES, action='append', help='domyślnie oba')
+    parser.add_argument('--rooms', type=int, default=100)
+    parser.add_argument('--query-delay-ms', type=float, default=100.0, help='sztuczne opóźnienie każdego zapytania SQL')
+    parser.add_argument('--concurrency', type=int, default=8, help='równoległe strumienie zapytań')
+    parser.add_argument('--duration', type=float, default=3.0, help='czas pomiaru na tryb [s]')
+    parser.add_argument('--tick-ms', type=float, default=10.0, help='okres zegara mierzącego lag')
+    parser.add_argument('--max-lag-ms', type=float, default=50.0, help='próg dla trybu async_db')
+    parser.add_argument('--json', help='plik na wyniki (JSON)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_db_')
+    os.environ['DB_CONFIG'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    seed_database(args.rooms)
+    slow_down_database(args.query_delay_ms / 1000)
+
+    results = [asyncio.run(run_mode(mode, args)) for mode in args.mode or MODES]
+    print(f'{"tryb":<10} {"zapytania/s":>12} {"lag p50 ms":>11} {"lag p99 ms":>11} {"lag max ms":>11}')
+    for result in results:
+        print(f'{result["mode"]:<10} {result["queries_per_second"]:12.1f} {result["lag_p50_ms"]:11.1f} '
+              f'{result["lag_p99_ms"]:11.1f} {result["lag_max_ms"]:11.1f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f'\nWyniki zapisane w {args.json}')
+
+    failed = [r for r in results if r['mode'] == 'async_db' and r['lag_max_ms'] > args.max_lag_ms]
+    if failed:
+        print(f'Pętla zdarzeń zablokowana na {failed[0]["lag_max_ms"]:.1f} ms (próg {args.max_lag_ms} ms)', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
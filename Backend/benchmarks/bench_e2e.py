@@ -0,0 +1,397 @@
+"""Benchmark end-to-end: wejście (HTTP /detected, MQTT) -> komenda odebrana przez sterownik.
+
+Aplikacja z main.py startuje w tym samym procesie pod uvicornem, na świeżej bazie SQLite.
+Sterowniki zastępuje simulator - jeden port na urządzenie, tak jak osobne IP w domu
+(pula HTTP ogranicza połączenia per host). MQTT idzie przez MQTTManager.inject(), bez brokera.
+
+Scenariusze:
+    knob_sweep     pokrętło ADC na custom/update/{dom}/{pokój}, `rate` wiadomości/s na pokój
+    knob_noise     pokrętło stoi (co sekundę w innym miejscu), odczyty z szumem gaussowskim `adc_noise`
+    milight_sweep  jasność z pilota milight na milight/{dom}/{pokój}, `rate` wiadomości/s na pokój
+    motion_storm   fale zapytań /detected - w każdej fali każdy pokój dostaje `burst` równoległych zapytań
+
+Opóźnienie wejście->urządzenie liczymy dla każdego wejścia do najbliższej komendy, którą odebrało
+urządzenie pokoju (wartości sklejone przez coalescer czekają na następny zapis).
+
+Uruchomienie (z katalogu Backend):
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --rooms 100 --scenario knob_sweep --json wyniki.json
+
+Każda kombinacja (scenariusz, liczba pokoi) działa w osobnym procesie, bo main.py buduje managery przy imporcie.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+import aiohttp
+
+from simulator import DeviceSimulator, FaultProfile, RecordedCommand
+
+SCENARIOS = ('knob_sweep', 'knob_noise', 'milight_sweep', 'motion_storm')
+HOUSE_NAME = 'bench'
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(values: List[float]) -> dict:
+    """Opóźnienia w milisekundach"""
+    ms = [v * 1000 for v in values]
+    return {
+        'count': len(ms),
+        'p50_ms': percentile(ms, 0.50),
+        'p90_ms': percentile(ms, 0.90),
+        'p99_ms': percentile(ms, 0.99),
+        'max_ms': max(ms) if ms else None,
+    }
+
+
+class LatencyProbe:
+    """Łączy wejścia z komendami odebranymi przez urządzenie danego pokoju"""
+
+    def __init__(self):
+        self.pending: Dict[int, Deque[float]] = defaultdict(deque)
+        self.latencies: List[float] = []
+        self.inputs = 0
+        self.device_writes = 0
+        self.recording = False
+
+    def input(self, device: int, timestamp: float) -> None:
+        self.inputs += 1
+        self.pending[device].append(timestamp)
+
+    def device_write(self, device: int, timestamp: float) -> None:
+        if not self.recording:
+            return
+        self.device_writes += 1
+        pending = self.pending[device]
+        while pending and pending[0] <= timestamp:
+            self.latencies.append(timestamp - pending.popleft())
+
+    def on_command(self, command: RecordedCommand) -> None:
+        # Urządzenia nazywają się r{indeks}, liczymy tylko komendy, które sterownik przyjął
+        if command.outcome == 'ok':
+            self.device_write(int(command.device[1:]), command.timestamp)
+
+    def unanswered(self) -> int:
+        return sum(len(pending) for pending in self.pending.values())
+
+
+def midnight_longitude() -> float:
+    """Długość geograficzna, na której jest teraz północ słoneczna - ruch zawsze zapala światło"""
+    now = datetime.datetime.utcnow()
+    utc_hours = now.hour + now.minute / 60
+    longitude = -utc_hours * 15
+    return longitude + 360 if longitude <= -180 else longitude
+
+
+def seed_database(ports: List[int]) -> None:
+    from db.db_init import Base, SessionLocal, engine
+    from db.models.house import House
+    from db.models.room import ColorType, Room
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.add(House(id=1, name=HOUSE_NAME, description='benchmark', latitude=0.0, longitude=midnight_longitude()))
+    for i, port in enumerate(ports):
+        session.add(Room(id=i + 1, name=f'r{i}', url=f'http://127.0.0.1:{port}', desired_color='ffffff0000',
+                         house_id=1, type=ColorType.WRGB_BLEXBOX, use_motion_detector=True, detection_time=3600,
+                         min_adc=0, max_adc=65535, closet_brightness=0, mqtt_topic=f'milight/{HOUSE_NAME}/r{i}'))
+    session.commit()
+    session.close()
+
+
+async def wait_until_idle(main, timeout: float = 10.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    rooms = list(main.managers_dict[HOUSE_NAME].values())
+    while loop.time() < deadline:
+        queue = main.mqtt.mqtt.queue
+        busy = (queue is not None and queue.qsize() > 0) or any(room.adc_coalescer.in_flight for room in rooms) or \
+            any(main.timer_service.time_left((room, 'paced_color')) is not None for room in rooms)
+        if not busy:
+            break
+        await asyncio.sleep(0.02)
+    await asyncio.sleep(0.1)  # ostatnie zapisy w drodze do urządzeń
+
+
+async def run_sweep(main, probe: LatencyProbe, topic_format: str, payloads: List[bytes], rate: float,
+                    duration: float) -> float:
+    """Wysyła `rate` wiadomości/s do każdego pokoju, zwraca czas wysyłania"""
+    loop = asyncio.get_running_loop()
+    manager = main.mqtt.mqtt
+    rooms = len(main.managers_dict[HOUSE_NAME])
+    topics = [topic_format.format(house=HOUSE_NAME, room=f'r{i}') for i in range(rooms)]
+    ticks = max(int(duration * rate), 1)
+    started = loop.time()
+    for tick in range(ticks):
+        payload = payloads[tick % len(payloads)]
+        for device, topic in enumerate(topics):
+            probe.input(device, time.perf_counter())
+            manager.inject(topic, payload)
+        delay = started + (tick + 1) / rate - loop.time()
+        await asyncio.sleep(max(delay, 0))
+    return loop.time() - started
+
+
+async def knob_sweep(main, probe: LatencyProbe, args) -> dict:
+    # Trójkąt 0 -> 65535 -> 0 z krokiem większym niż rozdzielczość koloru, żeby każda próbka zmieniała stan urządzenia
+    up = list(range(0, 65536, 512))
+    payloads = [json.dumps({'adc': adc}).encode() for adc in up + up[-2:0:-1]]
+    elapsed = await run_sweep(main, probe, 'custom/update/{house}/{room}', payloads, args.rate, args.duration)
+    return {'send_seconds': elapsed}
+
+
+async def knob_noise(main, probe: LatencyProbe, args) -> dict:
+    # Zaszumiony potencjometr - zapisy ponad jeden na położenie pokrętła to zbędny ruch do sterownika
+    rng = random.Random(0)
+    positions = (16384, 32768, 49152)
+    payloads = []
+    for second in range(max(int(args.duration), 1)):
+        position = positions[second % len(positions)]
+        payloads.extend(json.dumps({'adc': min(max(int(rng.gauss(position, args.adc_noise)), 0), 65535)}).encode()
+                        for _ in range(max(int(args.rate), 1)))
+    elapsed = await run_sweep(main, probe, 'custom/update/{house}/{room}', payloads, args.rate, args.duration)
+    return {'send_seconds': elapsed}
+
+
+async def milight_sweep(main, probe: LatencyProbe, args) -> dict:
+    up = list(range(0, 256, 5))
+    payloads = [json.dumps({'brightness': brightness}).encode() for brightness in up + up[-2:0:-1]]
+    elapsed = await run_sweep(main, probe, 'milight/{house}/{room}', payloads, args.rate, args.duration)
+    return {'send_seconds': elapsed}
+
+
+async def motion_storm(main, probe: LatencyProbe, args) -> dict:
+    rooms = list(main.managers_dict[HOUSE_NAME].values())
+    request_latencies: List[float] = []
+    connector = aiohttp.TCPConnector(limit=256)
+    loop = asyncio.get_running_loop()
+    send_seconds = 0.0
+
+    async def detect(session: aiohttp.ClientSession, url: str) -> None:
+        started = time.perf_counter()
+        async with session.get(url) as response:
+            await response.read()
+        request_latencies.append(time.perf_counter() - started)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for _ in range(args.waves):
+            # Gasimy światła poza pomiarem - pierwsza detekcja w fali musi zapalić światło
+            probe.recording = False
+            await asyncio.gather(*(room.set_light(False) for room in rooms))
+            probe.recording = True
+
+            started = loop.time()
+            requests = []
+            for device in range(len(rooms)):
+                probe.input(device, time.perf_counter())
+                url = f'http://127.0.0.1:{args.app_port}/house/{HOUSE_NAME}/room/r{device}/detected'
+                requests.extend(detect(session, url) for _ in range(args.burst))
+            await asyncio.gather(*requests)
+            send_seconds += loop.time() - started
+            # /detected odpowiada od razu - przed kolejną falą czekamy, aż włączenie światła w tle dojdzie do urządzeń
+            await asyncio.gather(*(room.motion_task for room in rooms if room.motion_task is not None))
+    return {'send_seconds': send_seconds, 'requests': len(request_latencies),
+            'request_latency': latency_summary(request_latencies),
+            'motion_suppressed': sum(room.motion_suppressed for room in rooms)}
+
+
+def measure_manager_memory(main) -> dict:
+    """Pamięć jednego LedRoomManager (bez obiektu Room z ORM) - budujemy kopie managerów pod tracemalloc"""
+    from color import Color
+    from led_room_manager import LedRoomManager
+
+    rooms = [manager.room for manager in main.managers_dict[HOUSE_NAME].values()]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = [LedRoomManager(HOUSE_NAME, str(room.url), main.sunrise_api, Color.from_str_blebox(str(room.desired_color)),
+                             int(room.detection_time), int(room.max_adc), int(room.min_adc), room, main.http_client,
+                             main.timer_service, main.effect_engine)
+              for room in rooms]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copies
+    return {'bytes_per_manager': allocated // max(len(rooms), 1)}
+
+
+async def run_worker(args) -> dict:
+    import uvicorn
+
+    probe = LatencyProbe()
+    simulator = DeviceSimulator()
+    for i in range(args.rooms):
+        faults = FaultProfile(args.device_latency_ms, args.device_jitter_ms, args.device_drop_rate,
+                              max_rate=args.device_max_rate, seed=i)
+        simulator.add_device(f'r{i}', 'blebox', faults)
+    simulator.listeners.append(probe.on_command)
+    await simulator.start()
+    seed_database([simulator.device_ports[f'r{i}'] for i in range(args.rooms)])
+
+    import main
+
+    config = uvicorn.Config(main.app, host='127.0.0.1', port=args.app_port, log_level='warning', access_log=False)
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    probe.recording = True
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    details = await SCENARIO_RUNNERS[args.scenario](main, probe, args)
+    await wait_until_idle(main)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    rooms = main.managers_dict[HOUSE_NAME].values()
+    result = {
+        'scenario': args.scenario,
+        'rooms': args.rooms,
+        'inputs': probe.inputs,
+        'device_writes': probe.device_writes,
+        'unanswered_inputs': probe.unanswered(),
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'inputs_per_second': probe.inputs / wall,
+        'device_writes_per_second': probe.device_writes / wall,
+        'input_to_device': latency_summary(probe.latencies),
+        'adc_coalesced': sum(room.adc_coalescer.coalesced for room in rooms),
+        'adc_filtered': sum(room.adc_filter.samples - room.adc_filter.emitted for room in rooms),
+        'device_writes_skipped': main.http_client.state_cache.hits,
+        'mqtt': {key: value for key, value in main.mqtt.get_stats().items() if key in ('received', 'dropped', 'lag_avg_ms', 'lag_max_ms')},
+        'device_outcomes': {outcome: sum(device.get_stats()['outcomes'].get(outcome, 0)
+                                         for device in simulator.devices.values())
+                            for outcome in ('ok', 'dropped', 'timeout', 'rejected')},
+        'memory': measure_manager_memory(main),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    result.update(details)
+
+    server.should_exit = True
+    await server_task
+    await simulator.stop()
+    return result
+
+
+SCENARIO_RUNNERS = {
+    'knob_sweep': knob_sweep,
+    'knob_noise': knob_noise,
+    'milight_sweep': milight_sweep,
+    'motion_storm': motion_storm,
+}
+
+
+def worker_main(args) -> int:
+    # Każdy pokój to port urządzenia, połączenie klienta i serwera - przy 1000 pokoi domyślny limit nie wystarcza
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_CONFIG'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        os.environ['MQTT_HOST'] = ''  # bez brokera, wiadomości przez inject()
+        os.environ.setdefault('STATE_FLUSH_INTERVAL', '3600')
+        os.environ['STATE_SNAPSHOT_PATH'] = os.path.join(tmp, 'state_snapshot.json')
+        out = sys.stdout
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = asyncio.run(run_worker(args))
+        out.write(json.dumps(result) + '\n')
+    return 0
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_ms(value: Optional[float]) -> str:
+    return f'{value:8.1f}' if value is not None else '       -'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='domyślnie wszystkie')
+    parser.add_argument('--rooms', type=int, action='append', help='domyślnie 10, 100 i 1000')
+    parser.add_argument('--duration', type=float, default=5.0, help='czas wysyłania w sweepach [s]')
+    parser.add_argument('--rate', type=float, default=20.0, help='wiadomości/s na pokój w sweepach')
+    parser.add_argument('--adc-noise', type=float, default=300.0, help='odchylenie szumu ADC w knob_noise')
+    parser.add_argument('--waves', type=int, default=5, help='liczba fal w motion_storm')
+    parser.add_argument('--burst', type=int, default=5, help='zapytań /detected na pokój w fali')
+    parser.add_argument('--device-latency-ms', type=float, default=0.0, help='czas odpowiedzi sterownika')
+    parser.add_argument('--device-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--device-drop-rate', type=float, default=0.0)
+    parser.add_argument('--device-max-rate', type=float, help='limit zapytań/s na sterownik (ESP8266)')
+    parser.add_argument('--app-port', type=int, default=18765)
+    parser.add_argument('--json', help='plik na wyniki (JSON)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.scenario = args.scenario[0]
+        args.rooms = args.rooms[0]
+        return worker_main(args)
+
+    common = ['--duration', str(args.duration), '--rate', str(args.rate), '--adc-noise', str(args.adc_noise),
+              '--waves', str(args.waves),
+              '--burst', str(args.burst), '--device-latency-ms', str(args.device_latency_ms),
+              '--device-jitter-ms', str(args.device_jitter_ms), '--device-drop-rate', str(args.device_drop_rate),
+              '--app-port', str(args.app_port)]
+    if args.device_max_rate:
+        common += ['--device-max-rate', str(args.device_max_rate)]
+    results = []
+    print(f'{"scenariusz":<14} {"pokoje":>6} {"wejścia/s":>10} {"zapisy/s":>9} {"p50 ms":>8} {"p99 ms":>8} '
+          f'{"bez odp.":>8} {"B/manager":>10}')
+    for scenario in args.scenario or SCENARIOS:
+        for rooms in args.rooms or (10, 100, 1000):
+            command = [sys.executable, '-m', 'benchmarks.bench_e2e', '--worker', '--scenario', scenario,
+                       '--rooms', str(rooms)] + common
+            completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f'{scenario:<14} {rooms:>6} BŁĄD\n{completed.stderr}', file=sys.stderr)
+                results.append({'scenario': scenario, 'rooms': rooms, 'error': completed.stderr[-2000:]})
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            latency = result['input_to_device']
+            print(f'{scenario:<14} {rooms:>6} {result["inputs_per_second"]:10.0f} {result["device_writes_per_second"]:9.0f} '
+                  f'{format_ms(latency["p50_ms"])} {format_ms(latency["p99_ms"])} {result["unanswered_inputs"]:8d} '
+                  f'{result["memory"]["bytes_per_manager"]:10d}')
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('json', 'worker')},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nWyniki zapisane w {args.json}')
+    return 0 if all('error' not in result for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
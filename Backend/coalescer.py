@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LatestWinsCoalescer:
+    """Przepuszcza do handlera tylko najnowsze wartości, gdy poprzedni zapis do urządzenia jeszcze trwa.
+
+    Wartości oczekujące są trzymane per klucz - nowsza wartość z tym samym kluczem zastępuje starszą,
+    różne klucze (np. jasność i barwa z jednej wiadomości milight) wykonują się po kolei.
+    Oczekująca wartość wykonuje się z kontekstem (contextvars) swojego zgłoszenia, nie pierwszego - w osobnym
+    tasku utworzonym w zapisanym kontekście, więc kontekst taska wołającego (np. workera MQTT) się nie zmienia.
+    """
+
+    def __init__(self, handler: Callable[..., Awaitable[None]]):
+        self.handler = handler
+        self.pending: Dict[Hashable, Tuple[Tuple[Any, ...], contextvars.Context]] = {}
+        self.in_flight = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.executed = 0
+
+    async def submit(self, key: Hashable, *args: Any) -> None:
+        self.submitted += 1
+        if self.in_flight:
+            if key in self.pending:
+                # Starsza wartość nie zdążyła zostać wysłana - zastępujemy ją nowszą
+                del self.pending[key]
+                self.coalesced += 1
+            self.pending[key] = (args, contextvars.copy_context())
+            return
+
+        self.in_flight = True
+        context: Optional[contextvars.Context] = None
+        try:
+            while True:
+                self.executed += 1
+                try:
+                    if context is None:
+                        await self.handler(*args)
+                    else:
+                        # create_task kopiuje bieżący kontekst - wewnątrz context.run jest nim kontekst zgłoszenia
+                        await context.run(asyncio.create_task, self.handler(*args))
+                except Exception as e:
+                    print(f"Error in coalesced handler: {e}")
+                if not self.pending:
+                    break
+                key = next(iter(self.pending))
+                args, context = self.pending.pop(key)
+        finally:
+            self.in_flight = False
+
+    def get_stats(self) -> dict:
+        return {
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'executed': self.executed,
+            'pending': len(self.pending),
+            'in_flight': self.in_flight,
+        }
@@ -0,0 +1,133 @@
+import colorsys
+from typing import Dict, Iterable, List, Tuple
+
+# Zakodowany hex dla każdej skwantowanej wartości kanału 0-255
+_HEX = tuple(f'{i:02x}' for i in range(256))
+
+HSVW = Tuple[float, float, float, float]
+
+
+def _hex(x: int) -> str:
+    # Poza zakresem 0-255 (np. v > 1) zachowujemy się jak dawny f'{x:02x}'
+    return _HEX[x] if 0 <= x < 256 else f'{x:02x}'
+
+
+def _hsv_to_rgb(h: float, s: float, v: float) -> Tuple[float, float, float]:
+    # Kopia colorsys.hsv_to_rgb bez narzutu wywołania modułu - wynik musi być identyczny bit w bit
+    if s == 0.0:
+        return v, v, v
+    i = int(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    if i == 0:
+        return v, t, p
+    if i == 1:
+        return q, v, p
+    if i == 2:
+        return p, v, t
+    if i == 3:
+        return p, q, v
+    if i == 4:
+        return t, p, v
+    return v, p, q
+
+
+def encode_rgbw(h: float, s: float, v: float, w: float) -> str:
+    """Payload BleBox RGBW (rrggbbww00)"""
+    r, g, b = _hsv_to_rgb(h, s, v)
+    r = int(255 * r)
+    g = int(255 * g)
+    b = int(255 * b)
+    w = int(255 * w * v)
+    if (r | g | b | w) >> 8 == 0:  # wszystkie kanały w 0-255 - szybka ścieżka przez tablicę
+        return _HEX[r] + _HEX[g] + _HEX[b] + _HEX[w] + '00'
+    return _hex(r) + _hex(g) + _hex(b) + _hex(w) + '00'
+
+
+def encode_cct(h: float, s: float, v: float, w: float) -> str:
+    """Payload BleBox CCT - h to proporcja biały/żółty, v to jasność"""
+    cw = int(min(1.0, h * 2) * v * 255)
+    cc = int(min(1.0, abs(2.0 - 2 * h)) * v * 255)
+    if (cw | cc) >> 8 == 0:
+        pair = _HEX[cc] + _HEX[cw]
+    else:
+        pair = _hex(cc) + _hex(cw)
+    return pair + pair
+
+
+def _encode_batch(values: Iterable[HSVW], encoder) -> List[str]:
+    # Sceny i klatki efektów często powtarzają kolory - każdy unikalny kolor kodujemy raz
+    memo: Dict[HSVW, str] = {}
+    result = []
+    append = result.append
+    for hsvw in values:
+        payload = memo.get(hsvw)
+        if payload is None:
+            payload = memo[hsvw] = encoder(*hsvw)
+        append(payload)
+    return result
+
+
+def encode_rgbw_batch(values: Iterable[HSVW]) -> List[str]:
+    """Koduje wiele wartości (h, s, v, w) do payloadów BleBox RGBW jednym wywołaniem"""
+    return _encode_batch(values, encode_rgbw)
+
+
+def encode_cct_batch(values: Iterable[HSVW]) -> List[str]:
+    """Koduje wiele wartości (h, s, v, w) do payloadów BleBox CCT jednym wywołaniem"""
+    return _encode_batch(values, encode_cct)
+
+
+class Color:
+    # w przypadku CCT (v - janosc, h - stopien bialo-zolty)
+    __slots__ = ('h', 's', 'v', 'w')
+
+    def __init__(self, h: float, s: float, v: float, w: float) -> None:
+        self.h = h
+        self.s = s
+        self.v = v
+        self.w = w
+
+    @staticmethod
+    def from_str_blebox(text: str):
+        r, g, b, w = bytes.fromhex(text[0:8])
+        ret = Color(r, g, b, w)
+        ret.from_rgb(r, g, b, w)
+        return ret
+
+    def from_rgb(self, r: int, g: int, b: int, w: int):
+        (h, s, v) = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+        self.h = h
+        self.s = s
+        self.v = v
+        self.w = w / 255
+
+    def copy(self) -> 'Color':
+        return Color(self.h, self.s, self.v, self.w)
+
+    def as_tuple(self) -> HSVW:
+        return self.h, self.s, self.v, self.w
+
+    def to_rgbw(self):
+        (r, g, b) = _hsv_to_rgb(self.h, self.s, self.v)
+        r = int(255 * r)
+        g = int(255 * g)
+        b = int(255 * b)
+        w = int(255 * self.w * self.v)
+        return r, g, b, w
+
+    def to_cct(self):
+        return encode_cct(self.h, self.s, self.v, self.w)
+
+    def __str__(self):
+        return encode_rgbw(self.h, self.s, self.v, self.w)
+
+
+# 0000000000  - none
+# ff00000000  - red
+# 00ff000000  - green
+# 0000ff0000  - blue
+# 000000ff00  - white
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from db.db_init import Base, SessionLocal
+from db.models.house import House
+from db.models.room import Room
+from db.models.scene import Scene
+from metrics import DB_QUERY_FAILURES, DB_QUERY_SECONDS, DB_QUERY_WAIT_SECONDS
+
+T = TypeVar('T')
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': self.total_ms / self.count if self.count else 0.0,
+            'max_ms': self.max_ms,
+            'last_ms': self.last_ms,
+            'wait_max_ms': self.wait_max_ms,
+        }
+
+
+class AsyncDatabase:
+    """Dostęp do bazy z kodu async bez blokowania pętli zdarzeń.
+
+    mysql-connector jest synchroniczny, więc każde zapytanie wykonuje się w osobnej, ograniczonej puli
+    DB_THREADS wątków, każde we własnej sesji. Wolna baza zajmuje tylko te wątki - nie domyślny
+    executor asyncio (zapis migawki) ani tym bardziej pętlę obsługującą MQTT i sterowniki. Liczba
+    wątków nie przekracza puli połączeń silnika, więc wątek nie czeka dodatkowo na połączenie.
+    Dla każdego zapytania mierzymy czas oczekiwania na wątek i czas wykonania.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.threads = int(os.getenv('DB_THREADS', 4))
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.queries: Dict[str, QueryStats] = {}
+        self.in_flight = 0
+        self.schema_ready = False
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='db')
+        return self.executor
+
+    async def run(self, name: str, query: Callable[[Session], T]) -> T:
+        """Wykonuje query(session) w wątku puli bazy; name grupuje statystyki i metryki"""
+        stats = self.queries.setdefault(name, QueryStats())
+        submitted = time.monotonic()
+        timing = {}
+
+        def call() -> T:
+            timing['started'] = time.monotonic()
+            with self.session_factory() as session:
+                return query(session)
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        except Exception:
+            stats.errors += 1
+            DB_QUERY_FAILURES.inc(name)
+            raise
+        finally:
+            self.in_flight -= 1
+            finished = time.monotonic()
+            started = timing.get('started', finished)
+            elapsed = finished - started
+            stats.count += 1
+            stats.total_ms += elapsed * 1000
+            stats.last_ms = elapsed * 1000
+            stats.max_ms = max(stats.max_ms, elapsed * 1000)
+            stats.wait_max_ms = max(stats.wait_max_ms, (started - submitted) * 1000)
+            DB_QUERY_SECONDS.observe(elapsed, name)
+            DB_QUERY_WAIT_SECONDS.observe(started - submitted, name)
+
+    async def _ensure_schema(self) -> None:
+        # Sprawdzenie schematu to kilka zapytań - wystarczy raz na proces
+        if not self.schema_ready:
+            await self.run('create_schema', _create_schema)
+            self.schema_ready = True
+
+    async def load_houses(self) -> List[House]:
+        """Domy razem z pokojami (JOIN) i scenami"""
+        await self._ensure_schema()
+        return await self.run('load_houses', _load_houses)
+
+    async def config_versions(self) -> Tuple:
+        """Odcisk konfiguracji: (id, config_version) domów, pokoi i scen - tanie zapytanie dla watchera"""
+        await self._ensure_schema()
+        return await self.run('config_versions', _config_versions)
+
+    async def update_rooms(self, rows: List[dict]) -> None:
+        """Bulk UPDATE pokoi po kluczu głównym - jedno executemany w jednej transakcji"""
+        await self.run('update_rooms', lambda session: _update_rooms(session, rows))
+
+    async def update_rooms_each(self, rows: List[dict]) -> Tuple[List[int], List[int]]:
+        """UPDATE pokoi wiersz po wierszu, każdy w osobnej transakcji; zwraca (id usuniętych pokoi, id z błędem)"""
+        return await self.run('update_rooms_each', lambda session: _update_rooms_each(session, rows))
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_stats(self) -> dict:
+        return {
+            'threads': self.threads,
+            'in_flight': self.in_flight,
+            'queries': {name: stats.get_stats() for name, stats in self.queries.items()},
+        }
+
+
+def _create_schema(session: Session) -> None:
+    Base.metadata.create_all(bind=session.get_bind())
+
+
+def _load_houses(session: Session) -> List[House]:
+    query = select(House).options(joinedload(House.rooms), selectinload(House.scenes).selectinload(Scene.rooms))
+    return list(session.execute(query).unique().scalars())
+
+
+def _config_versions(session: Session) -> Tuple:
+    houses = session.execute(select(House.id, House.config_version).order_by(House.id)).all()
+    rooms = session.execute(select(Room.id, Room.config_version).order_by(Room.id)).all()
+    scenes = session.execute(select(Scene.id).order_by(Scene.id)).scalars().all()
+    return tuple(map(tuple, houses)), tuple(map(tuple, rooms)), tuple(scenes)
+
+
+def _update_rooms(session: Session, rows: List[dict]) -> None:
+    session.execute(update(Room), rows)
+    session.commit()
+
+
+def _update_rooms_each(session: Session, rows: List[dict]) -> Tuple[List[int], List[int]]:
+    ids = [row['id'] for row in rows]
+    existing = set(session.execute(select(Room.id).where(Room.id.in_(ids))).scalars())
+    missing, failed = [], []
+    for row in rows:
+        if row['id'] not in existing:
+            missing.append(row['id'])
+            continue
+        values = {key: value for key, value in row.items() if key != 'id'}
+        try:
+            session.execute(update(Room).where(Room.id == row['id']).values(**values))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Błąd podczas zapisywania stanu pokoju {row['id']}: {e}")
+            failed.append(row['id'])
+    return missing, failed
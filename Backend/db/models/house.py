@@ -1,10 +1,12 @@
 from typing import List
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship, Mapped
 
 from db.db_init import Base
+from db.models.versioning import bump_config_version
 # from db.models.room import Room
+from db.models.scene import Scene  # rejestruje model przed konfiguracją relacji scenes
 
 
 class House(Base):
@@ -13,5 +15,13 @@ class House(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(50), index=True)
     description = Column(String(200))
+    latitude = Column(Float, nullable=True)  # brak współrzędnych = domyślna lokalizacja
+    longitude = Column(Float, nullable=True)
+    closet_urls = Column(String(500), nullable=True)  # adresy sterowników szafek (WLED), po przecinku
+    config_version = Column(Integer, default=1, server_default='1')
 
-    rooms: Mapped[List['Room']] = relationship("Room", back_populates="house")
\ No newline at end of file
+    rooms: Mapped[List['Room']] = relationship("Room", back_populates="house")
+    scenes: Mapped[List['Scene']] = relationship("Scene", back_populates="house")
+
+
+bump_config_version(House)
@@ -1,9 +1,10 @@
 import enum
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from db.db_init import Base
+from db.models.versioning import bump_config_version
 from sqlalchemy import Integer, Enum
 
 class ColorType(enum.Enum):
@@ -23,9 +24,16 @@ class Room(Base):
     detection_time = Column(Integer, default=15*60)  # in seconds
     min_adc = Column(Integer, default=0)
     max_adc = Column(Integer, default=65535)
+    adc_smoothing = Column(Float, nullable=True)  # współczynnik EMA pokrętła, brak = domyślny filtra
+    adc_deadband = Column(Float, nullable=True)  # minimalna zmiana jako ułamek zakresu min_adc..max_adc
     closet_brightness = Column(Integer, default=0)
     type = Column(Enum(ColorType), default=ColorType.WRGB_BLEXBOX)
     use_motion_detector = Column(Boolean, default=False)
     mqtt_topic = Column(String(100), default=False)
+    config_version = Column(Integer, default=1, server_default='1')
     house = relationship("House", back_populates="rooms")
     house_id = Column(Integer, ForeignKey("houses.id"))
+
+
+# desired_color i closet_brightness to bieżący stan pokoju zapisywany przez aplikację, nie konfiguracja
+bump_config_version(Room, ('desired_color', 'closet_brightness'))
@@ -0,0 +1,30 @@
+from typing import List
+
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship, Mapped
+
+from db.db_init import Base
+
+
+class Scene(Base):
+    __tablename__ = "scenes"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), index=True)
+    fade_ms = Column(Integer, default=300)
+    house = relationship("House", back_populates="scenes")
+    house_id = Column(Integer, ForeignKey("houses.id"))
+
+    rooms: Mapped[List['SceneRoom']] = relationship("SceneRoom", back_populates="scene", cascade="all, delete-orphan")
+
+
+class SceneRoom(Base):
+    __tablename__ = "scene_rooms"
+
+    id = Column(Integer, primary_key=True)
+    scene = relationship("Scene", back_populates="rooms")
+    scene_id = Column(Integer, ForeignKey("scenes.id"))
+    room_id = Column(Integer, ForeignKey("rooms.id"))
+    is_on = Column(Boolean, default=True)
+    desired_color = Column(String(50), nullable=True)  # brak = pokój zostaje przy swoim kolorze
+    closet_brightness = Column(Integer, nullable=True)  # 0-255, brak = bez zmiany
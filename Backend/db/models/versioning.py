@@ -0,0 +1,19 @@
+from typing import Iterable
+
+from sqlalchemy import event, inspect
+
+
+def bump_config_version(model, state_columns: Iterable[str] = ()) -> None:
+    """Każda zmiana konfiguracji przez ORM podbija config_version - po niej watcher przeładowuje konfigurację.
+
+    Kolumny stanu (zapisywane przez aplikację, np. bieżący kolor) nie są konfiguracją i wersji nie zmieniają.
+    Zmiany robione ręcznie w SQL muszą podbić config_version same (albo wywołać POST /config/reload).
+    """
+    ignored = set(state_columns) | {'config_version'}
+
+    @event.listens_for(model, 'before_update')
+    def before_update(mapper, connection, target):
+        state = inspect(target)
+        if any(state.attrs[column.key].history.has_changes() for column in mapper.column_attrs
+               if column.key not in ignored):
+            target.config_version = (target.config_version or 0) + 1
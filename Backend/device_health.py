@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+# Pierwsze segmenty ścieżek API sterowników: BleBox /s/..., /api/..., WLED /json/...
+DEVICE_API_ROOTS = ('s', 'api', 'json')
+
+
+def device_key(url: str) -> str:
+    """Urządzenie to schemat + host + port + prefiks ścieżki przed API sterownika.
+
+    Wszystkie zapytania do sterownika dzielą jego stan zdrowia. Prefiks rozróżnia urządzenia za jednym
+    host:port (np. symulator albo proxy: http://host:port/{nazwa}/s/...).
+    """
+    parts = urlsplit(url)
+    prefix = []
+    for segment in filter(None, parts.path.split('/')):
+        if segment in DEVICE_API_ROOTS:
+            break
+        prefix.append(segment)
+    return f"{parts.scheme}://{parts.netloc}{''.join('/' + segment for segment in prefix)}"
+
+
+class DeviceUnavailableError(Exception):
+    """Obwód urządzenia jest otwarty - zapytanie odrzucone bez łączenia się ze sterownikiem"""
+
+    def __init__(self, device: str):
+        super().__init__(f"Device {device} is unavailable (circuit open)")
+        self.device = device
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+
+class DeviceHealth:
+    def __init__(self, device: str):
+        self.device = device
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self.probes = 0
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self.next_probe_at: Optional[float] = None
+        self.probe_task: Optional[asyncio.Task] = None
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'state': self.state.value,
+            'consecutive_failures': self.consecutive_failures,
+            'failures': self.failures,
+            'successes': self.successes,
+            'rejected': self.rejected,
+            'probes': self.probes,
+            'last_error': self.last_error,
+            'open_seconds': now - self.opened_at if self.opened_at is not None else None,
+            'next_probe_in': max(self.next_probe_at - now, 0.0) if self.next_probe_at is not None else None,
+        }
+
+
+class DeviceHealthRegistry:
+    """Circuit breaker per sterownik.
+
+    Po DEVICE_FAILURE_THRESHOLD kolejnych błędach obwód się otwiera i zapytania do urządzenia od razu
+    kończą się DeviceUnavailableError zamiast czekać na timeout. W tle sprawdzamy urządzenie z wykładniczo
+    rosnącym odstępem (DEVICE_PROBE_INITIAL .. DEVICE_PROBE_MAX sekund); gdy odpowie, obwód się zamyka,
+    a słuchacze recovery_listeners dostają adres urządzenia (np. żeby wysłać mu bieżący stan pokoju).
+    """
+
+    def __init__(self, probe: Callable[[str], Awaitable[None]]):
+        self.probe = probe
+        self.failure_threshold = int(os.getenv('DEVICE_FAILURE_THRESHOLD', 3))
+        self.probe_initial = float(os.getenv('DEVICE_PROBE_INITIAL', 1))
+        self.probe_max = float(os.getenv('DEVICE_PROBE_MAX', 60))
+        self.devices: Dict[str, DeviceHealth] = {}
+        self.recovery_listeners: List[Callable[[str], None]] = []
+
+    def get(self, device: str) -> DeviceHealth:
+        health = self.devices.get(device)
+        if health is None:
+            health = self.devices[device] = DeviceHealth(device)
+        return health
+
+    def allow(self, device: str) -> bool:
+        health = self.get(device)
+        if health.state is CircuitState.OPEN:
+            health.rejected += 1
+            return False
+        return True
+
+    def record_success(self, device: str) -> None:
+        health = self.get(device)
+        health.successes += 1
+        health.consecutive_failures = 0
+
+    def record_failure(self, device: str, error: Exception) -> None:
+        health = self.get(device)
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = f'{type(error).__name__}: {error}'
+        if health.state is CircuitState.CLOSED and health.consecutive_failures >= self.failure_threshold:
+            self._open(health)
+
+    def _open(self, health: DeviceHealth) -> None:
+        print(f"Device {health.device} unreachable after {health.consecutive_failures} failures, circuit open")
+        health.state = CircuitState.OPEN
+        health.opened_at = time.monotonic()
+        health.probe_task = asyncio.get_running_loop().create_task(self._probe_loop(health))
+
+    def _close(self, health: DeviceHealth) -> None:
+        print(f"Device {health.device} is back after {time.monotonic() - health.opened_at:.1f}s, circuit closed")
+        health.state = CircuitState.CLOSED
+        health.consecutive_failures = 0
+        health.opened_at = None
+        health.next_probe_at = None
+        health.probe_task = None
+        for listener in self.recovery_listeners:
+            try:
+                listener(health.device)
+            except Exception as e:
+                print(f"Error in device recovery listener: {e}")
+
+    async def _probe_loop(self, health: DeviceHealth) -> None:
+        delay = self.probe_initial
+        while True:
+            health.next_probe_at = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            health.probes += 1
+            try:
+                await self.probe(health.device)
+            except Exception as e:
+                health.last_error = f'{type(e).__name__}: {e}'
+                delay = min(delay * 2, self.probe_max)
+                continue
+            self._close(health)
+            return
+
+    def close(self) -> None:
+        for health in self.devices.values():
+            if health.probe_task is not None:
+                health.probe_task.cancel()
+
+    def get_stats(self) -> dict:
+        return {device: health.get_stats() for device, health in self.devices.items()}
@@ -0,0 +1,66 @@
+import os
+import time
+from typing import Dict, Tuple
+
+
+class DeviceStateCache:
+    """Pamięta ostatni potwierdzony payload wysłany na każdy adres urządzenia.
+
+    Wpis jest ważny przez `ttl` sekund - po tym czasie wysyłamy ponownie nawet identyczny stan,
+    żeby sterownik, który się zrestartował, wrócił do właściwego koloru.
+
+    Zapis zaczyna się od begin(), które unieważnia wpis - dopóki zapis trwa, stan urządzenia jest
+    nieznany i kolejny zapis (nawet poprzedniego payloadu) musi pójść. Potwierdzenie confirm() trafia
+    do cache tylko, jeśli w międzyczasie nie zaczął się nowszy zapis na ten adres.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = float(os.getenv('DEVICE_STATE_CACHE_TTL', 60)) if ttl is None else ttl
+        self.entries: Dict[str, Tuple[str, float]] = {}
+        self.pending: Dict[str, int] = {}  # adres -> numer najnowszego trwającego zapisu
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def is_current(self, url: str, payload: str) -> bool:
+        entry = self.entries.get(url)
+        if entry is None or entry[0] != payload or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, url: str, payload: str) -> None:
+        """Stan odczytany z urządzenia - pomijany, gdy trwa zapis, bo odczyt mógł go wyprzedzić"""
+        if url not in self.pending:
+            self.entries[url] = (payload, time.monotonic())
+
+    def begin(self, url: str) -> int:
+        """Początek zapisu na adres - zwraca numer zapisu dla confirm()/fail()"""
+        self.writes += 1
+        self.pending[url] = self.writes
+        self.entries.pop(url, None)
+        return self.writes
+
+    def confirm(self, url: str, payload: str, write_id: int) -> None:
+        # Potwierdzenie starszego zapisu nie nadpisuje stanu, o który poproszono później
+        if self.pending.get(url) == write_id:
+            del self.pending[url]
+            self.entries[url] = (payload, time.monotonic())
+
+    def fail(self, url: str, write_id: int) -> None:
+        if self.pending.get(url) == write_id:
+            del self.pending[url]
+        self.invalidate(url)
+
+    def invalidate(self, url: str) -> None:
+        # Po błędzie nie wiemy co pokazuje urządzenie - następny zapis musi pójść
+        self.entries.pop(url, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.pending.clear()
+
+    def get_stats(self) -> dict:
+        return {'entries': len(self.entries), 'in_flight': len(self.pending), 'skipped_writes': self.hits,
+                'sent_writes': self.misses}
@@ -0,0 +1,164 @@
+import asyncio
+import math
+from typing import Callable, Dict, List, Optional, Sequence, TYPE_CHECKING
+
+from color import HSVW, encode_cct_batch, encode_rgbw_batch
+from db.models.room import ColorType
+from metrics import MQTT_RECEIVED_AT
+
+if TYPE_CHECKING:
+    from led_room_manager import LedRoomManager
+
+OFF: HSVW = (0, 0, 0, 0)
+
+
+class Effect:
+    """Deklaratywny efekt świetlny: sekwencja klatek o stałym czasie trwania.
+
+    Payloady klatek są liczone raz przy tworzeniu efektu (osobno dla RGBW i CCT),
+    silnik tylko wybiera klatkę według zegara i wysyła gotowy tekst.
+    """
+
+    def __init__(self, name: str, frames: Sequence[HSVW], frame_ms: int, repeat: int = 0):
+        self.name = name
+        self.frame_ms = frame_ms
+        self.repeat = repeat  # 0 = do zatrzymania
+        self.rgbw = encode_rgbw_batch(frames)
+        self.cct = encode_cct_batch(frames)
+
+    @property
+    def total_frames(self) -> Optional[int]:
+        return len(self.rgbw) * self.repeat if self.repeat else None
+
+    def payloads_for(self, color_type: ColorType) -> List[str]:
+        return self.cct if color_type == ColorType.CCT_BLEBOX else self.rgbw
+
+
+def panic() -> Effect:
+    # Dawny crazy_panic: zgaszone / czerwony / zgaszone / niebieski, 50 powtórzeń
+    return Effect('panic', [OFF, (0, 1, 1, 0.0), OFF, (0.666, 1, 1, 0.0)], frame_ms=50, repeat=50)
+
+
+def strobe(frame_ms: int = 50) -> Effect:
+    return Effect('strobe', [(0, 0, 1, 1), OFF], frame_ms=frame_ms)
+
+
+def breathe(hue: float = 0.0, period_ms: int = 4000, frame_ms: int = 50) -> Effect:
+    steps = max(period_ms // frame_ms, 2)
+    frames = [(hue, 1, (1 - math.cos(2 * math.pi * i / steps)) / 2, 0) for i in range(steps)]
+    return Effect('breathe', frames, frame_ms=frame_ms)
+
+
+def rainbow(period_ms: int = 6000, frame_ms: int = 50) -> Effect:
+    steps = max(period_ms // frame_ms, 2)
+    return Effect('rainbow', [(i / steps, 1, 1, 0) for i in range(steps)], frame_ms=frame_ms)
+
+
+EFFECTS: Dict[str, Callable[[], Effect]] = {
+    'panic': panic,
+    'strobe': strobe,
+    'breathe': breathe,
+    'rainbow': rainbow,
+}
+
+
+class EffectRun:
+    def __init__(self, effect: Effect, rooms: List['LedRoomManager']):
+        self.effect = effect
+        self.rooms = rooms
+        self.task: Optional[asyncio.Task] = None
+        self.in_flight: Dict['LedRoomManager', asyncio.Task] = {}
+        self.frames_shown = 0
+        self.frames_late = 0  # klatki pominięte, bo zegar je wyprzedził
+        self.writes_skipped = 0  # urządzenie jeszcze nie potwierdziło poprzedniej klatki
+
+    def get_stats(self) -> dict:
+        return {
+            'effect': self.effect.name,
+            'rooms': [room.room.name for room in self.rooms],
+            'frames_shown': self.frames_shown,
+            'frames_late': self.frames_late,
+            'writes_skipped': self.writes_skipped,
+        }
+
+
+class EffectEngine:
+    """Odtwarza efekty na wielu pokojach naraz według wspólnego monotonicznego zegara klatek.
+
+    Spóźnione klatki są pomijane zamiast przesuwać cały efekt, a wolne urządzenie nie blokuje
+    pozostałych - dostaje następną klatkę dopiero po potwierdzeniu poprzedniej.
+    """
+
+    def __init__(self):
+        self.runs: Dict['LedRoomManager', EffectRun] = {}
+        self.start_delay = 0.02  # chwila na rozesłanie pierwszej klatki do wszystkich pokoi naraz
+
+    def start(self, effect: Effect, rooms: List['LedRoomManager']) -> EffectRun:
+        self.stop(rooms, restore=False)
+        run = EffectRun(effect, list(rooms))
+        for room in run.rooms:
+            self.runs[room] = run
+        run.task = asyncio.create_task(self._run(run))
+        return run
+
+    def stop(self, rooms: List['LedRoomManager'], restore: bool = True) -> int:
+        stopped = 0
+        for room in rooms:
+            run = self.runs.pop(room, None)
+            if run is None:
+                continue
+            stopped += 1
+            run.rooms.remove(room)
+            if restore:
+                asyncio.create_task(self._restore(room, run.in_flight.get(room)))
+            if not run.rooms and run.task is not None:
+                run.task.cancel()
+        return stopped
+
+    def is_running(self, room: 'LedRoomManager') -> bool:
+        return room in self.runs
+
+    async def _run(self, run: EffectRun) -> None:
+        loop = asyncio.get_running_loop()
+        frame_s = run.effect.frame_ms / 1000
+        total = run.effect.total_frames
+        frame_count = len(run.effect.rgbw)
+        in_flight = run.in_flight
+        # Klatki efektu nie są odpowiedzią na wiadomość MQTT, która go uruchomiła
+        MQTT_RECEIVED_AT.set(None)
+        start = loop.time() + self.start_delay
+        last_index = -1
+        try:
+            while run.rooms:
+                index = math.floor((loop.time() - start) / frame_s)
+                if total is not None and index >= total:
+                    break
+                if index > last_index:
+                    run.frames_late += index - last_index - 1
+                    run.frames_shown += 1
+                    for room in run.rooms:
+                        task = in_flight.get(room)
+                        if task is not None and not task.done():
+                            run.writes_skipped += 1
+                            continue
+                        payload = run.effect.payloads_for(room.color_type)[index % frame_count]
+                        in_flight[room] = asyncio.create_task(room.send_frame(payload))
+                    last_index = index
+                await asyncio.sleep(max(0.0, start + (last_index + 1) * frame_s - loop.time()))
+        finally:
+            # Po zakończeniu przywracamy pokojom ich własny stan (chyba że przejął je inny efekt)
+            for room in list(run.rooms):
+                if self.runs.get(room) is run:
+                    del self.runs[room]
+                    asyncio.create_task(self._restore(room, in_flight.get(room)))
+
+    @staticmethod
+    async def _restore(room: 'LedRoomManager', frame: Optional[asyncio.Task]) -> None:
+        # Ostatnia klatka nie może dojść do sterownika już po przywróconym kolorze
+        if frame is not None and not frame.done():
+            await asyncio.wait([frame])
+        await room.set_light(room.is_light_on)
+
+    def get_stats(self) -> List[dict]:
+        runs = {id(run): run for run in self.runs.values()}
+        return [run.get_stats() for run in runs.values()]
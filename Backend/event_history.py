@@ -0,0 +1,110 @@
+import os
+import time
+from array import array
+from enum import Enum
+from typing import Optional
+
+
+class HistoryEventType(Enum):
+    SWITCH = 1
+    ADC = 2
+
+
+# Pamięć rośnie kawałkami do pojemności - pokój bez zdarzeń nie zajmuje całego bufora
+CHUNK = int(os.getenv('HISTORY_CHUNK', 256))
+
+
+class EventHistory:
+    """Historia zdarzeń pokoju w buforze cyklicznym o stałej pojemności.
+
+    Kolumny trzymamy w tablicach typowanych (czas, typ, wartość, stan światła), więc pamięć nie rośnie
+    z każdym odczytem ADC, a zapytania o okno czasowe to wyszukiwanie binarne po znacznikach czasu.
+    Tablice są alokowane leniwie i rosną po CHUNK zdarzeń aż do pojemności (HISTORY_CAPACITY).
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or int(os.getenv('HISTORY_CAPACITY', 4096))
+        self.timestamps = array('d')
+        self.types = array('B')
+        self.values = array('f')
+        self.light_states = array('B')
+        self.start = 0  # indeks najstarszego zdarzenia
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, type: HistoryEventType, value: float, is_light_on: bool, timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        if self.count:
+            # Zegar ścienny może się cofnąć - bufor musi pozostać posortowany dla wyszukiwania binarnego
+            timestamp = max(timestamp, self.timestamps[(self.start + self.count - 1) % self.capacity])
+
+        if self.count < self.capacity:
+            # Dopóki bufor nie jest pełny, start == 0 i zdarzenia leżą po kolei od początku tablic
+            i = self.count
+            if i == len(self.timestamps):
+                self._grow()
+            self.count += 1
+        else:
+            # Bufor pełny - nadpisujemy najstarsze zdarzenie
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+
+        self.timestamps[i] = timestamp
+        self.types[i] = type.value
+        self.values[i] = value
+        self.light_states[i] = 1 if is_light_on else 0
+
+    def _grow(self) -> None:
+        size = min(CHUNK, self.capacity - len(self.timestamps))
+        self.timestamps.extend(array('d', [0.0]) * size)
+        self.types.extend(array('B', [0]) * size)
+        self.values.extend(array('f', [0.0]) * size)
+        self.light_states.extend(array('B', [0]) * size)
+
+    def _bisect(self, timestamp: float, after: bool = False) -> int:
+        """Pierwszy logiczny indeks zdarzenia z czasem >= timestamp (lub > timestamp gdy after)"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ts = self.timestamps[(self.start + mid) % self.capacity]
+            if ts < timestamp or (after and ts == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              max_points: Optional[int] = None) -> dict:
+        """Zdarzenia z okna [since, until] w układzie kolumnowym, opcjonalnie zagęszczone do max_points kubełków.
+
+        W kubełku każdy typ zdarzenia daje osobny punkt: odczyty ADC są uśredniane, a dla przełącznika
+        bierzemy ostatnią wartość - średnia włączeń i wyłączeń nie jest żadnym stanem.
+        """
+        lo = 0 if since is None else self._bisect(since)
+        hi = self.count if until is None else self._bisect(until, after=True)
+        n = max(hi - lo, 0)
+
+        buckets = n if not max_points or n <= max_points else max_points
+        result = {'timestamps': [], 'types': [], 'values': [], 'light_on': []}
+        for b in range(buckets):
+            # Zakres kubełka [first, last) w indeksach logicznych - czytamy tylko okno, nie cały bufor
+            first = lo + b * n // buckets
+            last = lo + (b + 1) * n // buckets
+            # typ -> [indeks ostatniego zdarzenia, suma wartości, liczba zdarzeń]
+            kinds = {}
+            for j in range(first, last):
+                i = (self.start + j) % self.capacity
+                kind = kinds.setdefault(self.types[i], [i, 0.0, 0])
+                kind[0] = i
+                kind[1] += self.values[i]
+                kind[2] += 1
+            for type_value, (i, total, count) in sorted(kinds.items(), key=lambda item: self.timestamps[item[1][0]]):
+                type = HistoryEventType(type_value)
+                result['timestamps'].append(self.timestamps[i])
+                result['types'].append(type.name)
+                result['values'].append(total / count if type == HistoryEventType.ADC else self.values[i])
+                result['light_on'].append(bool(self.light_states[i]))
+        return result
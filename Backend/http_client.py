@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+from typing import Any, Optional
+
+import aiohttp
+
+from device_health import DeviceHealthRegistry, DeviceUnavailableError, device_key
+from device_state_cache import DeviceStateCache
+
+
+class DeviceHttpClient:
+    """Wspólna pula połączeń HTTP do sterowników BleBox i WLED, żyjąca tyle co aplikacja"""
+
+    def __init__(self):
+        self.limit = int(os.getenv('HTTP_POOL_LIMIT', 100))
+        self.limit_per_host = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 4))
+        self.dns_cache_ttl = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))
+        self.keepalive_timeout = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 60))
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv('HTTP_TIMEOUT', 2)))
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Ostatni potwierdzony stan każdego urządzenia - pozwala pominąć identyczne zapisy
+        self.state_cache = DeviceStateCache()
+        # Stan zdrowia i circuit breaker per sterownik
+        self.health = DeviceHealthRegistry(self._probe)
+
+    async def start(self) -> None:
+        if self.session is not None and not self.session.closed:
+            return
+        # Keep-alive per host - sterowniki na Wi-Fi dłużej zestawiają TCP niż obsługują sam request
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        print(f"HTTP pool started (limit={self.limit}, per host={self.limit_per_host})")
+
+    async def close(self) -> None:
+        self.health.close()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        # Na wypadek wywołania przed startup (np. w skryptach) - sesja tworzona leniwie
+        if self.session is None or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def get(self, url: str) -> None:
+        await self._request('GET', url)
+
+    async def post(self, url: str, payload: dict) -> None:
+        await self._request('POST', url, payload)
+
+    async def get_json(self, url: str) -> Any:
+        """Odczyt stanu ze sterownika (też przez circuit breaker)"""
+        return json.loads(await self._request('GET', url))
+
+    async def _request(self, method: str, url: str, payload: Optional[dict] = None) -> bytes:
+        device = device_key(url)
+        if not self.health.allow(device):
+            raise DeviceUnavailableError(device)
+        session = await self.get_session()
+        try:
+            async with session.request(method, url, json=payload) as response:
+                body = await response.read()  # Odczyt odpowiedzi zwalnia połączenie z powrotem do puli
+                response.raise_for_status()
+        except aiohttp.ClientResponseError as e:
+            # Sterownik odpowiedział - jest osiągalny, tylko odrzucił zapytanie
+            if e.status >= 500:
+                self.health.record_failure(device, e)
+            else:
+                self.health.record_success(device)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.health.record_failure(device, e)
+            raise
+        self.health.record_success(device)
+        return body
+
+    async def _probe(self, device: str) -> None:
+        """Sprawdzenie urządzenia z otwartym obwodem - wystarczy jakakolwiek odpowiedź HTTP"""
+        session = await self.get_session()
+        async with session.get(device) as response:
+            await response.read()
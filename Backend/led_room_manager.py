@@ -1,88 +1,49 @@
 import datetime
+import os
 import time
 import asyncio
 from enum import Enum
 from multiprocessing.dummy import Pool
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 import requests
-import aiohttp
 
+import effects
+from adc_filter import AdcFilter
+from coalescer import LatestWinsCoalescer
+from color import Color
 from db.models.room import Room, ColorType
+from device_health import DeviceUnavailableError, device_key
+from event_history import EventHistory, HistoryEventType
+from http_client import DeviceHttpClient
+from metrics import ADC_THRESHOLD_DROPPED, DEVICE_REQUEST_FAILURES, DEVICE_REQUEST_SECONDS, MQTT_RECEIVED_AT, \
+    MQTT_TO_DEVICE_SECONDS
 from sunrise_api import SunriseSunsetAPI
-import colorsys
-
-CLOSETS_IPS = ['http://192.168.100.43', 'http://192.168.100.54', 'http://192.168.100.57']
-
-
-class Color:
-    # w przypadku CCT (v - janosc, h - stopien bialo-zolty)
-    def __init__(self, h: float, s: float, v: float, w: float) -> None:
-        self.h = h
-        self.s = s
-        self.v = v
-        self.w = w
-
-    @staticmethod
-    def from_str_blebox(text: str):
-        r = int(text[0:2], 16)
-        g = int(text[2:4], 16)
-        b = int(text[4:6], 16)
-        w = int(text[6:8], 16)
-        ret = Color(r, g, b, w)
-        ret.from_rgb(r, g, b, w)
-        return ret
-
-    def from_rgb(self, r: int, g: int, b: int, w: int):
-        (h, s, v) = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
-        self.h = h
-        self.s = s
-        self.v = v
-        self.w = w / 255
-
-    #
-    def to_rgbw(self):
-        (r, g, b) = colorsys.hsv_to_rgb(self.h, self.s, self.v)
-        r = int(255 * r)
-        g = int(255 * g)
-        b = int(255 * b)
-        w = int(255 * self.w * self.v)
-        return r, g, b, w
-
-    def to_cct(self):
-        cw = int(min(1.0, self.h * 2) * self.v * 255)
-        cc = int(min(1.0, abs(2.0 - 2 * self.h)) * self.v * 255)
-        return f'{cc:02x}{cw:02x}{cc:02x}{cw:02x}'
-
-    def __str__(self):
-        (r, g, b, w) = self.to_rgbw()
-        return f'{r:02x}{g:02x}{b:02x}{w:02x}00'
-
-
-# 0000000000  - none
-# ff00000000  - red
-# 00ff000000  - green
-# 0000ff0000  - blue
-# 000000ff00  - white
-
-class HistoryEventType(Enum):
-    SWITCH = 1
-    ADC = 2
-
-
-class HistoryEvent:
-    is_light_on: bool
-    date: datetime.datetime
-    type: HistoryEventType
-    adc_val: float
-
-    def __init__(self, is_light_on: bool, date: datetime.datetime, type: HistoryEventType,
-                 adc_val: float = 0.0) -> None:
-        super().__init__()
-        self.is_light_on = is_light_on
-        self.date = date
-        self.type = type
-        self.adc_val = adc_val
+from timer_service import TimerService
+from transition_planner import TransitionPlanner
+
+# Timery pokoju w TimerService - kluczem jest (manager, nazwa)
+TIMER_NAMES = ('auto_off', 'mode_reset', 'paced_color')
+
+# Czujnik PIR wysyła /detected w pętli, dopóki widzi ruch - w tym oknie kolejne zdarzenia pomijamy
+MOTION_DEBOUNCE = float(os.getenv('MOTION_DEBOUNCE', 1.0))
+
+
+def record_device_request(device_url: str, method: str, started: float, error: Optional[Exception] = None) -> str:
+    """Metryki zapytania do sterownika; zwraca wynik: ok, unavailable, timeout albo error"""
+    now = time.monotonic()
+    if error is not None:
+        if isinstance(error, DeviceUnavailableError):
+            reason = 'unavailable'
+        else:
+            reason = 'timeout' if isinstance(error, asyncio.TimeoutError) else 'error'
+        DEVICE_REQUEST_FAILURES.inc(device_url, method, reason)
+        return reason
+    DEVICE_REQUEST_SECONDS.observe(now - started, device_url, method)
+    received_at = MQTT_RECEIVED_AT.get()
+    if received_at is not None:
+        MQTT_TO_DEVICE_SECONDS.observe(now - received_at)
+    return 'ok'
 
 
 class ColorMode(Enum):
@@ -95,9 +56,16 @@ class ColorMode(Enum):
 
 
 class LedRoomManager:
-    def __init__(self, url: str, sunrise_api: SunriseSunsetAPI, color: Color, duration_seconds: int, max_adc: int,
-                 min_adc: int, room: Room):
+    def __init__(self, house_name: str, url: str, sunrise_api: SunriseSunsetAPI, color: Color, duration_seconds: int, max_adc: int,
+                 min_adc: int, room: Room, http_client: DeviceHttpClient, timer_service: TimerService,
+                 effect_engine: effects.EffectEngine, closet_urls: Optional[List[str]] = None):
+        self.house_name = house_name
+        self.room_id = int(room.id)
         self.urls = url.split(',')
+        self.closet_urls = closet_urls or []  # sterowniki szafek domu (House.closet_urls)
+        self.http_client = http_client
+        self.timer_service = timer_service
+        self.effect_engine = effect_engine
         self.last_move = datetime.datetime.utcnow()
         self.sunrise_api = sunrise_api
         self.color = color
@@ -106,9 +74,8 @@ class LedRoomManager:
         self.duration_seconds = duration_seconds
         self.max_adc = max_adc
         self.min_adc = min_adc
-        self.history: List[HistoryEvent] = []
-        self.prev_adc_value = 0
-        self.ADC_THRESSHOLD = 20
+        self.history = EventHistory()
+        self.adc_filter = AdcFilter(min_adc, max_adc, room.adc_smoothing, room.adc_deadband)
         self.room = room
         # Zapisujemy wartość closet_brightness jako atrybut, żeby nie odwoływać się do kolumny SQLAlchemy
         self.closet_brightness = int(room.closet_brightness or 0)
@@ -116,62 +83,202 @@ class LedRoomManager:
         # Nowy system trybów
         self.current_mode_index = 0  # 0=brightness, 1=hue, 2=white, 3=closet, 4=panic
         self.last_adc_change = datetime.datetime.utcnow()
+        self.mode_reset_seconds = 2  # 2 sekundy na powrót do BRIGHTNESS
         self.mode_order = [ColorMode.BRIGHTNESS, ColorMode.HUE, ColorMode.WHITE, ColorMode.CLOSET, ColorMode.CRAZY]
 
-    async def _apply_color(self, color: Color, fade_ms=300) -> None:
-        color_str = str(color)
-        if ColorType(self.room.type) == ColorType.CCT_BLEBOX:
-            color_str = color.to_cct()
-        
-        # Przygotowanie wszystkich URL-i
-        urls = []
-        for url in self.urls:
-            url = f'{url}/s/{color_str}'
+        # Gdy zapis do sterownika trwa, kolejne wartości ADC zastępują oczekującą - wysyłamy tylko najnowszą
+        self.adc_coalescer = LatestWinsCoalescer(self.change_adc)
+        # Odstęp i czas przejścia zapisów koloru dopasowane do tempa zmian z pokrętła/pilota
+        self.transition_planner = TransitionPlanner()
+
+        # Szybka ścieżka ruchu: czas ostatniego przyjętego zdarzenia i zmiana światła w tle
+        self.last_motion = 0.0
+        self.motion_task: Optional[asyncio.Task] = None
+        self.motion_events = 0
+        self.motion_suppressed = 0
+        self.motion_extended = 0
+        self.motion_applied = 0
+
+        # Słuchacze zmian stanu pokoju (np. zapis do bazy), wołani z nazwą zmienionego pola
+        self.state_listeners: List[Callable[['LedRoomManager', str], None]] = []
+        self.closed = False
+
+    def close(self) -> None:
+        """Pokój usunięty z konfiguracji - zatrzymuje wszystko, co manager mógłby jeszcze wysłać"""
+        self.closed = True
+        self.effect_engine.stop([self], restore=False)
+        for name in TIMER_NAMES:
+            self.timer_service.cancel((self, name))
+        if self.motion_task is not None and not self.motion_task.done():
+            self.motion_task.cancel()
+        self.adc_coalescer.pending.clear()
+        self.state_listeners.clear()
+
+    def _schedule(self, name: str, delay: float, callback: Callable, *args) -> None:
+        # Zamknięty manager nie planuje już niczego (np. handler ADC, który właśnie się kończy)
+        if not self.closed:
+            self.timer_service.schedule((self, name), delay, callback, *args)
+
+    def _emit_state_change(self, field: str) -> None:
+        for listener in self.state_listeners:
+            try:
+                listener(self, field)
+            except Exception as e:
+                print(f"Error in state listener: {e}")
+
+    def update_config(self, url: str, duration_seconds: int, max_adc: int, min_adc: int, room: Room,
+                      closet_urls: Optional[List[str]] = None) -> None:
+        """Podmienia konfigurację z bazy bez ruszania bieżącego stanu (kolor, tryb, światło)"""
+        timing_changed = duration_seconds != self.duration_seconds or \
+            bool(room.use_motion_detector) != bool(self.room.use_motion_detector)
+        self.urls = url.split(',')
+        self.duration_seconds = duration_seconds
+        self.max_adc = max_adc
+        self.min_adc = min_adc
+        self.adc_filter.configure(min_adc, max_adc, room.adc_smoothing, room.adc_deadband)
+        self.room = room
+        self.closet_urls = closet_urls or []
+        if timing_changed and self.is_light_on:
+            # Termin automatycznego wyłączenia liczymy od nowa z nową konfiguracją
+            if bool(room.use_motion_detector):
+                self._schedule_auto_off()
+            else:
+                self.timer_service.cancel((self, 'auto_off'))
+
+    def snapshot_state(self) -> dict:
+        return {
+            'color': list(self.color.as_tuple()),
+            'mode_index': self.current_mode_index,
+            'closet_brightness': self.closet_brightness,
+            'is_light_on': self.is_light_on,
+            'is_enabled': self.is_enabled,
+        }
+
+    def restore_state(self, state: dict) -> None:
+        """Przywraca stan z migawki - bez wysyłania czegokolwiek do urządzeń"""
+        self.color = Color(*state['color'])
+        self.current_mode_index = int(state['mode_index']) % len(self.mode_order)
+        self.closet_brightness = int(state['closet_brightness'])
+        self.is_light_on = bool(state['is_light_on'])
+        self.is_enabled = bool(state['is_enabled'])
+        if self.is_light_on:
+            # Ruchu nie znamy - liczymy czas do wyłączenia od startu
+            self.last_move = datetime.datetime.utcnow()
+            self._schedule_auto_off()
+
+    @property
+    def color_type(self) -> ColorType:
+        return ColorType(self.room.type)
+
+    def encode_color(self, color: Color) -> str:
+        if self.color_type == ColorType.CCT_BLEBOX:
+            return color.to_cct()
+        return str(color)
+
+    async def _apply_color(self, color: Color, fade_ms=300, force=False) -> None:
+        color_str = self.encode_color(color)
+        await self._send_color_str(color_str, fade_ms, force)
+        print(f"Apply color: {color.h} {color.s} {color.v} {color.w} {color_str}")
+
+    async def _apply_planned_color(self) -> None:
+        """Zapis koloru z pokrętła/pilota - przy szybkich zmianach odkładany timerem do kolejnego slotu planera"""
+        key = (self, 'paced_color')
+        if self.timer_service.time_left(key) is not None:
+            # Zapis już czeka na swój slot - wyśle najnowszy kolor pokoju
+            self.transition_planner.merged += 1
+            return
+        delay, fade_ms = self.transition_planner.plan()
+        if delay > 0:
+            # Nie czekamy tutaj - handler (worker MQTT) wraca od razu do kolejnych wiadomości.
+            # Timer działa w świeżym kontekście, więc czas odebrania wiadomości przekazujemy jawnie
+            self._schedule('paced_color', delay, self._send_paced_color, fade_ms, MQTT_RECEIVED_AT.get())
+            return
+        await self._apply_color(self.color, fade_ms)
+
+    async def _send_paced_color(self, fade_ms: int, received_at: Optional[float] = None) -> None:
+        if self.closed:
+            return
+        # Opóźnienie liczymy od najstarszej czekającej wiadomości - tej, która odłożyła zapis
+        MQTT_RECEIVED_AT.set(received_at)
+        await self._apply_color(self.color, fade_ms)
+
+    def _reset_transitions(self) -> None:
+        """Akcja dyskretna wysyła bieżący stan sama - odłożony zapis z pokrętła jest zbędny"""
+        if self.timer_service.time_left((self, 'paced_color')) is not None:
+            self.timer_service.cancel((self, 'paced_color'))
+            self.transition_planner.discarded += 1
+        self.transition_planner.reset()
+
+    async def send_frame(self, color_str: str) -> None:
+        """Klatka efektu - gotowy payload, bez płynnego przejścia"""
+        await self._send_color_str(color_str, 0)
+
+    async def _send_color_str(self, color_str: str, fade_ms: int, force=False) -> None:
+        # Asynchroniczne wysyłanie requestów równolegle przez wspólną pulę połączeń
+        cache = self.http_client.state_cache
+        tasks = []
+        for device_url in self.urls:
+            # Sterownik dostał już dokładnie ten kolor - nie wysyłamy go ponownie
+            if not force and cache.is_current(device_url, color_str):
+                continue
+            url = f'{device_url}/s/{color_str}'
             if fade_ms > 0:
                 url += f'/colorFadeMs/{fade_ms}'
-            urls.append(url)
-        
-        # Asynchroniczne wysyłanie requestów równolegle
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for url in urls:
-                task = asyncio.create_task(self._send_request(session, url))
-                tasks.append(task)
-            
-            # Czekamy na wszystkie requesty równolegle
+            # Od tej chwili stan sterownika jest nieznany, aż do potwierdzenia zapisu
+            write_id = cache.begin(device_url)
+            task = asyncio.create_task(self._send_request(device_url, url, color_str, write_id))
+            tasks.append(task)
+
+        # Czekamy na wszystkie requesty równolegle
+        if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
-        
-        print(f"Apply color: {color.h} {color.s} {color.v} {color.w} {color_str}")
-    
-    async def _send_request(self, session: aiohttp.ClientSession, url: str) -> None:
+
+    async def _send_request(self, device_url: str, url: str, state: str, write_id: int) -> None:
+        cache = self.http_client.state_cache
+        started = time.monotonic()
         try:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=2)) as response:
-                pass  # Nie potrzebujemy odpowiedzi
+            await self.http_client.get(url)
+            cache.confirm(device_url, state, write_id)
+            record_device_request(device_url, 'GET', started)
         except Exception as e:
-            print(f"Error sending request to {url}: {e}")
+            cache.fail(device_url, write_id)
+            record_device_request(device_url, 'GET', started, e)
+            if not isinstance(e, DeviceUnavailableError):
+                print(f"Error sending request to {url}: {e}")
 
-    async def _set_closet_color(self, brightness: float) -> None:
+    async def _set_closet_color(self, brightness: float, force=False, closet_ips: Optional[List[str]] = None) -> None:
         value = int(brightness * 255)
         print(f"Apply closet brightness: {value}")
-        
+
         # Asynchroniczne wysyłanie requestów do wszystkich szaf równolegle
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for ip in CLOSETS_IPS:
-                url = f'{ip}/json/state'
-                payload = {'on': value > 2, 'bri': str(value)}
-                task = asyncio.create_task(self._send_post_request(session, url, payload))
-                tasks.append(task)
-            
-            # Czekamy na wszystkie requesty równolegle
+        cache = self.http_client.state_cache
+        payload = {'on': value > 2, 'bri': str(value)}
+        state = f"{payload['on']}:{value}"
+        tasks = []
+        for ip in self.closet_urls if closet_ips is None else closet_ips:
+            url = f'{ip}/json/state'
+            if not force and cache.is_current(url, state):
+                continue
+            write_id = cache.begin(url)
+            task = asyncio.create_task(self._send_post_request(ip, url, payload, state, write_id))
+            tasks.append(task)
+
+        # Czekamy na wszystkie requesty równolegle
+        if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
-    
-    async def _send_post_request(self, session: aiohttp.ClientSession, url: str, payload: dict) -> None:
+
+    async def _send_post_request(self, device_url: str, url: str, payload: dict, state: str, write_id: int) -> None:
+        cache = self.http_client.state_cache
+        started = time.monotonic()
         try:
-            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=2)) as response:
-                pass  # Nie potrzebujemy odpowiedzi
+            await self.http_client.post(url, payload)
+            cache.confirm(url, state, write_id)
+            record_device_request(device_url, 'POST', started)
         except Exception as e:
-            print(f"Error sending POST request to {url}: {e}")
+            cache.fail(url, write_id)
+            record_device_request(device_url, 'POST', started, e)
+            if not isinstance(e, DeviceUnavailableError):
+                print(f"Error sending POST request to {url}: {e}")
 
     async def set_enable(self, enabled: bool) -> None:
         if enabled == self.is_enabled:
@@ -180,6 +287,7 @@ class LedRoomManager:
         
         old_enabled = self.is_enabled
         self.is_enabled = enabled
+        self._emit_state_change('is_enabled')
         
         print(f"DEBUG: Zmiana z {old_enabled} na {enabled}")
         
@@ -193,6 +301,7 @@ class LedRoomManager:
                 
                 # Resetuj czas ostatniego ADC - nowy tryb zaczyna "od nowa"
                 self.last_adc_change = datetime.datetime.utcnow()
+                self._schedule_mode_reset()
                 
                 print(f"Nowy tryb ADC po włączeniu: {self.mode_order[old_mode_index].name} → {current_mode.name} (index: {old_mode_index} → {self.current_mode_index})")
                 
@@ -200,36 +309,137 @@ class LedRoomManager:
                     print("PANIC!!!!")
                     # Po panic mode wróć na początek
                     self.current_mode_index = 0
+                self._emit_state_change('mode')
                 
                 await self.set_light(True)
         else:
             # Wyłączamy
             await self.set_light(False)
 
-    async def set_light(self, on: bool) -> None:
-        self.is_light_on = on
+        self.history.append(HistoryEventType.SWITCH, 1.0 if enabled else 0.0, self.is_light_on)
+
+    async def set_light(self, on: bool, force: bool = False) -> None:
+        # Jawna zmiana stanu przerywa efekt działający w tym pokoju i idzie od razu
+        self.effect_engine.stop([self], restore=False)
+        self._reset_transitions()
+        if self.is_light_on != on:
+            self.is_light_on = on
+            self._emit_state_change('is_light_on')
         if on:
-            await self._apply_color(self.color)
-            if ColorType(self.room.type) == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
-                await self._set_closet_color(float(self.closet_brightness) / 255.0)
+            self._schedule_auto_off()
         else:
-            await self._apply_color(Color(0, 0, 0, 0))
-            if ColorType(self.room.type) == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
-                await self._set_closet_color(0)
+            self.timer_service.cancel((self, 'auto_off'))
+
+        # Taśma i szafki równolegle - wolne lub martwe urządzenie nie opóźnia pozostałych
+        writes = [self._apply_color(self.color if on else Color(0, 0, 0, 0), force=force)]
+        if ColorType(self.room.type) == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
+            writes.append(self._set_closet_color(self._closet_target(), force))
+        await asyncio.gather(*writes)
+
+    def apply_scene_state(self, on: bool, color: Optional[Color] = None, closet_brightness: Optional[int] = None) -> None:
+        """Ustawia stan pokoju ze sceny bez wysyłania - zapisy do urządzeń wysyła SceneEngine dla całego domu naraz"""
+        self.effect_engine.stop([self], restore=False)
+        self._reset_transitions()
+        if color is not None:
+            self.color = color
+            self._emit_state_change('color')
+        if closet_brightness is not None:
+            self.closet_brightness = closet_brightness
+            self._emit_state_change('closet_brightness')
+        if self.is_light_on != on:
+            self.is_light_on = on
+            self._emit_state_change('is_light_on')
+        if on:
+            # Scena liczy się jak ruch - czas do automatycznego wyłączenia biegnie od jej włączenia
+            self.last_move = datetime.datetime.utcnow()
+            self._schedule_auto_off()
+        else:
+            self.timer_service.cancel((self, 'auto_off'))
+
+    def _closet_target(self) -> float:
+        return float(self.closet_brightness) / 255.0 if self.is_light_on else 0.0
+
+    def uses_device(self, device: str) -> bool:
+        if any(device_key(url) == device for url in self.urls):
+            return True
+        return self.color_type == ColorType.WRGB_BLEXBOX_WITH_CLOSET and any(device_key(ip) == device for ip in self.closet_urls)
+
+    def device_color(self) -> str:
+        """Kolor, który powinna teraz pokazywać taśma pokoju"""
+        return self.encode_color(self.color if self.is_light_on else Color(0, 0, 0, 0))
+
+    def closet_state(self) -> dict:
+        """Stan, który powinny teraz mieć szafki (jak w _set_closet_color)"""
+        value = int(self._closet_target() * 255)
+        return {'on': value > 2, 'bri': value}
+
+    async def resync_device(self, device: str) -> None:
+        """Wysyła bieżący stan pokoju do urządzenia (po awarii albo gdy jego stan się nie zgadza)"""
+        if self.effect_engine.is_running(self):
+            return  # kolejna klatka efektu i tak trafi do urządzenia
+        color_str = self.device_color()
+        cache = self.http_client.state_cache
+        writes = [self._send_request(url, f'{url}/s/{color_str}', color_str, cache.begin(url))
+                  for url in self.urls if device_key(url) == device]
+        if self.color_type == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
+            closets = [ip for ip in self.closet_urls if device_key(ip) == device]
+            if closets:
+                writes.append(self._set_closet_color(self._closet_target(), True, closets))
+        await asyncio.gather(*writes)
+
+    async def refresh(self) -> None:
+        """Wysyła aktualny stan pokoju z pominięciem cache (np. po restarcie sterownika)"""
+        await self.set_light(self.is_light_on, force=True)
+
+    def record_motion(self) -> None:
+        """Ruch z czujnika - tylko zapis czasu, bez czekania na urządzenia; włączenie światła idzie w tle"""
+        self.motion_events += 1
+        now = time.monotonic()
+        pending = self.motion_task is not None and not self.motion_task.done()
+        # Powtórka jest zbędna, gdy światło już świeci albo właśnie się włącza - zgaszone światło zapalamy zawsze
+        if (self.is_light_on or pending) and now - self.last_motion < MOTION_DEBOUNCE:
+            self.motion_suppressed += 1
+            return
+        self.last_motion = now
+        if not self.is_enabled or self.sunrise_api.is_daylight_now(self.house_name):
+            return
 
-    async def handle_detected_move(self) -> None:
-        if not self.is_enabled:
-            return None
-        if self.sunrise_api.is_daylight_now():
-            return None
-        
-        # Sprawdź reset trybu przed obsługą ruchu
-        self.check_mode_reset()
-        
         self.last_move = datetime.datetime.utcnow()
         if self.is_light_on:
-            return None
-        await self.set_light(True)
+            # Termin wyłączenia przesunie timer, gdy nadejdzie (switch_off_lights_if_needed)
+            self.motion_extended += 1
+            return
+        if pending:
+            self.motion_suppressed += 1
+            return
+        if self.closed:
+            return
+        self.motion_task = asyncio.create_task(self._apply_motion())
+
+    async def _apply_motion(self) -> None:
+        # Stan mógł się zmienić od zgłoszenia ruchu (np. wyłącznik)
+        if not self.is_enabled or self.is_light_on:
+            return
+        self.motion_applied += 1
+        try:
+            await self.set_light(True)
+        except Exception as e:
+            print(f"Error switching light on after motion: {e}")
+
+    def get_motion_stats(self) -> dict:
+        return {
+            'events': self.motion_events,
+            'suppressed': self.motion_suppressed,
+            'extended': self.motion_extended,
+            'applied': self.motion_applied,
+        }
+
+    def _schedule_auto_off(self) -> None:
+        if not bool(self.room.use_motion_detector):
+            return
+        switch_off_time = self.last_move + datetime.timedelta(seconds=self.duration_seconds)
+        delay = (switch_off_time - datetime.datetime.utcnow()).total_seconds()
+        self._schedule('auto_off', delay, self.switch_off_lights_if_needed)
 
     def should_switch_off_light(self) -> bool:
         if not self.is_enabled:
@@ -239,7 +449,7 @@ class LedRoomManager:
         if not bool(self.room.use_motion_detector):
             return False
         switch_off_time = self.last_move + datetime.timedelta(seconds=self.duration_seconds)
-        if self.sunrise_api.is_daylight_now() and switch_off_time < datetime.datetime.utcnow():
+        if self.sunrise_api.is_daylight_now(self.house_name) and switch_off_time < datetime.datetime.utcnow():
             print("Switch off")
             print(str(switch_off_time))
             print(str(datetime.datetime.utcnow()))
@@ -247,48 +457,59 @@ class LedRoomManager:
         return False
 
     async def switch_off_lights_if_needed(self) -> None:
-        # Usunąłem check_mode_reset() stąd - może resetował tryb zbyt często
+        """Wywoływane przez timer w terminie last_move + duration_seconds"""
+        if self.is_enabled and self.is_light_on and bool(self.room.use_motion_detector):
+            remaining = (self.last_move + datetime.timedelta(seconds=self.duration_seconds)
+                         - datetime.datetime.utcnow()).total_seconds()
+            if remaining > 0:
+                # Był ruch po zaplanowaniu timera - termin przesuwamy dopiero teraz, a nie przy każdym zdarzeniu
+                self._schedule('auto_off', remaining, self.switch_off_lights_if_needed)
+                return
         if self.should_switch_off_light():
             await self.set_light(False)
-
-    def check_mode_reset(self):
-        """Sprawdza czy nie należy wrócić do trybu BRIGHTNESS po 2 sekundach nieaktywności ADC"""
-        reset_seconds = 2  # 2 sekundy na powrót do BRIGHTNESS
-        
-        # Jeśli minęło więcej niż reset_seconds od ostatniego ruchu ADC
-        time_since_last_adc = (datetime.datetime.utcnow() - self.last_adc_change).total_seconds()
-        
-        if time_since_last_adc > reset_seconds:
-            if self.current_mode_index != 0:  # Jeśli nie jesteśmy już w BRIGHTNESS
-                old_mode = self.mode_order[self.current_mode_index]
-                print(f"Powrót do trybu BRIGHTNESS po {reset_seconds} sekundach nieaktywności ADC (był {old_mode.name})")
-                self.current_mode_index = 0
+        elif self.is_enabled and self.is_light_on and bool(self.room.use_motion_detector):
+            # Światło gasimy tylko w dzień - w nocy czekamy do wschodu słońca
+            self._schedule('auto_off', self.sunrise_api.seconds_until_daylight(self.house_name),
+                           self.switch_off_lights_if_needed)
+
+    def _schedule_mode_reset(self) -> None:
+        self._schedule('mode_reset', self.mode_reset_seconds, self.reset_mode)
+
+    def reset_mode(self):
+        """Powrót do trybu BRIGHTNESS po 2 sekundach nieaktywności ADC (wywoływane przez timer)"""
+        if self.current_mode_index != 0:  # Jeśli nie jesteśmy już w BRIGHTNESS
+            old_mode = self.mode_order[self.current_mode_index]
+            print(f"Powrót do trybu BRIGHTNESS po {self.mode_reset_seconds} sekundach nieaktywności ADC (był {old_mode.name})")
+            self.current_mode_index = 0
+            self._emit_state_change('mode')
 
     def get_current_mode(self) -> ColorMode:
         """Zwraca aktualny tryb na podstawie current_mode_index"""
-        self.check_mode_reset()
         return self.mode_order[self.current_mode_index]
 
-    def trim_history(self):
-        """Usuwamy starą funkcję trim_history - nie jest już potrzebna"""
-        pass
+    async def submit_adc(self, adc_value: float, override_mode: Optional[ColorMode] = None, ignore_threshold: bool = False) -> None:
+        """Wejście dla zdarzeń ADC/jasności - sklejane per pokój, do urządzenia trafia tylko ostatnia wartość.
 
-    async def change_adc(self, adc_value: float, override_mode: Optional[ColorMode] = None, ignore_threshold: bool = False) -> None:
-        print("Adc value is {}".format(adc_value))
-        if not ignore_threshold:
-            if abs(self.prev_adc_value - adc_value) < self.ADC_THRESSHOLD:
-                return
-            self.prev_adc_value = adc_value
-
-            value = (adc_value - self.min_adc) / (self.max_adc - self.min_adc)
-            value = min(max(value, 0), 1)
-        else:
-            value = adc_value
+        Surowe odczyty pokrętła przechodzą najpierw przez filtr pokoju; ignore_threshold oznacza wartość 0-1
+        (np. z pilota milight), która idzie bez filtrowania.
+        """
+        if ignore_threshold:
+            self.transition_planner.on_update()
+            await self.adc_coalescer.submit(('absolute', override_mode), adc_value, override_mode)
+            return
+        value = self.adc_filter.feed(adc_value)
+        if value is None:
+            ADC_THRESHOLD_DROPPED.inc(self.house_name, self.room.name)
+            return
+        self.transition_planner.on_update()
+        await self.adc_coalescer.submit(('adc', override_mode), value, override_mode)
 
+    async def change_adc(self, value: float, override_mode: Optional[ColorMode] = None) -> None:
+        """value 0-1 - po filtrze ADC albo wprost z pilota"""
+        print("Adc value is {}".format(value))
         if not self.is_enabled:
             return None
 
-        # Pobierz aktualny tryb PRZED aktualizacją czasu (żeby reset mógł zadziałać)
         print(f"DEBUG: Przed get_current_mode() - current_mode_index: {self.current_mode_index}, last_adc_change: {(datetime.datetime.utcnow() - self.last_adc_change).total_seconds():.1f}s temu")
         mode = self.get_current_mode()
         if override_mode is not None:
@@ -296,45 +517,41 @@ class LedRoomManager:
             
         print(f"DEBUG: Po get_current_mode() - używany tryb ADC: {mode.name} (index: {self.current_mode_index})")
         
-        # Aktualizuj czas ostatniego ruchu ADC DOPIERO po sprawdzeniu trybu
+        # Aktualizuj czas ostatniego ruchu ADC i przesuń termin powrotu do BRIGHTNESS
         self.last_adc_change = datetime.datetime.utcnow()
+        self._schedule_mode_reset()
+
+        if mode != ColorMode.CRAZY:
+            self.effect_engine.stop([self], restore=False)
 
         self.color.s = 1
         if mode == ColorMode.BRIGHTNESS:
             self.color.v = value
-            await self._apply_color(self.color)
+            self._emit_state_change('color')
+            await self._apply_planned_color()
         elif mode == ColorMode.HUE:
             self.color.h = value
-            await self._apply_color(self.color)
+            self._emit_state_change('color')
+            await self._apply_planned_color()
         elif mode == ColorMode.WHITE:
             self.color.w = value
-            await self._apply_color(self.color)
+            self._emit_state_change('color')
+            await self._apply_planned_color()
         elif mode == ColorMode.CLOSET:
             self.color.v = value
             # Aktualizuj closet_brightness w pamięci (0-255)
             self.closet_brightness = int(value * 255)
+            self._emit_state_change('color')
+            self._emit_state_change('closet_brightness')
             # await self._apply_color(self.color)
             await self._set_closet_color(value)
         elif mode == ColorMode.CRAZY:
             print("Crazy adc")
-            await self.crazy_panic()
-
-        # Zachowaj historię dla kompatybilności (można usunąć w przyszłości)
-        self.history.append(HistoryEvent(self.is_light_on, datetime.datetime.utcnow(), HistoryEventType.ADC, value))
-
-    async def crazy_panic(self) -> None:
-        for i in range(50):
-            # await self._apply_color(Color(0,0,1,1), 0)
-            # await asyncio.sleep(0.03)
-            await self._apply_color(Color(0, 0, 0, 0), 0)
-            await asyncio.sleep(0.05)
-            # await asyncio.sleep(0.03)
-            # await self._apply_color(Color(random.random(),1,1,0.1), 0)
-            await self._apply_color(Color(0, 1, 1, 0.0), 0)
-            await asyncio.sleep(0.05)
-            await self._apply_color(Color(0, 0, 0, 0), 0)
-            await asyncio.sleep(0.05)
-            await self._apply_color(Color(0.666, 1, 1, 0.0), 0)
-            await asyncio.sleep(0.05)
-
-            # await asyncio.sleep(0.03)
+            self.crazy_panic()
+
+        self.history.append(HistoryEventType.ADC, value, self.is_light_on)
+
+    def crazy_panic(self) -> None:
+        """Efekt panic w tle - nie blokuje kolejnych komend pokoju i da się go przerwać"""
+        if not self.effect_engine.is_running(self):
+            self.effect_engine.start(effects.panic(), [self])
@@ -7,93 +7,346 @@ from mqtt.LedMQTT import LedMQTT
 load_dotenv()
 from sqlalchemy.orm import Session
 
-from db.db_init import get_db, Base, engine
+from db.async_db import AsyncDatabase
+from db.db_init import get_db
 from db.models.house import House
 
 import datetime
+import time
 from enum import Enum
-from typing import Dict
+from typing import Dict, List, Optional
 import os
 
-from fastapi import FastAPI, Depends
+import aiohttp
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import requests
 import asyncio
+from effects import EFFECTS, EffectEngine
 from led_room_manager import LedRoomManager, Color
+from reconciler import DeviceReconciler
+from room_state_persister import RoomStatePersister
+from scenes import SceneEngine
+from http_client import DeviceHttpClient
+from metrics import REGISTRY, CallbackMetric
+from sharding import FORWARDED_HEADER, ShardCoordinator
+from state_snapshot import StateSnapshot, house_config, room_from_config
+from state_stream import StateStream
 from sunrise_api import SunriseSunsetAPI
-
-Base.metadata.create_all(bind=engine)
+from timer_service import TimerService
 
 sunrise_api = SunriseSunsetAPI()
+http_client = DeviceHttpClient()
+timer_service = TimerService()
+effect_engine = EffectEngine()
+database = AsyncDatabase()
+room_state_persister = RoomStatePersister(database)
+state_snapshot = StateSnapshot()
+state_stream = StateStream()
+reconciler = DeviceReconciler(http_client)
+scene_engine = SceneEngine(http_client)
+shard = ShardCoordinator()
 
-db = next(get_db())
-houses = db.query(House).all()
+# Managery powstają przy starcie aplikacji (z migawki albo z bazy), nie przy imporcie
 managers_dict: Dict[str, Dict[str, LedRoomManager]] = {}
-for house in houses:
-    house_name = str(house.name)
-    managers_dict[house_name] = {}
-    for room in house.rooms:
-        room_name = str(room.name)
-        color = Color.from_str_blebox(str(room.desired_color))
-        managers_dict[house_name][room_name] = LedRoomManager(str(room.url), sunrise_api, color, int(room.detection_time), int(room.max_adc), int(room.min_adc), room)
-
-action_handlers = ActionHandlers(managers_dict)
+state_snapshot.managers_dict = managers_dict
+state_snapshot.node = shard.self_name or None
+state_stream.managers_dict = managers_dict
+startup_info = {'source': None, 'startup_ms': None, 'reconciled': False}
+
+action_handlers = ActionHandlers(managers_dict, scene_engine)
 mqtt = LedMQTT(action_handlers)
+if shard.enabled:
+    mqtt.share_group_prefix = 'superled'
+
+
+def resync_recovered_device(device: str) -> None:
+    """Urządzenie wróciło po awarii - odczytujemy jego stan i poprawiamy tylko to, co się nie zgadza"""
+    rooms = [room for room in _all_rooms() if room.uses_device(device)]
+    if rooms:
+        asyncio.create_task(reconciler.reconcile(rooms, device))
+
+
+http_client.health.recovery_listeners.append(resync_recovered_device)
+
+
+def parse_urls(value: Optional[str]) -> List[str]:
+    return [url.strip() for url in (value or '').split(',') if url.strip()]
+
+
+def create_manager(house_name: str, room: Room, closet_urls: List[str]) -> LedRoomManager:
+    color = Color.from_str_blebox(str(room.desired_color))
+    manager = LedRoomManager(house_name, str(room.url), sunrise_api, color, int(room.detection_time), int(room.max_adc),
+                             int(room.min_adc), room, http_client, timer_service, effect_engine, closet_urls)
+    room_state_persister.watch(manager)
+    state_snapshot.watch(manager)
+    state_stream.watch(manager)
+    return manager
+
+
+def snapshot_state_trusted(snapshot: dict) -> bool:
+    """Stan z migawki jest aktualny tylko, jeśli od jej zapisu domów nie mógł przejąć inny węzeł.
+
+    Migawka zawiera domy, które ten węzeł miał w chwili zapisu. Po dłuższej przerwie przejęli je inni
+    i mogli zmienić ich stan - wtedy stan bierzemy z bazy (zapisany przez nich przy oddaniu domów).
+    """
+    if not shard.enabled:
+        return True
+    age = time.time() - snapshot.get('saved_at', 0)
+    return snapshot.get('node') == shard.self_name and age < shard.failover_seconds
+
+
+def restore_from_snapshot(snapshot: dict) -> None:
+    for house_name, house in snapshot['houses'].items():
+        if not shard.owns(house_name):
+            continue
+        state_snapshot.houses[house_name] = {key: value for key, value in house.items() if key != 'rooms'}
+        sunrise_api.set_house_location(house_name, house.get('latitude'), house.get('longitude'))
+        closet_urls = parse_urls(house.get('closet_urls'))
+        rooms = managers_dict.setdefault(house_name, {})
+        for room_name, entry in house['rooms'].items():
+            manager = create_manager(house_name, room_from_config(entry['config']), closet_urls)
+            manager.restore_state(entry['state'])
+            rooms[room_name] = manager
+    state_stream.touch()
+
+
+# Bieżący stan pokoju zapisywany przez aplikację - jego zmiana w bazie to nie zmiana konfiguracji
+ROOM_STATE_COLUMNS = ('desired_color', 'closet_brightness')
+
+
+def room_config_changed(old: Room, new: Room) -> bool:
+    return any(getattr(old, column.name) != getattr(new, column.name) for column in Room.__table__.columns
+               if column.name not in ROOM_STATE_COLUMNS)
+
+
+class ConfigChanges:
+    def __init__(self):
+        self.added: List[str] = []
+        self.updated: List[str] = []
+        self.removed: List[str] = []
+        self.unchanged = 0
+        self.resync: List[LedRoomManager] = []  # nowe pokoje i pokoje ze zmienionymi urządzeniami
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def get_stats(self) -> dict:
+        return {'added': self.added, 'updated': self.updated, 'removed': self.removed, 'unchanged': self.unchanged}
+
+
+def apply_db_config(houses: List[House]) -> ConfigChanges:
+    """Uzgadnia managery z konfiguracją z bazy - bieżący stan pokoi (np. z migawki) zostaje.
+
+    Dodaje i usuwa tylko pokoje, których przybyło lub ubyło, a aktualizuje tylko te, których konfiguracja
+    się zmieniła - razem z ich subskrypcjami MQTT. Pozostałych pokoi nie dotyka.
+    """
+    seen = set()
+    changes = ConfigChanges()
+    scene_engine.load(houses)
+    for house in houses:
+        house_name = str(house.name)
+        if not shard.owns(house_name):
+            continue  # dom obsługuje inny węzeł - jego managery (jeśli były) usuwamy poniżej
+        state_snapshot.houses[house_name] = house_config(house)
+        sunrise_api.set_house_location(house_name, house.latitude, house.longitude)
+        closet_urls = parse_urls(house.closet_urls)
+        if house_name not in managers_dict and mqtt.started:
+            mqtt.add_house(house_name)
+        rooms = managers_dict.setdefault(house_name, {})
+        for room in house.rooms:
+            room_name = str(room.name)
+            seen.add((house_name, room_name))
+            manager = rooms.get(room_name)
+            if manager is None:
+                rooms[room_name] = create_manager(house_name, room, closet_urls)
+                changes.added.append(f'{house_name}/{room_name}')
+                changes.resync.append(rooms[room_name])
+                if mqtt.started:
+                    mqtt.add_room(house_name, room)
+                continue
+            # Adresy szafek mają znaczenie tylko dla pokoi z szafkami
+            closets_changed = manager.closet_urls != closet_urls and room.type == ColorType.WRGB_BLEXBOX_WITH_CLOSET
+            if room_config_changed(manager.room, room) or closets_changed:
+                old_room, old_urls = manager.room, manager.urls
+                manager.update_config(str(room.url), int(room.detection_time), int(room.max_adc), int(room.min_adc), room,
+                                      closet_urls)
+                if mqtt.started and (old_room.mqtt_topic != room.mqtt_topic or old_room.type != room.type):
+                    mqtt.remove_room(house_name, old_room)
+                    mqtt.add_room(house_name, room)
+                changes.updated.append(f'{house_name}/{room_name}')
+                if manager.urls != old_urls or closets_changed or old_room.type != room.type:
+                    changes.resync.append(manager)
+            else:
+                manager.closet_urls = closet_urls
+                changes.unchanged += 1
+
+    for house_name, rooms in list(managers_dict.items()):
+        for room_name in [name for name in rooms if (house_name, name) not in seen]:
+            print(f"Room {house_name}/{room_name} no longer in database, removing")
+            manager = rooms.pop(room_name)
+            manager.close()
+            if shard.owns(house_name):
+                # Wiersza już nie ma - UPDATE po jego kluczu wycofałby cały flush razem z żywymi pokojami
+                room_state_persister.dirty.pop(manager.room_id, None)
+            mqtt.remove_room(house_name, manager.room)
+            changes.removed.append(f'{house_name}/{room_name}')
+        if not rooms:
+            del managers_dict[house_name]
+            state_snapshot.houses.pop(house_name, None)
+            mqtt.remove_house(house_name)
+    state_stream.touch()
+    return changes
+
+
+# Przeładowanie konfiguracji i rebalans shardu nie mogą się przeplatać
+config_lock = asyncio.Lock()
+config_info = {'poll_interval': float(os.getenv('CONFIG_POLL_INTERVAL', 10)), 'fingerprint': None, 'reloads': 0,
+               'last_reload': None, 'last_reload_ms': None, 'last_changes': None}
 
-app = FastAPI()
 
-async def turn_off_lights_loop():
+def release_houses() -> List[str]:
+    """Zamyka managery domów, które według pierścienia należą teraz do innych węzłów"""
+    released = [house_name for house_name in managers_dict if not shard.owns(house_name)]
+    for house_name in released:
+        for manager in managers_dict.pop(house_name).values():
+            manager.close()
+            mqtt.remove_room(house_name, manager.room)
+        state_snapshot.houses.pop(house_name, None)
+        mqtt.remove_house(house_name)
+    if released:
+        state_stream.touch()
+    return released
+
+
+async def rebalance() -> None:
+    """Zmiana członków shardu - przejmujemy nowe domy i oddajemy te, które należą teraz do innych"""
+    async with config_lock:
+        # Stan oddawanych pokoi musi być w bazie, zanim wczyta go nowy właściciel
+        await room_state_persister.flush()
+        try:
+            houses = await database.load_houses()
+            acquired = [str(house.name) for house in houses
+                        if shard.owns(str(house.name)) and str(house.name) not in managers_dict]
+            # Poprzedni właściciel zapisuje stan przejmowanych domów - dopiero potem wczytujemy go z bazy
+            if await shard.request_handoff({shard.previous_owner(house_name) for house_name in acquired}):
+                houses = await database.load_houses()
+        except Exception as e:
+            print(f"Rebalance failed, database unavailable: {e}")
+            return
+        changes = apply_db_config(houses)
+        # Zmiany oddanych pokoi z czasu wczytywania konfiguracji
+        await room_state_persister.flush()
+        await state_snapshot.save()
+        print(f"Rebalanced, owning houses: {sorted(managers_dict)}")
+    if changes.resync:
+        # Przejęte domy: urządzenia mogą mieć stan sprzed ostatniego zapisu poprzedniego właściciela
+        asyncio.create_task(reconciler.reconcile(changes.resync))
+
+
+shard.rebalance_listeners.append(lambda: asyncio.create_task(rebalance()))
+
+
+async def reload_config() -> dict:
+    """Wczytuje konfigurację z bazy i nakłada tylko różnice na działające managery"""
+    async with config_lock:
+        started = time.monotonic()
+        # Odcisk przed wczytaniem - zmiana w trakcie wczytywania zostanie wykryta przy następnym sprawdzeniu
+        fingerprint = await database.config_versions()
+        houses = await database.load_houses()
+        changes = apply_db_config(houses)
+        config_info['fingerprint'] = fingerprint
+        config_info['reloads'] += 1
+        config_info['last_reload'] = time.time()
+        config_info['last_reload_ms'] = (time.monotonic() - started) * 1000
+        config_info['last_changes'] = changes.get_stats()
+        print(f"Configuration reloaded in {config_info['last_reload_ms']:.1f} ms: {changes.get_stats()}")
+    if changes.resync:
+        asyncio.create_task(reconciler.reconcile(changes.resync))
+    if changes:
+        await state_snapshot.save()
+    return dict(config_info['last_changes'], reload_ms=config_info['last_reload_ms'])
+
+
+async def watch_config() -> None:
+    """Co CONFIG_POLL_INTERVAL sekund porównuje wersje konfiguracji w bazie i przeładowuje ją po zmianie"""
     while True:
-        await asyncio.sleep(1)
-        for house in managers_dict.values():
-            for room in house.values():
-                await room.switch_off_lights_if_needed()
-
-async def save_current_colors_to_db():
-    """Zapisuje aktualny kolor każdego pokoju do bazy danych"""
-    try:
-        # Pobierz nową sesję bazy danych
-        db_session = next(get_db())
-        
-        print("Zapisuję aktualny kolor pokoi do bazy danych...")
-        
-        for house_name, house_rooms in managers_dict.items():
-            for room_name, room_manager in house_rooms.items():
-                # Pobierz aktualny kolor z managera
-                current_color_hex = str(room_manager.color)
-                
-                # Znajdź pokój w bazie danych
-                db_room = db_session.query(Room).filter(
-                    Room.name == room_name
-                ).first()
-                
-                if db_room:
-                    # Zapisz aktualny kolor do bazy
-                    old_color = db_room.desired_color
-                    # Używamy setattr aby uniknąć problemów z SQLAlchemy columns
-                    setattr(db_room, 'desired_color', current_color_hex)
-                    setattr(db_room, 'closet_brightness', room_manager.closet_brightness)
-                    db_session.commit()
-                    
-                    print(f"Zapisano kolor pokoju {house_name}/{room_name}: {old_color} -> {current_color_hex}")
-                    print(f"Zapisano jasność szafki {house_name}/{room_name}: {room_manager.closet_brightness}")
-                else:
-                    print(f"Nie znaleziono pokoju {house_name}/{room_name} w bazie danych")
-        
-        db_session.close()
-        print("Zapisywanie kolorów zakończone pomyślnie")
-        
-    except Exception as e:
-        print(f"Błąd podczas zapisywania kolorów do bazy: {e}")
+        await asyncio.sleep(config_info['poll_interval'])
+        if config_info['fingerprint'] is None:
+            continue  # konfiguracja z bazy jeszcze nie wczytana (start z migawki)
         try:
-            db_session.close()
-        except:
-            pass
+            if await database.config_versions() != config_info['fingerprint']:
+                await reload_config()
+        except Exception as e:
+            print(f"Configuration check failed: {e}")
+
 
-async def save_colors_to_db_loop():
-    """Pętla zapisująca kolory co godzinę"""
+async def reconcile_with_db() -> None:
+    """Po starcie z migawki: wczytuje konfigurację z bazy w tle, ponawiając, dopóki baza nie odpowie"""
+    delay = 5.0
     while True:
-        await asyncio.sleep(3600)  # 3600 sekund = 1 godzina
-        await save_current_colors_to_db()
+        try:
+            fingerprint = await database.config_versions()
+            houses = await database.load_houses()
+            break
+        except Exception as e:
+            print(f"Database unavailable, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 300.0)
+    async with config_lock:
+        changes = apply_db_config(houses)
+        config_info['fingerprint'] = fingerprint
+    startup_info['reconciled'] = True
+    if changes.resync:
+        await reconciler.reconcile(changes.resync)
+    await state_snapshot.save()
+    print(f"Configuration reconciled with database ({len(_all_rooms())} rooms)")
+
+
+app = FastAPI()
+
+
+def _all_rooms():
+    return [room for house in managers_dict.values() for room in house.values()]
+
+
+REGISTRY.register(CallbackMetric('superled_rooms_active', 'Liczba obsługiwanych pokoi', (),
+                                 lambda: [((), len(_all_rooms()))]))
+REGISTRY.register(CallbackMetric('superled_lights_on', 'Liczba pokoi z włączonym światłem', (),
+                                 lambda: [((), sum(room.is_light_on for room in _all_rooms()))]))
+REGISTRY.register(CallbackMetric('superled_adc_coalesced_total', 'Wartości ADC zastąpione nowszymi przed wysłaniem',
+                                 ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.adc_coalescer.coalesced)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_adc_samples_total', 'Surowe odczyty pokrętła ADC na wejściu filtra',
+                                 ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.adc_filter.samples)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_adc_emitted_total', 'Odczyty ADC przepuszczone przez filtr do urządzeń',
+                                 ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.adc_filter.emitted)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_paced_color_writes_total',
+                                 'Zapisy koloru rozłożone w czasie z przejściem dopasowanym do tempa zmian',
+                                 ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.transition_planner.paced)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_motion_events_total', 'Zgłoszenia ruchu z czujników', ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.motion_events)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_motion_suppressed_total', 'Powtórzone zgłoszenia ruchu pominięte w oknie debounce',
+                                 ('house', 'room'),
+                                 lambda: [((room.house_name, room.room.name), room.motion_suppressed)
+                                          for room in _all_rooms()], 'counter'))
+REGISTRY.register(CallbackMetric('superled_device_writes_skipped_total', 'Zapisy pominięte, bo urządzenie ma już ten stan',
+                                 (), lambda: [((), http_client.state_cache.hits)], 'counter'))
+REGISTRY.register(CallbackMetric('superled_mqtt_queue_depth', 'Wiadomości MQTT czekające w kolejce', (),
+                                 lambda: [((), mqtt.mqtt.queue.qsize() if mqtt.mqtt.queue else 0)]))
+REGISTRY.register(CallbackMetric('superled_state_stream_clients', 'Podłączeni klienci strumienia stanu', (),
+                                 lambda: [((), len(state_stream.clients))]))
+REGISTRY.register(CallbackMetric('superled_mqtt_dropped_total', 'Wiadomości MQTT odrzucone przez przepełnienie kolejki',
+                                 (), lambda: [((), mqtt.mqtt.dropped)], 'counter'))
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -102,20 +355,274 @@ async def startup_event():
     print(f"MQTT Login: {os.getenv('MQTT_LOGIN')}")
     print(f"Event loop: {asyncio.get_running_loop()}")
     
+    # Pula połączeń HTTP do sterowników musi powstać w pętli zdarzeń
+    await http_client.start()
+
+    # W trybie shardingu najpierw ustalamy żywych członków - od nich zależy, które domy są nasze
+    await shard.start()
+    if shard.enabled:
+        # Po restarcie odbieramy swoje domy od węzłów, które je w międzyczasie przejęły - ich stan trafia do bazy
+        await shard.request_handoff(shard.reachable())
+
+    started = time.monotonic()
+    snapshot = state_snapshot.load()
+    if snapshot is not None and not snapshot_state_trusted(snapshot):
+        print(f"Snapshot from {snapshot.get('node')} is older than the shard failover time, loading state from database")
+        snapshot = None
+    if snapshot is not None:
+        # Start z migawki - bez czekania na bazę, konfiguracja z bazy dojdzie w tle
+        restore_from_snapshot(snapshot)
+        startup_info['source'] = 'snapshot'
+    else:
+        config_info['fingerprint'] = await database.config_versions()
+        apply_db_config(await database.load_houses())
+        startup_info['source'] = 'database'
+        startup_info['reconciled'] = True
+    startup_info['startup_ms'] = (time.monotonic() - started) * 1000
+    print(f"Loaded {len(_all_rooms())} rooms from {startup_info['source']} in {startup_info['startup_ms']:.1f} ms")
+
     # Uruchom MQTT w kontekście async
     mqtt.start()
-    asyncio.create_task(turn_off_lights_loop())
-    asyncio.create_task(save_colors_to_db_loop())
-    # Zapisz kolory przy starcie programu
-    await save_current_colors_to_db()
+    # Stan sterowników po restarcie (np. zaniku prądu) może się różnić od zapamiętanego
+    asyncio.create_task(reconciler.reconcile(_all_rooms()))
+    if snapshot is not None:
+        asyncio.create_task(reconcile_with_db())
+    else:
+        await state_snapshot.save()
+    # Zmienione pokoje zapisujemy do bazy co STATE_FLUSH_INTERVAL sekund, migawkę co SNAPSHOT_INTERVAL
+    asyncio.create_task(room_state_persister.run())
+    asyncio.create_task(state_snapshot.run())
+    if config_info['poll_interval'] > 0:
+        asyncio.create_task(watch_config())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await room_state_persister.flush()
+    await state_snapshot.save()
+    await shard.close()
+    await http_client.close()
+    database.close()
+
+
+@app.middleware("http")
+async def shard_forwarding(request: Request, call_next):
+    """Zapytania o dom innego węzła przekazujemy jego właścicielowi"""
+    parts = request.url.path.split('/')
+    if shard.enabled and len(parts) > 2 and parts[1] == 'house' and FORWARDED_HEADER not in request.headers \
+            and not shard.owns(parts[2]):
+        owner_url = shard.owner_url(parts[2])
+        headers = {key: value for key, value in request.headers.items()
+                   if key.lower() not in ('host', 'content-length', 'connection')}
+        path_qs = request.url.path + (f'?{request.url.query}' if request.url.query else '')
+        try:
+            status, body, content_type = await shard.forward(owner_url, request.method, path_qs, await request.body(),
+                                                             headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return JSONResponse({'detail': f'Owner of house {parts[2]} unreachable: {e}'}, status_code=503)
+        return Response(body, status_code=status, media_type=content_type)
+    return await call_next(request)
+
+
+@app.get("/shard/ping")
+async def shard_ping():
+    return {'node': shard.self_name}
+
+
+@app.post("/shard/handoff")
+async def shard_handoff(node: str):
+    """Węzeł `node` przejmuje nasze domy - oddajemy je i zapisujemy ich stan do bazy, zanim go wczyta"""
+    shard.mark_alive(node)
+    released = release_houses()
+    written = await room_state_persister.flush()
+    if released:
+        await state_snapshot.save()
+    return {'node': shard.self_name, 'released': released, 'rows_written': written}
+
+
+@app.get("/shard")
+async def shard_stats():
+    return shard.get_stats(sorted(managers_dict))
 
 
 @app.get("/house/{house_name}/room/{room_name}/detected")
 async def detected_move(house_name: str, room_name: str):
+    """Szybka ścieżka dla czujników PIR - zapis czasu ruchu i natychmiastowa odpowiedź"""
+    managers_dict[house_name][room_name].record_motion()
+    return {"OK": "OK"}
+
+
+@app.get("/house/{house_name}/room/{room_name}/history")
+async def room_history(house_name: str, room_name: str, since: Optional[float] = None, until: Optional[float] = None,
+                       seconds: Optional[float] = None, max_points: Optional[int] = None):
+    """Historia zdarzeń pokoju - since/until to unix timestamp, seconds to okno kończące się teraz"""
     room = managers_dict[house_name][room_name]
-    await room.handle_detected_move()
+    if seconds is not None:
+        since = time.time() - seconds
+    return room.history.query(since, until, max_points)
+
+
+@app.post("/house/{house_name}/room/{room_name}/refresh")
+async def refresh_room(house_name: str, room_name: str):
+    room = managers_dict[house_name][room_name]
+    await room.refresh()
     return {"OK": "OK"}
 
+
+@app.post("/house/{house_name}/effect/{effect_name}")
+async def start_effect(house_name: str, effect_name: str, rooms: Optional[str] = None):
+    """Uruchamia efekt zsynchronizowany na wszystkich (lub wybranych, po przecinku) pokojach domu"""
+    effect = EFFECTS.get(effect_name)
+    if effect is None:
+        raise HTTPException(status_code=404, detail=f"Effect {effect_name} not found, available: {sorted(EFFECTS)}")
+    house = managers_dict[house_name]
+    selected = [house[name] for name in rooms.split(',')] if rooms else list(house.values())
+    run = effect_engine.start(effect(), selected)
+    return run.get_stats()
+
+
+@app.delete("/house/{house_name}/effect")
+async def stop_effect(house_name: str):
+    stopped = effect_engine.stop(list(managers_dict[house_name].values()))
+    return {"stopped": stopped}
+
+
+@app.get("/house/{house_name}/scenes")
+async def list_scenes(house_name: str):
+    return scene_engine.names(house_name)
+
+
+@app.post("/house/{house_name}/scene/{scene_name}")
+async def apply_scene(house_name: str, scene_name: str, force: bool = False):
+    """Nakłada scenę na wszystkie jej pokoje naraz; force wysyła też zapisy, które cache uznałby za zbędne"""
+    if scene_engine.get(house_name, scene_name) is None:
+        raise HTTPException(status_code=404, detail=f"Scene {scene_name} not found in house {house_name}")
+    return await action_handlers.apply_scene(house_name, scene_name, force)
+
+
+@app.get("/state")
+async def get_state(request: Request):
+    """Stan wszystkich pokoi z pamięci; z If-None-Match zwraca 304, jeśli nic się nie zmieniło"""
+    etag = state_stream.etag
+    if request.headers.get('if-none-match') == etag:
+        state_stream.not_modified += 1
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(state_stream.snapshot(), media_type='application/json', headers={'ETag': etag})
+
+
+@app.get("/state/stream")
+async def stream_state():
+    """Zmiany stanu pokoi jako Server-Sent Events (zdarzenia change, a po przepełnieniu kolejki resync)"""
+    return StreamingResponse(state_stream.subscribe_events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/devices/health")
+async def devices_health():
+    return http_client.health.get_stats()
+
+
+@app.post("/devices/reconcile")
+async def reconcile_devices():
+    return await reconciler.reconcile(_all_rooms())
+
+
+@app.get("/stats/reconciliation")
+async def reconciliation_stats():
+    return reconciler.get_stats()
+
+
+@app.get("/stats/coalescing")
+async def coalescing_stats():
+    return {
+        house_name: {room_name: room.adc_coalescer.get_stats() for room_name, room in rooms.items()}
+        for house_name, rooms in managers_dict.items()
+    }
+
+
+@app.get("/stats/adc-filter")
+async def adc_filter_stats():
+    return {
+        house_name: {room_name: room.adc_filter.get_stats() for room_name, room in rooms.items()}
+        for house_name, rooms in managers_dict.items()
+    }
+
+
+@app.get("/stats/transitions")
+async def transition_stats():
+    return {
+        house_name: {room_name: room.transition_planner.get_stats() for room_name, room in rooms.items()}
+        for house_name, rooms in managers_dict.items()
+    }
+
+
+@app.get("/stats/scenes")
+async def scene_stats():
+    return scene_engine.get_stats()
+
+
+@app.get("/stats/state-stream")
+async def state_stream_stats():
+    return state_stream.get_stats()
+
+
+@app.get("/stats/motion")
+async def motion_stats():
+    return {
+        house_name: {room_name: room.get_motion_stats() for room_name, room in rooms.items()}
+        for house_name, rooms in managers_dict.items()
+    }
+
+
+@app.get("/stats/device-cache")
+async def device_cache_stats():
+    return http_client.state_cache.get_stats()
+
+
+@app.get("/stats/effects")
+async def effect_stats():
+    return effect_engine.get_stats()
+
+
+@app.get("/stats/mqtt")
+async def mqtt_stats():
+    return mqtt.get_stats()
+
+
+@app.get("/stats/timers")
+async def timer_stats():
+    return timer_service.get_stats()
+
+
+@app.get("/stats/persistence")
+async def persistence_stats():
+    return room_state_persister.get_stats()
+
+
+@app.get("/stats/database")
+async def database_stats():
+    return database.get_stats()
+
+
+@app.post("/config/reload")
+async def config_reload():
+    return await reload_config()
+
+
+@app.get("/stats/config")
+async def config_stats():
+    return {key: value for key, value in config_info.items() if key != 'fingerprint'}
+
+
+@app.get("/stats/startup")
+async def startup_stats():
+    return dict(startup_info, snapshot=state_snapshot.get_stats())
+
 #
 # @app.get("/house/{house_name}/room/{room_name}/switch/{switch_state}")
 # def switch_change(house_name: str, room_name: str, switch_state: int, db: Session = Depends(get_db)):
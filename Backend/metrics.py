@@ -0,0 +1,128 @@
+"""Minimalne metryki w formacie tekstowym Prometheusa (bez zależności od prometheus_client)."""
+import bisect
+import contextvars
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Czas odebrania wiadomości MQTT, która zapoczątkowała bieżący łańcuch wywołań (time.monotonic)
+MQTT_RECEIVED_AT: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('mqtt_received_at', default=None)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in self.values.items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Dla każdego zestawu etykiet: liczniki kubełków (nieskumulowane), suma, liczba obserwacji
+        self.values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class CallbackMetric:
+    """Metryka liczona w momencie odczytu z istniejących liczników - callback zwraca pary (etykiety, wartość)"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[LabelValues, float]]], type: str = 'gauge'):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type = type
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for labels, value in self.callback():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+DEVICE_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'superled_device_request_seconds', 'Czas zapisu do sterownika (tylko udane)', ('device', 'method')))
+DEVICE_REQUEST_FAILURES = REGISTRY.register(Counter(
+    'superled_device_request_failures_total', 'Nieudane zapisy do sterownika', ('device', 'method', 'reason')))
+MQTT_MESSAGES = REGISTRY.register(Counter(
+    'superled_mqtt_messages_total', 'Odebrane wiadomości MQTT', ('topic',)))
+MQTT_TO_DEVICE_SECONDS = REGISTRY.register(Histogram(
+    'superled_mqtt_to_device_seconds', 'Od odebrania wiadomości MQTT do potwierdzenia zapisu przez sterownik'))
+ADC_THRESHOLD_DROPPED = REGISTRY.register(Counter(
+    'superled_adc_threshold_dropped_total', 'Odczyty ADC odrzucone przez filtr pokoju (szum, deadband)', ('house', 'room')))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    'superled_db_query_seconds', 'Czas zapytania do bazy w wątku puli', ('query',)))
+DB_QUERY_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'superled_db_query_wait_seconds', 'Czas oczekiwania zapytania na wolny wątek puli bazy', ('query',)))
+DB_QUERY_FAILURES = REGISTRY.register(Counter(
+    'superled_db_query_failures_total', 'Nieudane zapytania do bazy', ('query',)))
@@ -1,11 +1,13 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from led_room_manager import LedRoomManager, ColorMode
+from scenes import SceneEngine
 
 
 class ActionHandlers:
-    def __init__(self, managers_dict: Dict[str, Dict[str, LedRoomManager]]):
+    def __init__(self, managers_dict: Dict[str, Dict[str, LedRoomManager]], scene_engine: Optional[SceneEngine] = None):
         self.managers_dict = managers_dict
+        self.scene_engine = scene_engine
 
     async def switch_change(self, house_name: str, room_name: str, switch_state: int):
         is_switched = switch_state == 1
@@ -16,11 +18,14 @@ class ActionHandlers:
 
     async def adc_change_absolute(self, house_name: str, room_name: str, adc_value: float, mode:  ColorMode | None):  # adc_value 0-1
         room = self.managers_dict[house_name][room_name]
-        await room.change_adc(adc_value, mode, True)
+        await room.submit_adc(adc_value, mode, True)
         return {"OK": "OK"}
 
     async def adc_change(self, house_name: str, room_name: str, adc_value: int):
         adc_value = int(adc_value)
         room = self.managers_dict[house_name][room_name]
-        await room.change_adc(adc_value)
+        await room.submit_adc(adc_value)
         return {"OK": "OK"}
+
+    async def apply_scene(self, house_name: str, scene_name: str, force: bool = False):
+        return await self.scene_engine.apply(house_name, self.managers_dict[house_name], scene_name, force)
@@ -1,26 +1,35 @@
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from db.models.room import Room, ColorType
 from led_room_manager import ColorMode
 from mqtt.ActionHandlers import ActionHandlers
-from mqtt.MQTTManager import MQTTManager
+from mqtt.MQTTManager import MQTTManager, Handler
+from mqtt.binary_payload import SWITCH_UNKNOWN, BinaryFrameError, SequenceTracker, decode_frame, is_binary_frame
+
+CUSTOM_TOPIC_FILTER = 'custom/update/+/+'
+SCENE_TOPIC_FILTER = 'custom/scene/+'
 
 
 class LedMQTT:
     def __init__(self, action_handler: ActionHandlers):
         self.action_handler = action_handler
         self.mqtt = MQTTManager()
-        self.rooms = []
-        for house_name, rooms in self.action_handler.managers_dict.items():
-            for room in rooms.values():
-                # if room.room.mqtt_topic:
-                self.rooms.append((house_name, room.room))
+        self.started = False
+        # W trybie shardingu tematy domu subskrybujemy przez $share/{prefix}-{dom}/... tylko na właścicielu domu
+        self.share_group_prefix: Optional[str] = None
+        # custom/update/{house}/{room} -> handler, budowane raz przy starcie
+        self.custom_handlers: Dict[Tuple[str, str], Handler] = {}
+        self.sequence_trackers: Dict[Tuple[str, str], SequenceTracker] = {}
+        self.switch_states: Dict[Tuple[str, str], int] = {}  # ostatni stan przełącznika z ramek binarnych
+        self.binary_frames = 0
+        self.binary_samples = 0
+        self.binary_errors = 0
 
     def get_room_milight_event_cct(self, house_name: str, room: Room, const_mode=True):
         room_name = room.name
 
-        async def on_milight_event_cct(payload: str, topic: str):
+        async def on_milight_event_cct(payload: bytes, topic: str):
             obj = json.loads(payload)
             if "brightness" in obj:
                 brightness = obj['brightness']
@@ -49,7 +58,14 @@ class LedMQTT:
     def get_room_custom_event_cct(self, house_name: str, room: Room):
         room_name = room.name
 
-        async def on_custom_event_cct(payload: str, topic: str):
+        tracker = self.sequence_trackers.setdefault((house_name, room_name), SequenceTracker())
+
+        async def on_custom_event_cct(payload: bytes, topic: str):
+            if is_binary_frame(payload):
+                await self.handle_binary_frame(house_name, room_name, tracker, payload)
+                return
+
+            # JSON - dotychczasowy format, zostaje jako fallback
             obj = json.loads(payload)
             if "adc" in obj:
                 adc_value = int(obj['adc'])
@@ -63,17 +79,112 @@ class LedMQTT:
 
         return on_custom_event_cct
 
+    async def handle_binary_frame(self, house_name: str, room_name: str, tracker: SequenceTracker, payload: bytes):
+        try:
+            seq, samples = decode_frame(payload)
+            self.binary_frames += 1
+            # Z kolejnych próbek ADC wystarczy ostatnia - zmiana przełącznika wymusza wysłanie wcześniejszej
+            pending_adc: Optional[int] = None
+            key = (house_name, room_name)
+            for i, (adc_value, switch) in enumerate(samples):
+                self.binary_samples += 1
+                if not tracker.accept((seq + i) & 0xFFFF):
+                    continue
+                if switch != SWITCH_UNKNOWN and key not in self.switch_states:
+                    # Pierwsza ramka po starcie albo dodaniu pokoju - to stan przełącznika, a nie jego zmiana
+                    self.switch_states[key] = switch
+                elif switch != SWITCH_UNKNOWN and switch != self.switch_states[key]:
+                    self.switch_states[key] = switch
+                    if pending_adc is not None:
+                        await self.action_handler.adc_change(house_name, room_name, pending_adc)
+                        pending_adc = None
+                    await self.action_handler.switch_change(house_name, room_name, switch)
+                pending_adc = adc_value
+            if pending_adc is not None:
+                await self.action_handler.adc_change(house_name, room_name, pending_adc)
+        except BinaryFrameError as e:
+            self.binary_errors += 1
+            print(f"Invalid binary frame for {house_name}/{room_name}: {e}")
+
+    def get_stats(self) -> dict:
+        stats = self.mqtt.get_stats()
+        stats['binary_frames'] = self.binary_frames
+        stats['binary_samples'] = self.binary_samples
+        stats['binary_errors'] = self.binary_errors
+        stats['out_of_order_dropped'] = sum(tracker.dropped for tracker in self.sequence_trackers.values())
+        return stats
+
+    def share_group(self, house_name: str) -> Optional[str]:
+        return f'{self.share_group_prefix}-{house_name}' if self.share_group_prefix else None
+
+    def add_house(self, house_name: str):
+        if self.share_group_prefix:
+            self.mqtt.subscribe_topic(f'custom/update/{house_name}/+', self.share_group(house_name))
+            self.mqtt.subscribe_topic(f'custom/scene/{house_name}', self.share_group(house_name))
+
+    def remove_house(self, house_name: str):
+        if self.share_group_prefix:
+            self.mqtt.unsubscribe_topic(f'custom/update/{house_name}/+')
+            self.mqtt.unsubscribe_topic(f'custom/scene/{house_name}')
+
+    def add_room(self, house_name: str, room: Room):
+        if room.mqtt_topic:
+            print(f'subscribing mqtt for {room.name} in {house_name} on topic {room.mqtt_topic}')
+            if room.type == ColorType.CCT_BLEBOX:
+                handler = self.get_room_milight_event_cct(house_name, room)
+            else:
+                handler = self.get_room_milight_event_cct(house_name, room, False)
+            self.mqtt.subscribe_coroutine(room.mqtt_topic, handler, self.share_group(house_name))
+
+        self.custom_handlers[(house_name, room.name)] = self.get_room_custom_event_cct(house_name, room)
+
+    def remove_room(self, house_name: str, room: Room):
+        if room.mqtt_topic:
+            self.mqtt.unsubscribe(room.mqtt_topic)
+        self.custom_handlers.pop((house_name, room.name), None)
+        self.sequence_trackers.pop((house_name, room.name), None)
+        self.switch_states.pop((house_name, room.name), None)
+
     def start(self):
         self.mqtt.connect_mqtt()
-        for house_name, room in self.rooms:
-            if room.mqtt_topic:
-                print(f'subscribing mqtt for {room.name} in {house_name} on topic {room.mqtt_topic}')
-                if room.type == ColorType.CCT_BLEBOX:
-                    self.mqtt.subscribe_coroutine(room.mqtt_topic, self.get_room_milight_event_cct(house_name, room))
-                else:
-                    self.mqtt.subscribe_coroutine(room.mqtt_topic, self.get_room_milight_event_cct(house_name, room, False))
-
-            custom_topic = f"custom/update/{house_name}/{room.name}"
-            print(f'subscribing mqtt for {room.name} in {house_name} on topic {custom_topic}')
-            self.mqtt.subscribe_coroutine(custom_topic, self.get_room_custom_event_cct(house_name, room))
+        for house_name, rooms in self.action_handler.managers_dict.items():
+            for room in rooms.values():
+                self.add_room(house_name, room.room)
+
+        # Jeden handler na wszystkie pokoje - routing po sparsowanym temacie
+        self.mqtt.route(CUSTOM_TOPIC_FILTER, self.on_custom_update)
+        self.mqtt.route(SCENE_TOPIC_FILTER, self.on_scene)
+        if self.share_group_prefix:
+            for house_name in self.action_handler.managers_dict:
+                self.add_house(house_name)
+        else:
+            print(f'subscribing mqtt for {len(self.custom_handlers)} rooms on topic {CUSTOM_TOPIC_FILTER}')
+            self.mqtt.subscribe_topic(CUSTOM_TOPIC_FILTER)
+            self.mqtt.subscribe_topic(SCENE_TOPIC_FILTER)
         self.mqtt.run()
+        self.started = True
+
+    async def on_custom_update(self, payload: bytes, topic: str):
+        parts = topic.split('/')  # custom/update/{house}/{room}
+        handler = self.custom_handlers.get((parts[2], parts[3])) if len(parts) == 4 else None
+        if handler is None:
+            print(f"No room for topic {topic}")
+            return
+        await handler(payload, topic)
+
+    async def on_scene(self, payload: bytes, topic: str):
+        """custom/scene/{house} - nazwa sceny tekstem albo JSON {"scene": ..., "force": ...}"""
+        house_name = topic.split('/')[2]
+        text = payload.decode().strip()
+        force = False
+        if text.startswith('{'):
+            obj = json.loads(text)
+            text = obj['scene']
+            force = bool(obj.get('force', False))
+        if house_name not in self.action_handler.managers_dict:
+            print(f"No house for topic {topic}")
+            return
+        try:
+            await self.action_handler.apply_scene(house_name, text, force)
+        except KeyError:
+            print(f"Unknown scene {text} for house {house_name}")
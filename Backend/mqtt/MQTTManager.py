@@ -1,74 +1,243 @@
 import asyncio
 import os
-from collections import defaultdict
+import threading
+import time
 from random import randint
-from typing import Callable, Any, Coroutine
+from typing import Callable, Any, Coroutine, Dict, List, Optional, Tuple
 
 from paho.mqtt import client as mqtt_client
 
+from metrics import MQTT_MESSAGES, MQTT_RECEIVED_AT
+
+Handler = Callable[[bytes, str], Coroutine[Any, Any, None]]
+
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = float(os.getenv('MQTT_RECONNECT_MAX_DELAY', 60))
+
 
 class MQTTManager:
+    """Klient MQTT działający bezpośrednio na pętli asyncio (bez wątku paho).
+
+    Socket paho jest podpięty pod add_reader/add_writer pętli, wiadomości trafiają do ograniczonej
+    kolejki, a workery rozsyłają je do handlerów przez słownik tematów. Łączenie z brokerem (blokujące
+    w paho) wykonuje się w wątku executora, żeby wolny lub niedostępny broker nie wstrzymywał pętli.
+    """
+
     def __init__(self):
-        self.event_loop = None
-        self.client:mqtt_client
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client: Optional[mqtt_client.Client] = None
         self.host = os.getenv('MQTT_HOST')
         self.login = os.getenv('MQTT_LOGIN')
         self.password = os.getenv('MQTT_PASSWORD')
         self.port = 1883
         self.client_id = f'ledbackend-{randint(0, 1000)}'
 
+        self.queue_size = int(os.getenv('MQTT_QUEUE_SIZE', 1000))
+        # drop_oldest - przy przepełnieniu wyrzucamy najstarszą wiadomość, drop_newest - odrzucamy nową
+        self.overflow_policy = os.getenv('MQTT_OVERFLOW_POLICY', 'drop_oldest')
+        self.worker_count = int(os.getenv('MQTT_WORKERS', 16))
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+        self.routes: Dict[str, Handler] = {}  # dokładne tematy - O(1)
+        self.wildcard_routes: List[Tuple[str, Handler]] = []  # filtry z + lub #, sprawdzane po kolei
+        self.subscriptions: Dict[str, str] = {}  # temat/filtr -> temat subskrypcji u brokera (np. z $share)
+        self.connected = False
+        self.loop_thread: Optional[int] = None
+        self.reconnects = 0
+        self.reconnect_delay = 0.0  # 0 = łączymy od razu; rośnie wykładniczo do udanego CONNACK
+
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.unrouted = 0
+        self.errors = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.started_at = time.monotonic()
+
     def connect_mqtt(self):
+        self.event_loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self.host:
+            # Bez brokera działa tylko inject() - lokalne uruchomienia i benchmarki
+            print("MQTT_HOST not set, MQTT broker connection disabled")
+            return
+
         def on_connect(client, userdata, flags, rc):
             if rc == 0:
                 print("Connected to MQTT Broker!")
+                self.connected = True
+                self.reconnect_delay = 0.0
+                # Po ponownym połączeniu broker nie pamięta subskrypcji
+                for broker_topic in self.subscriptions.values():
+                    client.subscribe(broker_topic)
             else:
                 print("Failed to connect, return code %d\n", rc)
 
+        def on_disconnect(client, userdata, rc):
+            self.connected = False
+            print(f"Disconnected from MQTT Broker (rc={rc})")
+
+        def on_message(client, userdata, msg):
+            self._enqueue(msg.topic, msg.payload)
+
+        # Integracja socketu paho z pętlą zdarzeń zamiast loop_start() w osobnym wątku
+        def on_socket_open(client, userdata, sock):
+            self._on_loop(self.event_loop.add_reader, sock, client.loop_read)
+
+        def on_socket_close(client, userdata, sock):
+            self._on_loop(self.event_loop.remove_reader, sock)
+
+        def on_socket_register_write(client, userdata, sock):
+            self._on_loop(self.event_loop.add_writer, sock, client.loop_write)
+
+        def on_socket_unregister_write(client, userdata, sock):
+            self._on_loop(self.event_loop.remove_writer, sock)
+
         client = mqtt_client.Client(client_id=self.client_id)
 
         client.username_pw_set(self.login, self.password)
         client.on_connect = on_connect
-        client.connect(self.host, self.port)
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
+        client.on_socket_open = on_socket_open
+        client.on_socket_close = on_socket_close
+        client.on_socket_register_write = on_socket_register_write
+        client.on_socket_unregister_write = on_socket_unregister_write
+        # Tylko zapamiętanie adresu - samo połączenie nawiązuje _misc_loop w wątku executora
+        client.connect_async(self.host, self.port)
         self.client = client
 
-    def subscribe_coroutine(self, topic: str, handler: Callable[[Any, str],  Coroutine[Any, Any, None]]):
-        def on_message(client, userdata, msg):
-            payload = msg.payload.decode()
-            print(f"Received `{payload}` from `{msg.topic}` topic")
-            try:
-                if self.event_loop and not self.event_loop.is_closed():
-                    asyncio.run_coroutine_threadsafe(handler(payload, msg.topic), self.event_loop)
-                else:
-                    print("Event loop is not available or closed")
-            except Exception as e:
-                print(f"Error running coroutine: {e}")
+    def _on_loop(self, callback: Callable[..., Any], *args: Any) -> None:
+        # Callbacki socketu paho przychodzą też z wątku łączenia - rejestracja w pętli musi być thread-safe
+        if threading.get_ident() == self.loop_thread:
+            callback(*args)
+        else:
+            self.event_loop.call_soon_threadsafe(callback, *args)
 
-        self.client.subscribe(topic)
-        self.client.message_callback_add(topic, on_message)
+    def _enqueue(self, topic: str, payload: bytes) -> None:
+        self.received += 1
+        MQTT_MESSAGES.inc(topic)
+        item = (time.monotonic(), topic, payload)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.overflow_policy == 'drop_oldest':
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.queue.put_nowait(item)
 
-    def subscribe(self, topic: str, handler: Callable[[Any, str], None]):
-        def on_message(client, userdata, msg):
-            payload = msg.payload.decode()
-            print(f"Received `{payload}` from `{msg.topic}` topic")
-            handler(payload, msg.topic)
+    def inject(self, topic: str, payload: bytes) -> None:
+        """Podaje wiadomość tak, jakby przyszła z brokera (testy, benchmarki, transport zastępczy)"""
+        self._enqueue(topic, payload)
 
-        self.client.subscribe(topic)
-        self.client.message_callback_add(topic, on_message)
-        # self.client.on_message = on_message
+    def _resolve(self, topic: str) -> Optional[Handler]:
+        handler = self.routes.get(topic)
+        if handler is not None:
+            return handler
+        for topic_filter, handler in self.wildcard_routes:
+            if mqtt_client.topic_matches_sub(topic_filter, topic):
+                return handler
+        return None
 
-    def run(self):
-        try:
-            # Użyj get_running_loop() zamiast get_event_loop()
-            self.event_loop = asyncio.get_running_loop()
-            print(f"Using running event loop: {self.event_loop}")
-        except RuntimeError:
-            print("No running event loop found, trying to get current loop")
+    def route(self, topic: str, handler: Handler):
+        """Sam routing wiadomości do handlera - bez subskrypcji u brokera"""
+        if '+' in topic or '#' in topic:
+            self.wildcard_routes.append((topic, handler))
+        else:
+            self.routes[topic] = handler
+
+    def subscribe_topic(self, topic: str, share_group: Optional[str] = None):
+        """Subskrypcja u brokera; z share_group wiadomość dostaje tylko jeden członek grupy ($share)"""
+        broker_topic = f'$share/{share_group}/{topic}' if share_group else topic
+        old = self.subscriptions.get(topic)
+        if old == broker_topic:
+            return
+        self.subscriptions[topic] = broker_topic
+        if self.connected:
+            if old is not None:
+                self.client.unsubscribe(old)
+            self.client.subscribe(broker_topic)
+
+    def unsubscribe_topic(self, topic: str):
+        broker_topic = self.subscriptions.pop(topic, None)
+        if broker_topic is not None and self.connected:
+            self.client.unsubscribe(broker_topic)
+
+    def subscribe_coroutine(self, topic: str, handler: Handler, share_group: Optional[str] = None):
+        self.route(topic, handler)
+        self.subscribe_topic(topic, share_group)
+
+    def unsubscribe(self, topic: str):
+        if self.routes.pop(topic, None) is None:
+            self.wildcard_routes = [(f, h) for f, h in self.wildcard_routes if f != topic]
+        self.unsubscribe_topic(topic)
+
+    def subscribe(self, topic: str, handler: Callable[[bytes, str], None]):
+        async def async_handler(payload: bytes, topic: str):
+            handler(payload, topic)
+
+        self.subscribe_coroutine(topic, async_handler)
+
+    async def _worker(self) -> None:
+        while True:
+            received_at, topic, payload = await self.queue.get()
+            lag = time.monotonic() - received_at
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            token = MQTT_RECEIVED_AT.set(received_at)
             try:
-                self.event_loop = asyncio.get_event_loop()
-                print(f"Using current event loop: {self.event_loop}")
-            except RuntimeError as e:
-                print(f"Could not get event loop: {e}")
-                return
-        
-        self.client.loop_start()
+                handler = self._resolve(topic)
+                if handler is None:
+                    self.unrouted += 1
+                    continue
+                await handler(payload, topic)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error handling MQTT message from `{topic}`: {e}")
+            finally:
+                MQTT_RECEIVED_AT.reset(token)
+                self.queue.task_done()
+
+    async def _misc_loop(self) -> None:
+        # Keepalive/ping paho oraz (ponowne) łączenie z wykładniczym odstępem między nieudanymi próbami
+        while True:
+            if self.client.loop_misc() == mqtt_client.MQTT_ERR_NO_CONN:
+                if self.reconnect_delay:
+                    await asyncio.sleep(self.reconnect_delay)
+                self.reconnect_delay = min(max(self.reconnect_delay * 2, RECONNECT_MIN_DELAY), RECONNECT_MAX_DELAY)
+                self.reconnects += 1
+                try:
+                    await self.event_loop.run_in_executor(None, self.client.reconnect)
+                except Exception as e:
+                    print(f"MQTT connect failed, next attempt in {self.reconnect_delay:.0f} s: {e}")
+                continue
+            await asyncio.sleep(1)
+
+    def run(self):
+        for _ in range(self.worker_count):
+            self.tasks.append(self.event_loop.create_task(self._worker()))
+        if self.client is not None:
+            self.tasks.append(self.event_loop.create_task(self._misc_loop()))
         print("MQTT client loop started")
+
+    def get_stats(self) -> dict:
+        handled = self.processed + self.errors + self.unrouted
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'received': self.received,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'unrouted': self.unrouted,
+            'errors': self.errors,
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'messages_per_second': self.received / elapsed,
+            'lag_avg_ms': self.lag_total / handled * 1000 if handled else 0.0,
+            'lag_max_ms': self.lag_max * 1000,
+        }
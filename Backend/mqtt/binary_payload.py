@@ -0,0 +1,70 @@
+"""Kompaktowy binarny format wiadomości custom/update, przyjmowany obok JSON-a.
+
+Ramka w wersji 1 (little endian):
+
+    bajt 0       wersja formatu (0x01) - JSON zaczyna się od '{', więc formatów nie da się pomylić
+    bajt 1       liczba próbek N
+    bajty 2-3    numer sekwencyjny pierwszej próbki (uint16), kolejne próbki mają seq+1, seq+2, ...
+    N x 3 bajty  próbka: ADC (uint16) + stan przełącznika (uint8: 0/1, 0xFF = brak informacji)
+"""
+import struct
+import time
+from typing import Iterator, Optional, Sequence, Tuple
+
+FRAME_VERSION = 1
+HEADER = struct.Struct('<BBH')
+SAMPLE = struct.Struct('<HB')
+SWITCH_UNKNOWN = 0xFF
+
+
+class BinaryFrameError(ValueError):
+    pass
+
+
+def is_binary_frame(payload: bytes) -> bool:
+    return len(payload) >= HEADER.size and payload[0] == FRAME_VERSION
+
+
+def decode_frame(payload: bytes) -> Tuple[int, Iterator[Tuple[int, int]]]:
+    """Zwraca numer sekwencyjny pierwszej próbki i iterator (adc, switch) czytający bufor bez kopiowania"""
+    version, count, seq = HEADER.unpack_from(payload, 0)
+    if version != FRAME_VERSION:
+        raise BinaryFrameError(f"Unsupported frame version {version}")
+    end = HEADER.size + count * SAMPLE.size
+    if len(payload) < end:
+        raise BinaryFrameError(f"Truncated frame: {len(payload)} < {end} bytes")
+    return seq, SAMPLE.iter_unpack(memoryview(payload)[HEADER.size:end])
+
+
+def encode_frame(seq: int, samples: Sequence[Tuple[int, int]]) -> bytes:
+    """Buduje ramkę - odpowiednik tego, co wysyła firmware (używane w testach i symulacjach)"""
+    frame = bytearray(HEADER.size + len(samples) * SAMPLE.size)
+    HEADER.pack_into(frame, 0, FRAME_VERSION, len(samples), seq & 0xFFFF)
+    for i, (adc, switch) in enumerate(samples):
+        SAMPLE.pack_into(frame, HEADER.size + i * SAMPLE.size, adc, switch)
+    return bytes(frame)
+
+
+class SequenceTracker:
+    """Odrzuca próbki spoza kolejności i duplikaty, z uwzględnieniem przekręcenia licznika uint16.
+
+    Jeśli przez `resync_seconds` nic nie przyszło (np. restart urządzenia zeruje licznik),
+    przyjmujemy dowolny numer i liczymy od niego.
+    """
+
+    def __init__(self, resync_seconds: float = 5.0):
+        self.resync_seconds = resync_seconds
+        self.last_seq: Optional[int] = None
+        self.last_time = 0.0
+        self.dropped = 0
+
+    def accept(self, seq: int) -> bool:
+        now = time.monotonic()
+        if self.last_seq is not None and now - self.last_time < self.resync_seconds:
+            diff = (seq - self.last_seq) & 0xFFFF
+            if not 0 < diff < 0x8000:
+                self.dropped += 1
+                return False
+        self.last_seq = seq
+        self.last_time = now
+        return True
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Optional
+
+from db.models.room import ColorType
+from device_health import device_key
+from http_client import DeviceHttpClient
+from led_room_manager import LedRoomManager
+
+
+def same_color(actual: str, desired: str) -> bool:
+    # BleBox zwraca kolor w tylu kanałach, ile ma sterownik - nadmiarowe kanały muszą być wyłączone
+    actual = actual.lower()
+    desired = desired.lower()
+    width = max(len(actual), len(desired))
+    return actual.ljust(width, '0') == desired.ljust(width, '0')
+
+
+class DeviceReconciler:
+    """Odczytuje stan sterowników i wysyła zapisy tylko tam, gdzie różni się od stanu pokoju.
+
+    Wszystkie odczyty idą równolegle przez wspólną pulę. Urządzenia zgodne ze stanem pokoju trafiają
+    do cache stanu (kolejny identyczny zapis zostanie pominięty), niezgodne dostają resync_device.
+    Niedostępne urządzenia pomijamy - po powrocie circuit breaker wywoła uzgodnienie ponownie.
+    """
+
+    def __init__(self, http_client: DeviceHttpClient):
+        self.http_client = http_client
+        self.runs = 0
+        self.checked = 0
+        self.in_sync = 0  # zapisy zaoszczędzone względem wysłania wszystkiego od nowa
+        self.corrected = 0
+        self.unreachable = 0
+        self.last_run_ms = 0.0
+
+    async def reconcile(self, rooms: Iterable[LedRoomManager], device: Optional[str] = None) -> dict:
+        """Uzgadnia wszystkie urządzenia pokoi albo tylko `device` (klucz z device_key)"""
+        started = time.monotonic()
+        leds: Dict[str, LedRoomManager] = {}
+        closets: Dict[str, LedRoomManager] = {}
+        for room in rooms:
+            if room.effect_engine.is_running(room):
+                continue
+            for url in room.urls:
+                # Każdy sterownik sprawdzamy raz, nawet jeśli jest w kilku pokojach
+                if (device is None or device_key(url) == device) and url not in leds:
+                    leds[url] = room
+            if room.color_type == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
+                for ip in room.closet_urls:
+                    # Szafki są wspólne - o ich stanie decyduje pierwszy pokój z szafkami
+                    if (device is None or device_key(ip) == device) and ip not in closets:
+                        closets[ip] = room
+        checks = [self._check_led(room, url) for url, room in leds.items()]
+        checks.extend(self._check_closet(room, ip) for ip, room in closets.items())
+
+        results = await asyncio.gather(*checks)
+        summary = {outcome: results.count(outcome) for outcome in ('in_sync', 'corrected', 'unreachable')}
+        self.runs += 1
+        self.last_run_ms = (time.monotonic() - started) * 1000
+        print(f"Reconciled {len(results)} devices in {self.last_run_ms:.0f} ms: {summary}")
+        return summary
+
+    async def _check_led(self, room: LedRoomManager, url: str) -> str:
+        desired = room.device_color()
+        try:
+            state = await self.http_client.get_json(f'{url}/api/rgbw/state')
+        except Exception:
+            return self._count('unreachable')
+        actual = state.get('rgbw', {}).get('desiredColor') if isinstance(state, dict) else None
+        if isinstance(actual, str) and same_color(actual, desired):
+            self.http_client.state_cache.store(url, desired)
+            return self._count('in_sync')
+        await room.resync_device(device_key(url))
+        return self._count('corrected')
+
+    async def _check_closet(self, room: LedRoomManager, ip: str) -> str:
+        desired = room.closet_state()
+        url = f'{ip}/json/state'
+        try:
+            state = await self.http_client.get_json(url)
+        except Exception:
+            return self._count('unreachable')
+        if isinstance(state, dict) and state.get('on') == desired['on'] and \
+                (not desired['on'] or int(state.get('bri', -1)) == desired['bri']):
+            # Ten sam klucz stanu co w _set_closet_color
+            self.http_client.state_cache.store(url, f"{desired['on']}:{desired['bri']}")
+            return self._count('in_sync')
+        await room.resync_device(device_key(ip))
+        return self._count('corrected')
+
+    def _count(self, outcome: str) -> str:
+        self.checked += 1
+        if outcome == 'in_sync':
+            self.in_sync += 1
+        elif outcome == 'corrected':
+            self.corrected += 1
+        else:
+            self.unreachable += 1
+        return outcome
+
+    def get_stats(self) -> dict:
+        return {
+            'runs': self.runs,
+            'checked': self.checked,
+            'in_sync': self.in_sync,
+            'corrected': self.corrected,
+            'unreachable': self.unreachable,
+            'writes_saved': self.in_sync,
+            'last_run_ms': self.last_run_ms,
+        }
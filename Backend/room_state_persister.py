@@ -0,0 +1,101 @@
+import asyncio
+import os
+from typing import Dict, List
+
+from db.async_db import AsyncDatabase
+from led_room_manager import LedRoomManager
+
+# Zmiany tych pól oznaczają pokój do zapisu w bazie
+PERSISTED_FIELDS = ('color', 'closet_brightness')
+
+
+class RoomStatePersister:
+    """Zapis stanu pokoi w tle (write-behind).
+
+    Pokoje są oznaczane jako zmienione przy zmianie koloru lub jasności szafki, a flush zapisuje
+    tylko je - jednym bulk UPDATE po kluczu głównym w jednej transakcji, w puli wątków bazy.
+    Gdy bulk się nie uda, zapisujemy wiersz po wierszu: pokoje usunięte z bazy odpadają, a wiersze
+    z błędem wracają do następnego flusha, najwyżej STATE_FLUSH_MAX_RETRIES razy.
+    """
+
+    def __init__(self, database: AsyncDatabase):
+        self.database = database
+        self.interval = float(os.getenv('STATE_FLUSH_INTERVAL', 30))
+        self.dirty: Dict[int, LedRoomManager] = {}
+        self.max_retries = int(os.getenv('STATE_FLUSH_MAX_RETRIES', 5))
+        self.retries: Dict[int, int] = {}  # id pokoju -> nieudane próby zapisu z rzędu
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self._lock = asyncio.Lock()
+
+    def watch(self, manager: LedRoomManager) -> None:
+        manager.state_listeners.append(self.on_state_changed)
+
+    def on_state_changed(self, manager: LedRoomManager, field: str) -> None:
+        if field in PERSISTED_FIELDS:
+            self.dirty[manager.room_id] = manager
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.dirty:
+                return 0
+            managers = self.dirty
+            self.dirty = {}
+            # Migawkę stanu robimy w pętli zdarzeń, do wątku trafiają już gotowe wiersze
+            rows = [
+                {'id': room_id, 'desired_color': str(manager.color), 'closet_brightness': manager.closet_brightness}
+                for room_id, manager in managers.items()
+            ]
+            try:
+                await self.database.update_rooms(rows)
+            except Exception as e:
+                print(f"Błąd podczas zapisywania stanu pokoi do bazy, zapis wiersz po wierszu: {e}")
+                written = await self._flush_each(managers, rows)
+                if written == 0:
+                    return 0
+            else:
+                written = len(rows)
+                for room_id in managers:
+                    self.retries.pop(room_id, None)
+
+            self.flushes += 1
+            self.rows_written += written
+            print(f"Zapisano stan {written} pokoi do bazy danych")
+            return written
+
+    async def _flush_each(self, managers: Dict[int, LedRoomManager], rows: List[dict]) -> int:
+        try:
+            missing, failed = await self.database.update_rooms_each(rows)
+        except Exception as e:
+            # Baza w ogóle nie odpowiada - nic nie wiemy o wierszach, więc nie liczymy tego jako próby
+            print(f"Błąd podczas zapisywania stanu pokoi do bazy: {e}")
+            for room_id, manager in managers.items():
+                self.dirty.setdefault(room_id, manager)
+            return 0
+        for room_id in missing:
+            print(f"Pokoju {room_id} nie ma już w bazie, pomijam jego stan")
+            self.retries.pop(room_id, None)
+            self.rows_dropped += 1
+        for room_id in failed:
+            attempts = self.retries.get(room_id, 0) + 1
+            if attempts > self.max_retries:
+                print(f"Porzucam zapis stanu pokoju {room_id} po {self.max_retries} nieudanych próbach")
+                self.retries.pop(room_id, None)
+                self.rows_dropped += 1
+                continue
+            self.retries[room_id] = attempts
+            # Nie gubimy zmian - trafią do następnego flusha (chyba że pokój zmienił się w międzyczasie)
+            self.dirty.setdefault(room_id, managers[room_id])
+        for room_id in managers.keys() - set(missing) - set(failed):
+            self.retries.pop(room_id, None)
+        return len(rows) - len(missing) - len(failed)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def get_stats(self) -> dict:
+        return {'dirty': len(self.dirty), 'flushes': self.flushes, 'rows_written': self.rows_written,
+                'rows_dropped': self.rows_dropped, 'retrying': len(self.retries)}
@@ -0,0 +1,61 @@
+"""Lokalne uruchomienie trybu shardingu - kilka procesów uvicorn, każdy z częścią domów.
+
+Uruchomienie (z katalogu Backend):
+    python run_sharded.py --workers 3 --base-port 8001
+
+Wszystkie procesy dzielą bazę (DB_CONFIG) i broker MQTT z .env, każdy ma własną migawkę stanu.
+Zatrzymanie jednego procesu (kill) przenosi jego domy na pozostałe po SHARD_FAILURE_THRESHOLD pingach.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Lokalny klaster shardów')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=8001)
+    args = parser.parse_args()
+
+    names = [f'w{i}' for i in range(args.workers)]
+    ports = {name: args.base_port + i for i, name in enumerate(names)}
+    workers = ','.join(f'{name}=http://{args.host}:{port}' for name, port in ports.items())
+
+    # SIGTERM jak Ctrl-C - zamykamy procesy robocze po kolei
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    processes = {}
+    for name in names:
+        env = dict(os.environ, SHARD_WORKERS=workers, SHARD_SELF=name,
+                   STATE_SNAPSHOT_PATH=f'state_snapshot_{name}.json')
+        command = [sys.executable, '-m', 'uvicorn', 'main:app', '--host', args.host, '--port', str(ports[name])]
+        processes[name] = subprocess.Popen(command, env=env)
+        print(f'{name}: http://{args.host}:{ports[name]} (pid {processes[name].pid})')
+
+    try:
+        running = set(names)
+        while running:
+            time.sleep(0.5)
+            for name in sorted(running):
+                if processes[name].poll() is not None:
+                    print(f'{name} exited with code {processes[name].returncode}')
+                    running.discard(name)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
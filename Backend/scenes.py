@@ -0,0 +1,158 @@
+import asyncio
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from color import Color
+from db.models.house import House
+from db.models.room import ColorType
+from db.models.scene import Scene
+from http_client import DeviceHttpClient
+from led_room_manager import LedRoomManager, record_device_request
+
+OFF_SCENE = 'off'  # wbudowana - gasi wszystkie pokoje i szafki domu, nie trzeba jej zapisywać w bazie
+
+
+class SceneRoomTarget(NamedTuple):
+    room_id: int
+    is_on: bool
+    color: Optional[str]  # kolor w formacie BleBox, None = pokój zostaje przy swoim kolorze
+    closet_brightness: Optional[int]
+
+
+class SceneDefinition(NamedTuple):
+    name: str
+    fade_ms: int
+    rooms: Optional[List[SceneRoomTarget]]  # None = wszystkie pokoje domu wyłączone
+
+
+class DeviceWrite(NamedTuple):
+    device: str
+    method: str
+    url: str
+    payload: Optional[dict]  # None = GET bez treści (BleBox)
+    cache_key: str
+    state: str
+
+
+def scene_definition(scene: Scene) -> SceneDefinition:
+    """Kopia sceny spoza sesji - do pamięci podręcznej silnika scen"""
+    rooms = [SceneRoomTarget(int(entry.room_id), bool(entry.is_on), entry.desired_color, entry.closet_brightness)
+             for entry in scene.rooms]
+    return SceneDefinition(str(scene.name), int(scene.fade_ms if scene.fade_ms is not None else 300), rooms)
+
+
+class SceneEngine:
+    """Nakłada scenę na cały dom jednym rzutem zapisów.
+
+    Najpierw ustawia stan wszystkich pokoi sceny (bez wysyłania), potem wylicza po jednym zapisie na
+    urządzenie - sterownik wspólny dla kilku pokoi i szafki dostają jeden zapis - i wysyła wszystkie
+    równolegle przez wspólną pulę połączeń. Definicje scen trzymamy w pamięci, odświeżane z bazy
+    razem z konfiguracją domów.
+    """
+
+    def __init__(self, http_client: DeviceHttpClient):
+        self.http_client = http_client
+        self.scenes: Dict[str, Dict[str, SceneDefinition]] = {}
+        self.applied = 0
+        self.device_writes = 0
+        self.failed_writes = 0
+        self.last_apply_ms = 0.0
+
+    def load(self, houses: List[House]) -> None:
+        self.scenes = {str(house.name): {str(scene.name): scene_definition(scene) for scene in house.scenes}
+                       for house in houses}
+
+    def names(self, house_name: str) -> List[str]:
+        return sorted(set(self.scenes.get(house_name, {})) | {OFF_SCENE})
+
+    def get(self, house_name: str, scene_name: str) -> Optional[SceneDefinition]:
+        scene = self.scenes.get(house_name, {}).get(scene_name)
+        if scene is None and scene_name == OFF_SCENE:
+            return SceneDefinition(OFF_SCENE, 300, None)
+        return scene
+
+    def plan(self, rooms: Dict[str, LedRoomManager], scene: SceneDefinition) -> List[DeviceWrite]:
+        """Ustawia stan pokoi sceny i zwraca zapisy do urządzeń, po jednym na urządzenie"""
+        by_id = {manager.room_id: manager for manager in rooms.values()}
+        targets = scene.rooms
+        if targets is None:
+            targets = [SceneRoomTarget(manager.room_id, False, None, None) for manager in rooms.values()]
+
+        leds: Dict[str, DeviceWrite] = {}
+        closets: Dict[str, int] = {}
+        for target in targets:
+            manager = by_id.get(target.room_id)
+            if manager is None:
+                continue  # pokój usunięty z domu albo obsługiwany gdzie indziej
+            color = Color.from_str_blebox(target.color) if target.color else None
+            manager.apply_scene_state(target.is_on, color, target.closet_brightness)
+            color_str = manager.device_color()
+            for url in manager.urls:
+                request_url = f'{url}/s/{color_str}' + (f'/colorFadeMs/{scene.fade_ms}' if scene.fade_ms > 0 else '')
+                leds[url] = DeviceWrite(url, 'GET', request_url, None, url, color_str)
+            if manager.color_type == ColorType.WRGB_BLEXBOX_WITH_CLOSET:
+                # Szafki są wspólne - świecą, jeśli chce tego którykolwiek pokój sceny
+                brightness = manager.closet_state()['bri']
+                for ip in manager.closet_urls:
+                    closets[ip] = max(closets.get(ip, 0), brightness)
+
+        writes = list(leds.values())
+        for ip, value in closets.items():
+            payload = {'on': value > 2, 'bri': str(value)}
+            # Ten sam klucz stanu co w LedRoomManager._set_closet_color
+            writes.append(DeviceWrite(ip, 'POST', f'{ip}/json/state', payload, f'{ip}/json/state',
+                                      f"{payload['on']}:{value}"))
+        return writes
+
+    async def apply(self, house_name: str, rooms: Dict[str, LedRoomManager], scene_name: str,
+                    force: bool = False) -> dict:
+        scene = self.get(house_name, scene_name)
+        if scene is None:
+            raise KeyError(scene_name)
+        started = time.monotonic()
+        writes = self.plan(rooms, scene)
+        plan_ms = (time.monotonic() - started) * 1000
+        results = await asyncio.gather(*(self._send(write, force) for write in writes))
+
+        self.applied += 1
+        self.last_apply_ms = (time.monotonic() - started) * 1000
+        failed = sum(result['result'] not in ('ok', 'unchanged') for result in results)
+        print(f"Scene {house_name}/{scene_name}: {len(writes)} devices, {failed} failed in {self.last_apply_ms:.0f} ms")
+        return {
+            'house': house_name,
+            'scene': scene.name,
+            'devices': results,
+            'failed': failed,
+            'plan_ms': plan_ms,
+            'apply_ms': self.last_apply_ms,
+        }
+
+    async def _send(self, write: DeviceWrite, force: bool) -> dict:
+        cache = self.http_client.state_cache
+        if not force and cache.is_current(write.cache_key, write.state):
+            return {'device': write.device, 'result': 'unchanged', 'latency_ms': 0.0}
+        started = time.monotonic()
+        write_id = cache.begin(write.cache_key)
+        try:
+            if write.payload is None:
+                await self.http_client.get(write.url)
+            else:
+                await self.http_client.post(write.url, write.payload)
+        except Exception as e:
+            cache.fail(write.cache_key, write_id)
+            result = record_device_request(write.device, write.method, started, e)
+            self.failed_writes += 1
+        else:
+            cache.confirm(write.cache_key, write.state, write_id)
+            result = record_device_request(write.device, write.method, started)
+        self.device_writes += 1
+        return {'device': write.device, 'result': result, 'latency_ms': (time.monotonic() - started) * 1000}
+
+    def get_stats(self) -> dict:
+        return {
+            'scenes': {house_name: sorted(scenes) for house_name, scenes in self.scenes.items()},
+            'applied': self.applied,
+            'device_writes': self.device_writes,
+            'failed_writes': self.failed_writes,
+            'last_apply_ms': self.last_apply_ms,
+        }
@@ -0,0 +1,201 @@
+"""Podział domów między procesy/węzły (sharding) na pierścieniu spójnego haszowania.
+
+Konfiguracja:
+    SHARD_WORKERS   lista węzłów nazwa=url, np. "w0=http://10.0.0.1:6767,w1=http://10.0.0.2:6767"
+                    (brak = tryb jednoprocesowy, węzeł obsługuje wszystkie domy)
+    SHARD_SELF      nazwa tego węzła z listy SHARD_WORKERS
+
+Węzły pingują się nawzajem (GET /shard/ping). Dom należy do właściciela na pierścieniu zbudowanym
+tylko z żywych węzłów - gdy węzeł wypada albo dołącza, pierścień się zmienia i słuchacze
+rebalance_listeners przejmują lub oddają domy. Wirtualne węzły wyrównują podział, a przy zmianie
+członkostwa przenosi się tylko ~1/N domów.
+
+Na starcie wszystkie węzły z SHARD_WORKERS uznajemy za żywe - węzeł, który jeszcze nie odpowiedział,
+wypada z pierścienia dopiero po SHARD_FAILURE_THRESHOLD nieudanych pingach. Dzięki temu kilka węzłów
+startujących naraz nie przejmuje na chwilę wszystkich domów i nie wysyła podwójnych zapisów.
+
+Przejmowany dom oddaje poprzedni właściciel: nowy wysyła mu POST /shard/handoff (request_handoff),
+a tamten zapisuje stan do bazy i zamyka managery domów, które już do niego nie należą. Dopiero potem
+nowy właściciel wczytuje stan z bazy.
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+FORWARDED_HEADER = 'X-Shard-Forwarded'
+
+
+def _hash(key: str) -> int:
+    # Stabilny między procesami (w przeciwieństwie do hash() z losowym ziarnem)
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        self.nodes = sorted(nodes)
+        points: List[Tuple[int, str]] = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self.hashes = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self.hashes:
+            return None
+        i = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[i]
+
+
+def parse_workers(value: str) -> Dict[str, str]:
+    workers = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, _, url = entry.partition('=')
+        workers[name.strip()] = url.strip().rstrip('/')
+    return workers
+
+
+class ShardCoordinator:
+    def __init__(self):
+        self.workers = parse_workers(os.getenv('SHARD_WORKERS', ''))
+        self.self_name = os.getenv('SHARD_SELF', '')
+        self.enabled = bool(self.workers)
+        if self.enabled and self.self_name not in self.workers:
+            raise ValueError(f"SHARD_SELF={self.self_name!r} is not in SHARD_WORKERS")
+        self.vnodes = int(os.getenv('SHARD_VNODES', 64))
+        self.ping_interval = float(os.getenv('SHARD_PING_INTERVAL', 2))
+        self.failure_threshold = int(os.getenv('SHARD_FAILURE_THRESHOLD', 3))
+        self.forward_timeout = aiohttp.ClientTimeout(total=float(os.getenv('SHARD_FORWARD_TIMEOUT', 10)))
+        self.live: Set[str] = set(self.workers)
+        self.failures: Dict[str, int] = {}
+        self.ring = HashRing(sorted(self.live), self.vnodes)
+        self.previous_ring = self.ring  # pierścień sprzed ostatniej zmiany - kto oddaje przejmowane domy
+        self.rebalance_listeners: List[Callable[[], None]] = []
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.task: Optional[asyncio.Task] = None
+        self.rebalances = 0
+        self.forwarded = 0
+        self.handoffs = 0
+        self.last_rebalance: Optional[float] = None
+
+    def owns(self, house_name: str) -> bool:
+        return not self.enabled or self.ring.owner(house_name) == self.self_name
+
+    @property
+    def failover_seconds(self) -> float:
+        """Po takim czasie ciszy pozostałe węzły uznają ten węzeł za martwy i przejmują jego domy"""
+        return self.failure_threshold * self.ping_interval
+
+    def previous_owner(self, house_name: str) -> Optional[str]:
+        return self.previous_ring.owner(house_name)
+
+    def owner_url(self, house_name: str) -> Optional[str]:
+        owner = self.ring.owner(house_name)
+        return self.workers.get(owner) if owner is not None else None
+
+    async def start(self) -> None:
+        """Pierwsza runda pingów przed wczytaniem domów; milczące węzły wypadają dopiero po kilku rundach"""
+        if not self.enabled:
+            return
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=max(self.ping_interval / 2, 0.5)))
+        await self._ping_all()
+        self._rebuild(notify=False)
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+        if self.session is not None:
+            await self.session.close()
+
+    async def _ping(self, name: str, url: str) -> None:
+        try:
+            async with self.session.get(f'{url}/shard/ping') as response:
+                response.raise_for_status()
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.failures[name] = self.failures.get(name, 0) + 1
+            if self.failures[name] >= self.failure_threshold:
+                self.live.discard(name)
+            return
+        self.failures[name] = 0
+        self.live.add(name)
+
+    async def _ping_all(self) -> None:
+        peers = [(name, url) for name, url in self.workers.items() if name != self.self_name]
+        await asyncio.gather(*(self._ping(name, url) for name, url in peers))
+
+    def reachable(self) -> Set[str]:
+        """Żywe węzły, które odpowiedziały na ostatni ping"""
+        return {name for name in self.live if name != self.self_name and self.failures.get(name) == 0}
+
+    def mark_alive(self, name: str) -> None:
+        """Węzeł sam się odezwał (np. prosi o oddanie domów) - nie czekamy na jego ping"""
+        if name in self.workers:
+            self.failures[name] = 0
+            self.live.add(name)
+            self._rebuild()
+
+    def _rebuild(self, notify: bool = True) -> None:
+        if sorted(self.live) == self.ring.nodes:
+            return
+        print(f"Shard membership changed: {self.ring.nodes} -> {sorted(self.live)}")
+        self.previous_ring = self.ring
+        self.ring = HashRing(sorted(self.live), self.vnodes)
+        self.rebalances += 1
+        self.last_rebalance = time.time()
+        if notify:
+            for listener in self.rebalance_listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    print(f"Error in rebalance listener: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await self._ping_all()
+            self._rebuild()
+
+    async def request_handoff(self, nodes: Set[str]) -> List[str]:
+        """Prosi żywe węzły z `nodes` o zapis stanu i oddanie domów; zwraca węzły, które potwierdziły"""
+        peers = sorted(node for node in nodes if node != self.self_name and node in self.live)
+
+        async def handoff(node: str) -> Optional[str]:
+            try:
+                async with self.session.post(f'{self.workers[node]}/shard/handoff', params={'node': self.self_name},
+                                             timeout=self.forward_timeout) as response:
+                    response.raise_for_status()
+                    print(f"Handoff from {node}: {await response.json()}")
+                    return node
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Handoff from {node} failed, loading its houses from the database as is: {e}")
+                return None
+
+        confirmed = [node for node in await asyncio.gather(*(handoff(node) for node in peers)) if node]
+        self.handoffs += len(confirmed)
+        return confirmed
+
+    async def forward(self, owner_url: str, method: str, path_qs: str, body: bytes,
+                      headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        """Przekazuje zapytanie HTTP do właściciela domu; zwraca (status, treść, content-type)"""
+        self.forwarded += 1
+        headers = dict(headers, **{FORWARDED_HEADER: self.self_name})
+        async with self.session.request(method, f'{owner_url}{path_qs}', data=body or None, headers=headers,
+                                        timeout=self.forward_timeout) as response:
+            return response.status, await response.read(), response.headers.get('Content-Type', 'application/json')
+
+    def get_stats(self, owned_houses: List[str]) -> dict:
+        return {
+            'enabled': self.enabled,
+            'self': self.self_name,
+            'workers': self.workers,
+            'live': sorted(self.live),
+            'owned_houses': owned_houses,
+            'rebalances': self.rebalances,
+            'last_rebalance': self.last_rebalance,
+            'forwarded': self.forwarded,
+            'handoffs': self.handoffs,
+        }
@@ -0,0 +1,8 @@
+"""Symulator sterowników BleBox i WLED do testów wydajności bez fizycznego domu.
+
+Uruchomienie (z katalogu Backend):
+    python -m simulator --devices 20 --device-port 8100 --latency-ms 30 --jitter-ms 10 --max-rate 10
+    python -m simulator --devices 200 --shared-port --latency-ms 30    # wszystkie na porcie 8090: /blebox0/s/...
+"""
+from simulator.devices import BleBoxDevice, FaultProfile, RecordedCommand, VirtualDevice, WledDevice
+from simulator.server import DeviceSimulator
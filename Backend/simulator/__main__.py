@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import json
+
+from simulator.devices import FaultProfile
+from simulator.server import DeviceSimulator
+
+
+async def serve(args) -> None:
+    simulator = DeviceSimulator(args.host, args.port)
+    for i in range(args.devices):
+        faults = FaultProfile(args.latency_ms, args.jitter_ms, args.drop_rate, args.timeout_rate,
+                              max_rate=args.max_rate, burst=args.burst, max_backlog=args.max_backlog,
+                              seed=None if args.seed is None else args.seed + i)
+        simulator.add_device(f'{args.kind}{i}', args.kind, faults, own_port=not args.shared_port,
+                             port=args.device_port + i if args.device_port else 0)
+    await simulator.start()
+    print(json.dumps({name: simulator.url_for(name) for name in simulator.devices}, indent=2))
+    print(f'Stats: http://{simulator.host}:{simulator.port}/_simulator/devices')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Symulator sterowników BleBox/WLED')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090, help='wspólny port: statystyki i urządzenia z --shared-port')
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--kind', choices=('blebox', 'wled'), default='blebox')
+    parser.add_argument('--shared-port', action='store_true',
+                        help='wszystkie urządzenia na --port, rozróżniane prefiksem ścieżki /{nazwa}')
+    parser.add_argument('--device-port', type=int, default=0,
+                        help='port pierwszego urządzenia, kolejne po nim (domyślnie dowolne wolne porty)')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--max-rate', type=float, help='limit zapytań/s na urządzenie')
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--max-backlog', type=int, default=8)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Wirtualne sterowniki BleBox (wLightBox) i WLED oraz wstrzykiwane błędy."""
+import abc
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class RecordedCommand(NamedTuple):
+    timestamp: float  # time.perf_counter() w chwili odebrania
+    completed: float  # time.perf_counter() po obsłużeniu (stan urządzenia zmienia się dopiero wtedy)
+    seq: int  # kolejny numer komendy na urządzeniu, w kolejności odebrania
+    device: str
+    method: str
+    path: str
+    payload: Any
+    outcome: str  # ok / not_found / dropped / timeout / rejected
+
+
+class FaultProfile:
+    """Zachowanie sterownika: czas odpowiedzi, błędy i limit zapytań jak w ESP8266.
+
+    latency_ms/jitter_ms  - czas obsługi zapytania, jitter losowany równomiernie w +-jitter_ms
+    drop_rate             - odsetek zapytań, na które urządzenie zrywa połączenie bez odpowiedzi
+    timeout_rate          - odsetek zapytań, na które urządzenie nie odpowiada przez hang_seconds
+    max_rate/burst        - kubełek żetonów: powyżej max_rate zapytań/s kolejne czekają na żeton
+    max_backlog           - ile zapytań może czekać na żeton, nadmiarowe dostają 503
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, drop_rate: float = 0.0,
+                 timeout_rate: float = 0.0, hang_seconds: float = 30.0, max_rate: Optional[float] = None,
+                 burst: int = 1, max_backlog: int = 8, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.drop_rate = drop_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.max_rate = max_rate
+        self.burst = burst
+        self.max_backlog = max_backlog
+        self.random = random.Random(seed)
+
+    def response_delay(self) -> float:
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(self.latency_ms + jitter, 0.0) / 1000
+
+    def draw_failure(self) -> Optional[str]:
+        roll = self.random.random()
+        if roll < self.drop_rate:
+            return 'dropped'
+        if roll < self.drop_rate + self.timeout_rate:
+            return 'timeout'
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waiting = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        self.waiting += 1
+        try:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+
+class VirtualDevice(abc.ABC):
+    kind = ''
+
+    def __init__(self, name: str, faults: Optional[FaultProfile] = None):
+        self.name = name
+        self.faults = faults or FaultProfile()
+        self.bucket = TokenBucket(self.faults.max_rate, self.faults.burst) if self.faults.max_rate else None
+        self.commands: List[RecordedCommand] = []
+        self.seq = 0
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def record(self, timestamp: float, seq: int, method: str, path: str, payload: Any, outcome: str) -> RecordedCommand:
+        command = RecordedCommand(timestamp, time.perf_counter(), seq, self.name, method, path, payload, outcome)
+        self.commands.append(command)
+        return command
+
+    @abc.abstractmethod
+    def handle(self, method: str, path: str, payload: Any) -> Optional[Dict[str, Any]]:
+        """Zwraca odpowiedź JSON albo None, gdy urządzenie nie zna ścieżki (404)"""
+
+    def get_stats(self) -> dict:
+        outcomes: Dict[str, int] = {}
+        for command in self.commands:
+            outcomes[command.outcome] = outcomes.get(command.outcome, 0) + 1
+        return {'kind': self.kind, 'commands': len(self.commands), 'outcomes': outcomes}
+
+
+class BleBoxDevice(VirtualDevice):
+    """wLightBox: GET /s/{hex}[/colorFadeMs/{ms}] ustawia kolor, GET /api/rgbw/state zwraca stan"""
+    kind = 'blebox'
+
+    def __init__(self, name: str, faults: Optional[FaultProfile] = None, color: str = '0000000000'):
+        super().__init__(name, faults)
+        self.desired_color = color
+        self.fade_ms = 1000
+
+    def state(self) -> Dict[str, Any]:
+        return {'rgbw': {'desiredColor': self.desired_color, 'currentColor': self.desired_color,
+                         'durationsMs': {'colorFade': self.fade_ms}}}
+
+    def handle(self, method: str, path: str, payload: Any) -> Optional[Dict[str, Any]]:
+        parts = path.strip('/').split('/')
+        if method == 'GET' and parts[0] == 's' and len(parts) in (2, 4):
+            if len(parts) == 4:
+                if parts[2] != 'colorFadeMs':
+                    return None
+                self.fade_ms = int(parts[3])
+            self.desired_color = parts[1].lower()
+            return self.state()
+        if method == 'GET' and parts == ['api', 'rgbw', 'state']:
+            return self.state()
+        return None
+
+
+class WledDevice(VirtualDevice):
+    """WLED: POST /json/state scala przesłany stan, GET /json/state go zwraca"""
+    kind = 'wled'
+
+    def __init__(self, name: str, faults: Optional[FaultProfile] = None):
+        super().__init__(name, faults)
+        self.on = False
+        self.bri = 0
+
+    def state(self) -> Dict[str, Any]:
+        return {'on': self.on, 'bri': self.bri}
+
+    def handle(self, method: str, path: str, payload: Any) -> Optional[Dict[str, Any]]:
+        if path.rstrip('/') != '/json/state':
+            return None
+        if method == 'POST':
+            if isinstance(payload, dict):
+                if 'on' in payload:
+                    self.on = bool(payload['on'])
+                if 'bri' in payload:
+                    self.bri = int(payload['bri'])
+            return {'success': True}
+        if method == 'GET':
+            return self.state()
+        return None
+
+
+DEVICE_KINDS = {'blebox': BleBoxDevice, 'wled': WledDevice}
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from simulator.devices import DEVICE_KINDS, FaultProfile, RecordedCommand, VirtualDevice
+
+CommandListener = Callable[[RecordedCommand], None]
+
+
+class DeviceSimulator:
+    """Serwer HTTP udający wiele sterowników naraz.
+
+    Urządzenie ma własny port (jak osobne IP w domu - pula HTTP backendu liczy limity per host) albo
+    dzieli wspólny port (`port`) i jest rozpoznawane po prefiksie ścieżki: http://host:port/{nazwa}/s/...
+    Prefiks jest częścią device_key, więc i na wspólnym porcie każde urządzenie ma własny circuit
+    breaker. Wspólny port obsługuje też statystyki symulatora: GET /_simulator/devices.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.devices: Dict[str, VirtualDevice] = {}
+        self.device_ports: Dict[str, int] = {}
+        self.port_to_device: Dict[int, VirtualDevice] = {}
+        self.requested_ports: Dict[str, int] = {}
+        self.listeners: List[CommandListener] = []
+        self.runner: Optional[web.AppRunner] = None
+
+    def add_device(self, name: str, kind: str = 'blebox', faults: Optional[FaultProfile] = None,
+                   own_port: bool = True, port: int = 0) -> VirtualDevice:
+        """own_port=False - urządzenie na wspólnym porcie pod /{name}; port 0 = dowolny wolny port"""
+        if self.runner is not None:
+            raise RuntimeError("Devices must be added before start()")
+        device = DEVICE_KINDS[kind](name, faults)
+        self.devices[name] = device
+        if own_port:
+            self.requested_ports[name] = port
+        return device
+
+    def url_for(self, name: str) -> str:
+        if name in self.device_ports:
+            return f'http://{self.host}:{self.device_ports[name]}'
+        return f'http://{self.host}:{self.port}/{name}'
+
+    def commands(self, name: Optional[str] = None) -> List[RecordedCommand]:
+        """Odebrane komendy posortowane po czasie odebrania"""
+        devices = [self.devices[name]] if name else self.devices.values()
+        return sorted((command for device in devices for command in device.commands), key=lambda c: c.timestamp)
+
+    def get_stats(self) -> dict:
+        return {name: dict(device.get_stats(), url=self.url_for(name)) for name, device in self.devices.items()}
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/_simulator/devices', self.handle_stats)
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+
+        shared = web.TCPSite(self.runner, self.host, self.port)
+        await shared.start()
+        self.port = shared._server.sockets[0].getsockname()[1]
+        for name, requested_port in self.requested_ports.items():
+            site = web.TCPSite(self.runner, self.host, requested_port)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.device_ports[name] = port
+            self.port_to_device[port] = self.devices[name]
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.get_stats())
+
+    def _resolve(self, request: web.Request) -> Tuple[Optional[VirtualDevice], str]:
+        device = self.port_to_device.get(request.transport.get_extra_info('sockname')[1])
+        if device is not None:
+            return device, request.path
+        _, name, path = (request.path + '/').split('/', 2)
+        device = self.devices.get(name)
+        # Na wspólnym porcie są tylko urządzenia bez własnego portu
+        if device is None or name in self.requested_ports:
+            return None, request.path
+        return device, '/' + path.rstrip('/')
+
+    def _record(self, device: VirtualDevice, arrived: float, seq: int, request: web.Request, path: str, payload,
+                outcome: str) -> None:
+        command = device.record(arrived, seq, request.method, path, payload, outcome)
+        for listener in self.listeners:
+            listener(command)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        arrived = time.perf_counter()
+        device, path = self._resolve(request)
+        if device is None:
+            raise web.HTTPNotFound()
+        seq = device.next_seq()
+        payload = None
+        if request.can_read_body:
+            body = await request.read()
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = body.decode(errors='replace')
+
+        faults = device.faults
+        if device.bucket is not None:
+            if device.bucket.waiting >= faults.max_backlog:
+                self._record(device, arrived, seq, request, path, payload, 'rejected')
+                raise web.HTTPServiceUnavailable()
+            await device.bucket.acquire()
+
+        failure = faults.draw_failure()
+        if failure == 'dropped':
+            self._record(device, arrived, seq, request, path, payload, failure)
+            # Zerwane połączenie bez odpowiedzi - klient dostaje błąd rozłączenia; odpowiedzi nie da się
+            # już wysłać, aiohttp ją pominie na zamkniętym transporcie
+            request.transport.close()
+            return web.Response()
+        if failure == 'timeout':
+            self._record(device, arrived, seq, request, path, payload, failure)
+            await asyncio.sleep(faults.hang_seconds)
+            raise web.HTTPGatewayTimeout()
+
+        delay = faults.response_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        response = device.handle(request.method, path, payload)
+        if response is None:
+            self._record(device, arrived, seq, request, path, payload, 'not_found')
+            raise web.HTTPNotFound()
+        self._record(device, arrived, seq, request, path, payload, 'ok')
+        return web.json_response(response)
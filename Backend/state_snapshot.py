@@ -0,0 +1,114 @@
+import asyncio
+import enum
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from db.models.house import House
+from db.models.room import ColorType, Room
+from led_room_manager import LedRoomManager
+
+SNAPSHOT_VERSION = 1
+
+
+def room_config(room: Room) -> dict:
+    config = {}
+    for column in Room.__table__.columns:
+        value = getattr(room, column.name)
+        config[column.name] = value.name if isinstance(value, enum.Enum) else value
+    return config
+
+
+def room_from_config(config: dict) -> Room:
+    """Obiekt Room spoza sesji, odtworzony z migawki"""
+    values = dict(config)
+    if values.get('type') is not None:
+        values['type'] = ColorType[values['type']]
+    return Room(**values)
+
+
+def house_config(house: House) -> dict:
+    return {'id': house.id, 'latitude': house.latitude, 'longitude': house.longitude, 'closet_urls': house.closet_urls,
+            'config_version': house.config_version}
+
+
+class StateSnapshot:
+    """Lokalna migawka konfiguracji i stanu pokoi - pozwala wstać bez bazy danych.
+
+    Zapis jest write-behind: zmiana stanu pokoju oznacza migawkę jako nieaktualną, a pętla run()
+    zapisuje ją co SNAPSHOT_INTERVAL sekund. Plik jest podmieniany atomowo (zapis do .tmp + rename),
+    więc przerwany zapis nie psuje poprzedniej migawki.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('STATE_SNAPSHOT_PATH', 'state_snapshot.json')
+        self.interval = float(os.getenv('SNAPSHOT_INTERVAL', 5))
+        self.houses: Dict[str, dict] = {}  # nazwa domu -> konfiguracja domu z bazy/migawki
+        self.managers_dict: Dict[str, Dict[str, LedRoomManager]] = {}
+        self.node: Optional[str] = None  # węzeł shardu, który zapisuje migawkę
+        self.dirty = False
+        self.saves = 0
+        self.last_save_ms = 0.0
+        self._lock = asyncio.Lock()
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Nie udało się wczytać migawki stanu {self.path}: {e}")
+            return None
+        if data.get('version') != SNAPSHOT_VERSION:
+            print(f"Pomijam migawkę stanu w wersji {data.get('version')}")
+            return None
+        return data
+
+    def watch(self, manager: LedRoomManager) -> None:
+        manager.state_listeners.append(self.on_state_changed)
+
+    def on_state_changed(self, manager: LedRoomManager, field: str) -> None:
+        self.dirty = True
+
+    def build(self) -> dict:
+        houses = {}
+        for house_name, rooms in self.managers_dict.items():
+            houses[house_name] = dict(self.houses.get(house_name, {}), rooms={
+                room_name: {'config': room_config(manager.room), 'state': manager.snapshot_state()}
+                for room_name, manager in rooms.items()
+            })
+        return {'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'node': self.node, 'houses': houses}
+
+    async def save(self) -> None:
+        async with self._lock:
+            self.dirty = False
+            # Dane zbieramy w pętli zdarzeń, do wątku idzie tylko serializacja i zapis pliku
+            data = self.build()
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write, data)
+            except Exception as e:
+                self.dirty = True
+                print(f"Nie udało się zapisać migawki stanu: {e}")
+                return
+            self.saves += 1
+            self.last_save_ms = (time.monotonic() - started) * 1000
+
+    def _write(self, data: dict) -> None:
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.dirty:
+                await self.save()
+
+    def get_stats(self) -> dict:
+        return {'path': self.path, 'dirty': self.dirty, 'saves': self.saves, 'last_save_ms': self.last_save_ms}
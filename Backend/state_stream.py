@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from led_room_manager import LedRoomManager
+
+STREAMED_FIELDS = ('is_light_on', 'is_enabled', 'color', 'mode', 'closet_brightness')
+
+
+def room_state(manager: LedRoomManager) -> dict:
+    return {
+        'is_light_on': manager.is_light_on,
+        'is_enabled': manager.is_enabled,
+        'color': field_value(manager, 'color'),
+        'mode': manager.current_mode_index,
+        'closet_brightness': manager.closet_brightness,
+    }
+
+
+def field_value(manager: LedRoomManager, field: str):
+    if field == 'color':
+        return manager.encode_color(manager.color)
+    if field == 'mode':
+        return manager.current_mode_index
+    return getattr(manager, field)
+
+
+class StreamClient:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.connected_at = time.monotonic()
+        self.sent = 0
+        self.overflows = 0
+
+
+class StateStream:
+    """Stan pokoi z pamięci: migawka z ETag i strumień zmian (Server-Sent Events).
+
+    Każda zmiana stanu pokoju podbija wersję i trafia do kolejek podłączonych klientów. Kolejki są
+    ograniczone (STATE_STREAM_QUEUE) i wypełniane bez czekania - wolny klient nigdy nie wstrzymuje
+    sterowania. Gdy kolejka klienta się przepełni, zastępujemy ją jednym zdarzeniem resync, a klient
+    pobiera od nowa GET /state.
+    """
+
+    def __init__(self):
+        self.queue_size = int(os.getenv('STATE_STREAM_QUEUE', 256))
+        self.heartbeat = float(os.getenv('STATE_STREAM_HEARTBEAT', 15))
+        self.managers_dict: Dict[str, Dict[str, LedRoomManager]] = {}
+        # ETag musi się różnić między restartami procesu, bo wersja liczy się od zera
+        self.instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.clients: Set[StreamClient] = set()
+        self._cached: Optional[Tuple[int, bytes]] = None
+        self.events = 0
+        self.snapshots_built = 0
+        self.not_modified = 0
+        self.overflows = 0
+
+    def watch(self, manager: LedRoomManager) -> None:
+        manager.state_listeners.append(self.on_state_changed)
+
+    def touch(self) -> None:
+        """Zmiana zestawu pokoi (np. nowa konfiguracja z bazy) - migawka jest nieaktualna"""
+        self.version += 1
+
+    def on_state_changed(self, manager: LedRoomManager, field: str) -> None:
+        if field not in STREAMED_FIELDS:
+            return
+        self.version += 1
+        if not self.clients:
+            return
+        event = {'version': self.version, 'house': manager.house_name, 'room': manager.room.name,
+                 'field': field, 'value': field_value(manager, field)}
+        self.events += 1
+        for client in self.clients:
+            self._publish(client, event)
+
+    def _publish(self, client: StreamClient, event: dict) -> None:
+        try:
+            client.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Klient nie nadąża - stare zmiany są bez znaczenia, niech pobierze całą migawkę
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.queue.put_nowait({'version': self.version, 'resync': True})
+            client.overflows += 1
+            self.overflows += 1
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.instance}-{self.version}"'
+
+    def snapshot(self) -> bytes:
+        """Zserializowana migawka wszystkich domów - budowana tylko, gdy od ostatniej zmieniła się wersja"""
+        if self._cached is not None and self._cached[0] == self.version:
+            return self._cached[1]
+        body = json.dumps({
+            'version': self.version,
+            'houses': {
+                house_name: {room_name: room_state(manager) for room_name, manager in rooms.items()}
+                for house_name, rooms in self.managers_dict.items()
+            },
+        }).encode()
+        self._cached = (self.version, body)
+        self.snapshots_built += 1
+        return body
+
+    def subscribe(self) -> StreamClient:
+        client = StreamClient(self.queue_size)
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client: StreamClient) -> None:
+        self.clients.discard(client)
+
+    async def subscribe_events(self):
+        """Zdarzenia SSE dla nowego klienta; co STATE_STREAM_HEARTBEAT sekund komentarz podtrzymujący połączenie.
+
+        Subskrypcja powstaje dopiero przy pierwszej iteracji, w tym samym try co wypisanie w finally -
+        klient rozłączony przed startem generatora nie zostawia kolejki, do której nikt nie czyta.
+        """
+        client = None
+        try:
+            client = self.subscribe()
+            yield f'event: hello\ndata: {json.dumps({"version": self.version})}\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(client.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                client.sent += 1
+                kind = 'resync' if event.get('resync') else 'change'
+                yield f'id: {event["version"]}\nevent: {kind}\ndata: {json.dumps(event)}\n\n'
+        finally:
+            if client is not None:
+                self.unsubscribe(client)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        clients: List[dict] = [
+            {'queued': client.queue.qsize(), 'sent': client.sent, 'overflows': client.overflows,
+             'connected_seconds': now - client.connected_at}
+            for client in self.clients
+        ]
+        return {
+            'version': self.version,
+            'events': self.events,
+            'snapshots_built': self.snapshots_built,
+            'not_modified': self.not_modified,
+            'overflows': self.overflows,
+            'clients': clients,
+        }
@@ -1,40 +1,118 @@
 import datetime
+import math
+import os
+from array import array
+from typing import Dict, Optional, Tuple
 
-import requests
+DAY_SECONDS = 24 * 60 * 60
+
+# Domyślna lokalizacja dla domów bez współrzędnych (Wrocław)
+DEFAULT_LATITUDE = float(os.getenv('DEFAULT_LATITUDE', 51.1309))
+DEFAULT_LONGITUDE = float(os.getenv('DEFAULT_LONGITUDE', 17.10175))
+
+
+def compute_sun_times(day: datetime.date, latitude: float, longitude: float) -> Tuple[int, int]:
+    """Wschód i zachód słońca (sekundy od północy UTC danego dnia) wg algorytmu NOAA.
+
+    Dzień polarny zwraca przedział obejmujący całą dobę, noc polarna - przedział pusty.
+    """
+    days_in_year = 366 if day.year % 4 == 0 and (day.year % 100 != 0 or day.year % 400 == 0) else 365
+    gamma = 2 * math.pi / days_in_year * (day.timetuple().tm_yday - 1)
+
+    # Równanie czasu (minuty) i deklinacja słońca (radiany)
+    eqtime = 229.18 * (0.000075 + 0.001868 * math.cos(gamma) - 0.032077 * math.sin(gamma)
+                       - 0.014615 * math.cos(2 * gamma) - 0.040849 * math.sin(2 * gamma))
+    decl = (0.006918 - 0.399912 * math.cos(gamma) + 0.070257 * math.sin(gamma)
+            - 0.006758 * math.cos(2 * gamma) + 0.000907 * math.sin(2 * gamma)
+            - 0.002697 * math.cos(3 * gamma) + 0.00148 * math.sin(3 * gamma))
+
+    lat = math.radians(latitude)
+    # 90.833° uwzględnia refrakcję i promień tarczy słońca
+    cos_ha = math.cos(math.radians(90.833)) / (math.cos(lat) * math.cos(decl)) - math.tan(lat) * math.tan(decl)
+    if cos_ha <= -1:
+        return -DAY_SECONDS, 2 * DAY_SECONDS
+    if cos_ha >= 1:
+        return 1, 0
+    ha = math.degrees(math.acos(cos_ha))
+
+    sunrise_minutes = 720 - 4 * (longitude + ha) - eqtime
+    sunset_minutes = 720 - 4 * (longitude - ha) - eqtime
+    return int(sunrise_minutes * 60), int(sunset_minutes * 60)
+
+
+class SunTable:
+    """Prekomputowane wschody/zachody dla jednej lokalizacji na cały rok - zapytania w O(1)"""
+
+    def __init__(self, latitude: float, longitude: float, year: int):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.year = year
+        first_day = datetime.date(year, 1, 1)
+        self.first_ordinal = first_day.toordinal()
+        # Jeden dzień zapasu na końcu, żeby szukanie jutrzejszego wschodu nie wychodziło poza tabelę
+        days = datetime.date(year + 1, 1, 1).toordinal() - self.first_ordinal + 1
+        self.sunrise = array('i')
+        self.sunset = array('i')
+        for i in range(days):
+            sunrise, sunset = compute_sun_times(first_day + datetime.timedelta(days=i), latitude, longitude)
+            self.sunrise.append(sunrise)
+            self.sunset.append(sunset)
+
+    def is_daylight(self, now: datetime.datetime) -> bool:
+        i = now.toordinal() - self.first_ordinal
+        sunrise = self.sunrise[i]
+        sunset = self.sunset[i]
+        t = now.hour * 3600 + now.minute * 60 + now.second
+        # Dla dalekich długości geograficznych dzień w UTC może przechodzić przez północ
+        return sunrise < t < sunset or sunrise < t + DAY_SECONDS < sunset or sunrise < t - DAY_SECONDS < sunset
+
+    def seconds_until_daylight(self, now: datetime.datetime) -> float:
+        if self.is_daylight(now):
+            return 0.0
+        i = now.toordinal() - self.first_ordinal
+        t = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        for day in range(i, len(self.sunrise)):
+            sunrise = self.sunrise[day]
+            if sunrise >= self.sunset[day]:
+                continue  # noc polarna
+            start = (day - i) * DAY_SECONDS + sunrise
+            if start >= t:
+                # Sekunda zapasu, bo is_daylight porównuje ostro
+                return start - t + 1
+        # Noc polarna do końca roku - spróbujemy ponownie po przeliczeniu tabeli
+        return float(DAY_SECONDS)
 
 
 class SunriseSunsetAPI:
+    """Lokalny kalkulator wschodów i zachodów słońca per dom, bez żadnego I/O sieciowego"""
+
     def __init__(self):
-        self.date:datetime.date = None
-        self.sunrise_utc:datetime.time = None
-        self.sunset_utc:datetime.time = None
-        pass
-
-    def is_daylight_now(self):
-        if not self.is_up_to_date():
-            self.update_time()
-        nowtime = datetime.datetime.utcnow().time()
-        return self.sunrise_utc < nowtime < self.sunset_utc
-
-    def update_time(self):
-        data = requests.get("https://api.sunrisesunset.io/json?lat=51.1309&lng=17.10175")
-        json = data.json()['results']
-
-        sunrise = datetime.datetime.strptime(json['sunrise'], "%I:%M:%S %p")
-        sunset = datetime.datetime.strptime(json['sunset'], "%I:%M:%S %p")
-        self.date = datetime.datetime.fromisoformat(json['date']).date()
-        utc_offset = int(json['utc_offset'])
-        self.sunrise_utc = (sunrise - datetime.timedelta(minutes=utc_offset)).time()
-        self.sunset_utc = (sunset - datetime.timedelta(minutes=utc_offset)).time()
-
-    def is_up_to_date(self):
-        return datetime.datetime.today().date() == self.date
-
-# test = SunriseSunsetAPI()
-# print(test.is_up_to_date())
-# test.update_time()
-# print(test.is_up_to_date())
-# print(test.date)
-# print(test.sunrise_utc)
-# print(test.sunset_utc)
-# print(test.sunset_utc.utcoffset())
+        self.locations: Dict[str, Tuple[float, float]] = {}
+        self.tables: Dict[Tuple[float, float], SunTable] = {}
+
+    def set_house_location(self, house_name: str, latitude: Optional[float], longitude: Optional[float]) -> None:
+        if latitude is None or longitude is None:
+            latitude, longitude = DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+        location = (float(latitude), float(longitude))
+        self.locations[house_name] = location
+        # Tabelę liczymy od razu przy starcie, a nie przy pierwszym zdarzeniu
+        self._get_table(location, datetime.datetime.utcnow().year)
+
+    def _get_table(self, location: Tuple[float, float], year: int) -> SunTable:
+        table = self.tables.get(location)
+        if table is None or table.year != year:
+            table = SunTable(location[0], location[1], year)
+            self.tables[location] = table
+        return table
+
+    def _table_for_house(self, house_name: str, now: datetime.datetime) -> SunTable:
+        location = self.locations.get(house_name, (DEFAULT_LATITUDE, DEFAULT_LONGITUDE))
+        return self._get_table(location, now.year)
+
+    def is_daylight_now(self, house_name: str) -> bool:
+        now = datetime.datetime.utcnow()
+        return self._table_for_house(house_name, now).is_daylight(now)
+
+    def seconds_until_daylight(self, house_name: str) -> float:
+        now = datetime.datetime.utcnow()
+        return self._table_for_house(house_name, now).seconds_until_daylight(now)
@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+
+# Moduły backendu importujemy tak jak uvicorn - z katalogu Backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db_init tworzy silnik przy imporcie - testy dostają własną bazę SQLite i migawkę stanu poza repozytorium
+TEST_DIR = tempfile.mkdtemp(prefix="superled_tests_")
+os.environ.setdefault('DB_CONFIG', f'sqlite:///{os.path.join(TEST_DIR, "test.db")}')
+os.environ.setdefault('STATE_SNAPSHOT_PATH', os.path.join(TEST_DIR, 'state_snapshot.json'))
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from color import Color
+from db.db_init import Base, SessionLocal, engine
+from db.models.house import House  # rejestruje model przed konfiguracją relacji Room.house
+from db.models.room import ColorType, Room
+from device_state_cache import DeviceStateCache
+from effects import EffectEngine
+from led_room_manager import LedRoomManager
+from sunrise_api import SunriseSunsetAPI
+from timer_service import TimerService
+
+
+class FakeHttpClient:
+    """Zapytania do sterowników zapisywane w pamięci; dopóki gate nie jest ustawiony, odpowiedzi czekają"""
+
+    def __init__(self):
+        self.state_cache = DeviceStateCache()
+        self.requests: List[tuple] = []
+        self.gate: Optional[asyncio.Event] = None
+        self.states: Dict[str, Any] = {}  # odpowiedzi get_json; wyjątek oznacza niedostępne urządzenie
+
+    async def get(self, url: str) -> None:
+        self.requests.append(('GET', url))
+        if self.gate is not None:
+            await self.gate.wait()
+
+    async def post(self, url: str, payload: dict) -> None:
+        self.requests.append(('POST', url, payload))
+        if self.gate is not None:
+            await self.gate.wait()
+
+    async def get_json(self, url: str) -> Any:
+        self.requests.append(('GET', url))
+        state = self.states[url]
+        if isinstance(state, Exception):
+            raise state
+        return state
+
+
+@pytest.fixture
+def http():
+    return FakeHttpClient()
+
+
+@pytest.fixture
+def make_room(http):
+    """Fabryka managerów pokoju bez sieci - konfigurację pokoju można nadpisać argumentami"""
+    def make(room_id: int = 1, closet_urls: Optional[List[str]] = None, **config) -> LedRoomManager:
+        values = dict(name=f'r{room_id}', url=f'http://10.0.0.{room_id}', desired_color='ff00000000',
+                      type=ColorType.WRGB_BLEXBOX, detection_time=60, min_adc=0, max_adc=65535, closet_brightness=0,
+                      use_motion_detector=False)
+        values.update(config)
+        room = Room(id=room_id, **values)
+        return LedRoomManager('h', room.url, SunriseSunsetAPI(), Color.from_str_blebox(room.desired_color),
+                              room.detection_time, room.max_adc, room.min_adc, room, http, TimerService(),
+                              EffectEngine(), closet_urls)
+    return make
+
+
+@pytest.fixture
+def room_row():
+    """Fabryka wierszy Room do bazy testowej"""
+    def make(room_id: int, name: str, house_id: int = 1, **config) -> Room:
+        values = dict(url=f'http://127.0.0.1:{9000 + room_id}', desired_color='ff00000000', house_id=house_id,
+                      type=ColorType.WRGB_BLEXBOX, detection_time=60, min_adc=0, max_adc=65535, closet_brightness=0)
+        values.update(config)
+        return Room(id=room_id, name=name, **values)
+    return make
+
+
+@pytest.fixture
+def app(room_row):
+    """Moduł main na czystej bazie z domem h (pokoje kitchen i hall); po teście managery są zamykane"""
+    import main
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        session.add(House(id=1, name='h', description='test'))
+        session.add_all([room_row(1, 'kitchen'), room_row(2, 'hall')])
+        session.commit()
+    yield main
+    for rooms in main.managers_dict.values():
+        for manager in rooms.values():
+            manager.close()
+    main.managers_dict.clear()
+    main.state_snapshot.houses.clear()
+    main.room_state_persister.dirty.clear()
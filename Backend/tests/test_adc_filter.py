@@ -0,0 +1,56 @@
+import random
+
+from adc_filter import AdcFilter
+
+
+def test_first_reading_passes_normalized():
+    adc_filter = AdcFilter(1000, 3000)
+    assert adc_filter.feed(2000) == 0.5
+    assert adc_filter.normalize(0) == 0.0
+    assert adc_filter.normalize(5000) == 1.0
+
+
+def test_changes_inside_deadband_are_suppressed():
+    adc_filter = AdcFilter(0, 1000, smoothing=1.0, deadband=0.01)
+    assert adc_filter.feed(500) == 0.5
+    assert adc_filter.feed(505) is None
+    assert adc_filter.feed(520) == 0.52
+    assert adc_filter.samples == 3
+    assert adc_filter.emitted == 2
+
+
+def test_hysteresis_holds_output_until_threshold_is_crossed():
+    adc_filter = AdcFilter(0, 1000, smoothing=1.0, deadband=0.02)
+    adc_filter.feed(500)
+    # Zbliżanie się do progu w małych krokach niczego nie wysyła, dopiero przekroczenie
+    assert [adc_filter.feed(value) for value in (505, 510, 515)] == [None, None, None]
+    assert adc_filter.feed(521) == 0.521
+
+
+def test_noise_is_filtered_but_knob_moves_pass():
+    rng = random.Random(1)
+    adc_filter = AdcFilter(0, 65535)
+    outputs = [adc_filter.feed(30000 + rng.gauss(0, 300)) for _ in range(2000)]
+    assert sum(output is not None for output in outputs) < 50
+    assert adc_filter.noise_floor > 0
+
+    # Wyraźny ruch pokrętła przechodzi od razu, bez opóźnienia EMA
+    moved = adc_filter.feed(50000)
+    assert moved is not None and abs(moved - 50000 / 65535) < 0.01
+
+
+def test_steady_sweep_is_not_mistaken_for_noise():
+    adc_filter = AdcFilter(0, 65535)
+    sweep = range(0, 65536, 512)
+    outputs = [adc_filter.feed(value) for value in sweep]
+    assert sum(output is not None for output in outputs) >= len(sweep) - 2
+    assert adc_filter.noise_floor < adc_filter.deadband
+
+
+def test_end_positions_are_reachable():
+    adc_filter = AdcFilter(0, 65535)
+    for _ in range(5):
+        adc_filter.feed(30000)
+    for _ in range(3):
+        adc_filter.feed(0)
+    assert adc_filter.output == 0.0
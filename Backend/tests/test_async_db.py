@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from db.async_db import AsyncDatabase
+from db.db_init import Base
+from db.models.house import House
+
+QUERY_DELAY = 0.2
+MAX_LAG = 0.1
+
+
+def slow_session_factory(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "slow.db"}')
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as session:
+        session.add(House(id=1, name='test', description='test'))
+        session.commit()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(*args):
+        time.sleep(QUERY_DELAY)  # przeciążona baza - każde zapytanie SQL blokuje wątek, który je wykonuje
+
+    return session_factory
+
+
+async def max_loop_lag(work) -> float:
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = asyncio.Event()
+
+    async def tick():
+        while not done.is_set():
+            expected = loop.time() + 0.01
+            await asyncio.sleep(0.01)
+            lags.append(loop.time() - expected)
+
+    ticker = asyncio.create_task(tick())
+    try:
+        await work
+    finally:
+        done.set()
+        await ticker
+    return max(lags)
+
+
+def test_slow_queries_do_not_block_event_loop(tmp_path):
+    database = AsyncDatabase(slow_session_factory(tmp_path))
+
+    async def run():
+        queries = asyncio.gather(*(database.load_houses() for _ in range(database.threads * 2)))
+        lag = await max_loop_lag(queries)
+        return lag, queries.result()
+
+    try:
+        lag, results = asyncio.run(run())
+    finally:
+        database.close()
+
+    assert all([house.name for house in houses] == ['test'] for houses in results)
+    assert lag < MAX_LAG
+    stats = database.get_stats()['queries']['load_houses']
+    assert stats['count'] == database.threads * 2
+    assert stats['max_ms'] >= QUERY_DELAY * 1000
@@ -0,0 +1,77 @@
+import asyncio
+
+from mqtt import binary_payload
+from mqtt.LedMQTT import LedMQTT
+from mqtt.binary_payload import SequenceTracker, decode_frame, encode_frame
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def tracker(monkeypatch, resync_seconds: float = 5.0):
+    clock = FakeClock()
+    monkeypatch.setattr(binary_payload.time, 'monotonic', clock)
+    return SequenceTracker(resync_seconds), clock
+
+
+def test_frame_round_trip():
+    seq, samples = decode_frame(encode_frame(7, [(100, 1), (65535, 0xFF)]))
+    assert seq == 7
+    assert list(samples) == [(100, 1), (65535, 0xFF)]
+
+
+def test_drops_duplicates_and_out_of_order(monkeypatch):
+    sequence, _ = tracker(monkeypatch)
+    assert [sequence.accept(seq) for seq in (10, 11, 11, 9, 12)] == [True, True, False, False, True]
+    assert sequence.dropped == 2
+
+
+def test_accepts_uint16_wraparound(monkeypatch):
+    sequence, _ = tracker(monkeypatch)
+    assert sequence.accept(0xFFFE)
+    assert sequence.accept(0xFFFF)
+    assert sequence.accept(0)
+    assert not sequence.accept(0xFFFF)
+
+
+def test_resyncs_after_silence(monkeypatch):
+    # Restart urządzenia zeruje licznik - po resync_seconds ciszy przyjmujemy dowolny numer
+    sequence, clock = tracker(monkeypatch, resync_seconds=5.0)
+    assert sequence.accept(500)
+    clock.now += 1.0
+    assert not sequence.accept(3)
+    clock.now += 5.0
+    assert sequence.accept(3)
+    clock.now += 1.0
+    assert sequence.accept(4)
+
+
+class RecordingHandlers:
+    def __init__(self):
+        self.managers_dict = {}
+        self.calls = []
+
+    async def adc_change(self, house_name, room_name, adc_value):
+        self.calls.append(('adc', adc_value))
+
+    async def switch_change(self, house_name, room_name, switch_state):
+        self.calls.append(('switch', switch_state))
+
+
+def test_first_frame_records_switch_state_without_toggling():
+    handlers = RecordingHandlers()
+    led_mqtt = LedMQTT(handlers)
+    sequence = SequenceTracker()
+
+    async def run():
+        # Po restarcie (albo ponownym dodaniu pokoju) przełącznik jest w jakimś stanie - to jeszcze nie zmiana
+        await led_mqtt.handle_binary_frame('h', 'r', sequence, encode_frame(1, [(100, 0), (200, 0)]))
+        await led_mqtt.handle_binary_frame('h', 'r', sequence, encode_frame(3, [(300, 1), (400, 1)]))
+
+    asyncio.run(run())
+    assert handlers.calls == [('adc', 200), ('switch', 1), ('adc', 400)]
@@ -0,0 +1,57 @@
+import asyncio
+import contextvars
+
+from coalescer import LatestWinsCoalescer
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+class SlowHandler:
+    """Zapis do urządzenia, który trwa - w tym czasie kolejne wartości czekają w coalescerze"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, value):
+        self.calls.append((value, request_id.get()))
+        await self.release.wait()
+
+
+def test_latest_value_wins_per_key():
+    async def run():
+        handler = SlowHandler()
+        coalescer = LatestWinsCoalescer(handler)
+        first = asyncio.create_task(coalescer.submit('adc', 1))
+        await asyncio.sleep(0)
+        for value in (2, 3, 4):
+            await coalescer.submit('adc', value)
+        await coalescer.submit('hue', 10)
+        handler.release.set()
+        await first
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(run())
+    assert [value for value, _ in handler.calls] == [1, 4, 10]
+    assert coalescer.get_stats() == {'submitted': 5, 'coalesced': 2, 'executed': 3, 'pending': 0, 'in_flight': False}
+
+
+def test_pending_value_runs_in_its_own_context_without_leaking():
+    async def submit(coalescer, value, rid):
+        request_id.set(rid)
+        await coalescer.submit('adc', value)
+        # Task, który uruchomił coalescer, zachowuje swój kontekst po wykonaniu cudzych wartości
+        return request_id.get()
+
+    async def run():
+        handler = SlowHandler()
+        coalescer = LatestWinsCoalescer(handler)
+        worker = asyncio.create_task(submit(coalescer, 1, 'first'))
+        await asyncio.sleep(0)
+        await asyncio.create_task(submit(coalescer, 2, 'second'))
+        handler.release.set()
+        return handler, await worker
+
+    handler, worker_request_id = asyncio.run(run())
+    assert handler.calls == [(1, 'first'), (2, 'second')]
+    assert worker_request_id == 'first'
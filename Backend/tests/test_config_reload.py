@@ -0,0 +1,61 @@
+import asyncio
+
+import main
+from db.db_init import SessionLocal
+from db.models.room import Room
+
+
+def load(app) -> main.ConfigChanges:
+    return app.apply_db_config(asyncio.run(app.database.load_houses()))
+
+
+def test_adds_updates_and_removes_only_changed_rooms(app, room_row):
+    changes = load(app)
+    assert sorted(changes.added) == ['h/hall', 'h/kitchen']
+    kitchen = app.managers_dict['h']['kitchen']
+    hall = app.managers_dict['h']['hall']
+
+    with SessionLocal() as session:
+        session.get(Room, 1).detection_time = 120
+        session.delete(session.get(Room, 2))
+        session.add(room_row(3, 'office'))
+        session.commit()
+    changes = load(app)
+
+    assert changes.added == ['h/office']
+    assert changes.updated == ['h/kitchen']
+    assert changes.removed == ['h/hall']
+    # Zaktualizowany pokój to ten sam manager z nową konfiguracją, usunięty jest zamknięty
+    assert app.managers_dict['h']['kitchen'] is kitchen
+    assert kitchen.duration_seconds == 120
+    assert hall.closed
+    assert sorted(app.managers_dict['h']) == ['kitchen', 'office']
+
+
+def test_state_columns_are_not_config_changes(app):
+    load(app)
+    with SessionLocal() as session:
+        session.get(Room, 1).desired_color = '00ff000000'
+        session.commit()
+    changes = load(app)
+    assert not changes
+    assert changes.unchanged == 2
+
+
+def test_removed_room_does_not_break_state_flush(app):
+    load(app)
+    kitchen = app.managers_dict['h']['kitchen']
+    hall = app.managers_dict['h']['hall']
+    kitchen.color = main.Color.from_str_blebox('00ff000000')
+    hall.color = main.Color.from_str_blebox('00ff000000')
+    kitchen._emit_state_change('color')
+    hall._emit_state_change('color')
+
+    with SessionLocal() as session:
+        session.delete(session.get(Room, 2))
+        session.commit()
+    load(app)
+
+    assert asyncio.run(app.room_state_persister.flush()) == 1
+    with SessionLocal() as session:
+        assert session.get(Room, 1).desired_color == str(kitchen.color)
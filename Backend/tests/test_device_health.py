@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from device_health import CircuitState, DeviceHealthRegistry, device_key
+
+DEVICE = 'http://10.0.0.1'
+
+
+@pytest.mark.parametrize('url, key', [
+    ('http://10.0.0.1/s/ff00000000', 'http://10.0.0.1'),
+    ('http://10.0.0.1:8080/api/rgbw/state', 'http://10.0.0.1:8080'),
+    ('http://sim:9000/kitchen/s/ff00000000/colorFadeMs/300', 'http://sim:9000/kitchen'),
+    ('http://proxy/led/closet/json/state', 'http://proxy/led/closet'),
+])
+def test_device_key(url, key):
+    assert device_key(url) == key
+
+
+def registry(probe) -> DeviceHealthRegistry:
+    health = DeviceHealthRegistry(probe)
+    health.failure_threshold = 3
+    health.probe_initial = 0.01
+    health.probe_max = 0.02
+    return health
+
+
+def test_circuit_opens_after_consecutive_failures_and_recovers_on_probe():
+    probes = []
+    recovered = []
+
+    async def probe(device):
+        probes.append(device)
+        if len(probes) < 3:
+            raise ConnectionError('still down')
+
+    async def run():
+        health = registry(probe)
+        health.recovery_listeners.append(recovered.append)
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        # Sukces zeruje licznik - otwierają tylko kolejne błędy
+        health.record_success(DEVICE)
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        assert health.allow(DEVICE)
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        assert not health.allow(DEVICE)
+        assert health.get(DEVICE).get_stats()['rejected'] == 1
+        # Próby co 0.01, 0.02, 0.02 s - trzecia się udaje
+        await asyncio.sleep(0.1)
+        return health
+
+    health = asyncio.run(run())
+    assert probes == [DEVICE] * 3
+    assert recovered == [DEVICE]
+    assert health.allow(DEVICE)
+    stats = health.get_stats()[DEVICE]
+    assert stats['state'] == CircuitState.CLOSED.value
+    assert (stats['failures'], stats['successes'], stats['probes']) == (5, 1, 3)
+    assert stats['last_error'] == 'ConnectionError: still down'
+
+
+def test_failing_recovery_listener_does_not_keep_circuit_open():
+    recovered = []
+
+    async def probe(device):
+        pass
+
+    def broken_listener(device):
+        raise RuntimeError('listener failed')
+
+    async def run():
+        health = registry(probe)
+        health.failure_threshold = 1
+        health.recovery_listeners.extend([broken_listener, recovered.append])
+        health.record_failure(DEVICE, TimeoutError())
+        await asyncio.sleep(0.05)
+        return health
+
+    health = asyncio.run(run())
+    assert health.get(DEVICE).state is CircuitState.CLOSED
+    assert recovered == [DEVICE]
+
+
+def test_close_cancels_probes():
+    async def probe(device):
+        raise ConnectionError('down')
+
+    async def run():
+        health = registry(probe)
+        health.failure_threshold = 1
+        health.record_failure(DEVICE, ConnectionError('refused'))
+        task = health.get(DEVICE).probe_task
+        health.close()
+        await asyncio.sleep(0)
+        return task
+
+    assert asyncio.run(run()).cancelled()
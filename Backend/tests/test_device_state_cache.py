@@ -0,0 +1,71 @@
+import asyncio
+
+from color import Color
+from device_state_cache import DeviceStateCache
+
+URL = 'http://10.0.0.1'
+
+
+def test_skips_only_confirmed_identical_payload():
+    cache = DeviceStateCache(ttl=60)
+    write_id = cache.begin(URL)
+    assert not cache.is_current(URL, 'red')
+    cache.confirm(URL, 'red', write_id)
+    assert cache.is_current(URL, 'red')
+    assert not cache.is_current(URL, 'blue')
+
+
+def test_entry_expires_after_ttl():
+    cache = DeviceStateCache(ttl=0)
+    cache.confirm(URL, 'red', cache.begin(URL))
+    cache.entries[URL] = ('red', cache.entries[URL][1] - 1)
+    assert not cache.is_current(URL, 'red')
+
+
+def test_ack_of_older_write_does_not_overwrite_newer():
+    cache = DeviceStateCache(ttl=60)
+    cache.confirm(URL, 'red', cache.begin(URL))
+    off = cache.begin(URL)
+    # Zapis w toku - nawet poprzedni kolor trzeba wysłać ponownie
+    assert not cache.is_current(URL, 'red')
+    red = cache.begin(URL)
+    cache.confirm(URL, 'off', off)
+    assert not cache.is_current(URL, 'off')
+    cache.confirm(URL, 'red', red)
+    assert cache.is_current(URL, 'red')
+
+
+def test_failed_write_and_stale_read_are_not_cached():
+    cache = DeviceStateCache(ttl=60)
+    write_id = cache.begin(URL)
+    # Odczyt stanu (reconciler) w trakcie zapisu mógł zobaczyć stan sprzed zapisu
+    cache.store(URL, 'red')
+    assert not cache.is_current(URL, 'red')
+    cache.fail(URL, write_id)
+    assert cache.pending == {}
+    cache.store(URL, 'red')
+    assert cache.is_current(URL, 'red')
+
+
+def test_light_turned_back_on_while_off_is_in_flight(http, make_room):
+    manager = make_room()
+    red = str(manager.color)
+
+    async def run():
+        await manager.set_light(True)
+        assert http.state_cache.is_current(manager.urls[0], red)
+        http.gate = asyncio.Event()
+        off = asyncio.create_task(manager.set_light(False))
+        while len(http.requests) < 2:
+            await asyncio.sleep(0)
+        on = asyncio.create_task(manager.set_light(True))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        http.gate.set()
+        await asyncio.gather(off, on)
+
+    asyncio.run(run())
+    sent = [url.split('/s/')[1].split('/')[0] for _, url in http.requests]
+    assert sent == [red, str(Color(0, 0, 0, 0)), red]
+    assert manager.is_light_on
+    assert http.state_cache.is_current(manager.urls[0], red)
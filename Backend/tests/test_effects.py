@@ -0,0 +1,67 @@
+import asyncio
+
+from color import Color
+from effects import OFF, Effect, strobe
+
+
+def frames_sent(http, device_url: str) -> list:
+    # {url}/s/{kolor} albo {url}/s/{kolor}/colorFadeMs/{ms}
+    prefix = f'{device_url}/s/'
+    return [request[1][len(prefix):].split('/')[0] for request in http.requests if request[1].startswith(prefix)]
+
+
+def test_finite_effect_plays_all_frames_then_restores_room(make_room, http):
+    manager = make_room()
+    effect = Effect('blink', [OFF, (0, 1, 1, 0)], frame_ms=10, repeat=2)
+
+    async def run():
+        manager.effect_engine.start(effect, [manager])
+        await asyncio.sleep(0.15)
+
+    asyncio.run(run())
+    off, red = effect.rgbw
+    # Ostatnia klatka to czerwień, a zgaszony pokój po efekcie wraca do zgaszonego
+    assert frames_sent(http, manager.urls[0]) == [off, red, off, red, off]
+    assert not manager.effect_engine.is_running(manager)
+    assert manager.effect_engine.get_stats() == []
+
+
+def test_slow_device_does_not_hold_back_other_rooms(make_room, http):
+    slow = make_room(1)
+    fast = make_room(2)
+    fast.http_client = type(http)()
+    fast.effect_engine = slow.effect_engine
+    engine = slow.effect_engine
+
+    async def run():
+        # Sterownik slow nie odpowiada - kolejne klatki dla niego są pomijane, a nie kolejkowane
+        http.gate = asyncio.Event()
+        effect_run = engine.start(strobe(frame_ms=10), [slow, fast])
+        await asyncio.sleep(0.1)
+        stats = effect_run.get_stats()
+        engine.stop([slow, fast], restore=False)
+        http.gate.set()
+        await asyncio.sleep(0)
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats['rooms'] == ['r1', 'r2']
+    assert len(frames_sent(http, slow.urls[0])) == 1
+    assert len(frames_sent(fast.http_client, fast.urls[0])) >= 5
+    assert stats['writes_skipped'] >= 4
+
+
+def test_stop_restores_room_color(make_room, http):
+    manager = make_room()
+    manager.is_light_on = True
+    manager.color = Color.from_str_blebox('00ff000000')
+
+    async def run():
+        manager.effect_engine.start(strobe(frame_ms=10), [manager])
+        await asyncio.sleep(0.05)
+        assert manager.effect_engine.stop([manager]) == 1
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    assert frames_sent(http, manager.urls[0])[-1] == manager.device_color()
+    assert not manager.effect_engine.is_running(manager)
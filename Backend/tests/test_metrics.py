@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from device_health import DeviceUnavailableError
+from led_room_manager import record_device_request
+from metrics import (DEVICE_REQUEST_FAILURES, MQTT_RECEIVED_AT, MQTT_TO_DEVICE_SECONDS, CallbackMetric, Counter,
+                     Histogram, MetricsRegistry)
+
+
+def observations() -> tuple:
+    _, total, count = MQTT_TO_DEVICE_SECONDS.values.get((), (None, 0.0, 0))
+    return total, count
+
+
+def test_paced_color_write_records_mqtt_to_device_latency(make_room):
+    manager = make_room()
+    manager.is_light_on = True
+
+    async def handle_message():
+        # Szybkie kręcenie pokrętłem - kolejny zapis czeka na slot planera w TimerService
+        MQTT_RECEIVED_AT.set(time.monotonic())
+        manager.transition_planner.interval = 0.1
+        manager.transition_planner.next_send = time.monotonic() + 0.05
+        await manager._apply_planned_color()
+
+    async def run():
+        await asyncio.create_task(handle_message())
+        assert manager.timer_service.time_left((manager, 'paced_color')) is not None
+        await asyncio.sleep(0.1)
+
+    total_before, count_before = observations()
+    asyncio.run(run())
+    total, count = observations()
+    assert count == count_before + 1
+    assert total - total_before >= 0.05
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', 'Test', ('device',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'a')
+
+    assert histogram.render() == [
+        '# HELP test_seconds Test',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{device="a",le="0.1"} 2',
+        'test_seconds_bucket{device="a",le="1"} 3',
+        'test_seconds_bucket{device="a",le="+Inf"} 4',
+        'test_seconds_sum{device="a"} 3.65',
+        'test_seconds_count{device="a"} 4',
+    ]
+
+
+def test_registry_renders_counters_and_callbacks_with_escaped_labels():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter('test_total', 'Licznik', ('topic',)))
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    registry.register(CallbackMetric('test_open', 'Otwarte', ('device',), lambda: [(('http://x',), 1)]))
+
+    assert registry.render() == (
+        '# HELP test_total Licznik\n'
+        '# TYPE test_total counter\n'
+        'test_total{topic="a\\"b"} 3\n'
+        '# HELP test_open Otwarte\n'
+        '# TYPE test_open gauge\n'
+        'test_open{device="http://x"} 1\n'
+    )
+
+
+def test_device_request_failures_are_counted_by_reason():
+    device = 'http://metrics-test'
+    started = time.monotonic()
+    assert record_device_request(device, 'GET', started, asyncio.TimeoutError()) == 'timeout'
+    assert record_device_request(device, 'GET', started, DeviceUnavailableError(device)) == 'unavailable'
+    assert record_device_request(device, 'GET', started, OSError()) == 'error'
+    assert record_device_request(device, 'GET', started) == 'ok'
+    for reason in ('timeout', 'unavailable', 'error'):
+        assert DEVICE_REQUEST_FAILURES.values[(device, 'GET', reason)] == 1
@@ -0,0 +1,82 @@
+import asyncio
+
+import led_room_manager
+
+
+def motion_room(make_room, is_daylight: bool = False):
+    manager = make_room(use_motion_detector=True)
+    manager.sunrise_api.is_daylight_now = lambda house_name: is_daylight
+    manager.sunrise_api.seconds_until_daylight = lambda house_name: 3600
+    return manager
+
+
+def color_writes(http) -> list:
+    return [request for request in http.requests if '/s/' in request[1]]
+
+
+def test_burst_of_motion_switches_light_on_once(make_room, http):
+    manager = motion_room(make_room)
+
+    async def run():
+        # Sterownik odpowiada powoli - kolejne zgłoszenia nie dokładają zapisów
+        http.gate = asyncio.Event()
+        for _ in range(10):
+            manager.record_motion()
+        await asyncio.sleep(0)
+        http.gate.set()
+        await manager.motion_task
+
+    asyncio.run(run())
+    assert manager.is_light_on
+    assert len(color_writes(http)) == 1
+    assert manager.get_motion_stats() == {'events': 10, 'suppressed': 9, 'extended': 0, 'applied': 1}
+
+
+def test_motion_while_on_only_moves_the_deadline(make_room, http, monkeypatch):
+    manager = motion_room(make_room)
+    monkeypatch.setattr(led_room_manager, 'MOTION_DEBOUNCE', 0.0)
+
+    async def run():
+        manager.record_motion()
+        await manager.motion_task
+        last_move = manager.last_move
+        await asyncio.sleep(0.01)
+        manager.record_motion()
+        return last_move
+
+    last_move = asyncio.run(run())
+    assert manager.last_move > last_move
+    assert len(color_writes(http)) == 1
+    assert manager.get_motion_stats()['extended'] == 1
+
+
+def test_light_switched_off_reacts_to_the_next_motion(make_room, http):
+    manager = motion_room(make_room)
+
+    async def run():
+        manager.record_motion()
+        await manager.motion_task
+        await manager.set_light(False)
+        # W oknie debounce, ale zgaszone światło zapalamy zawsze
+        manager.record_motion()
+        await manager.motion_task
+
+    asyncio.run(run())
+    assert manager.is_light_on
+    assert manager.get_motion_stats()['applied'] == 2
+
+
+def test_no_light_during_daylight_or_when_disabled(make_room, http):
+    daylight = motion_room(make_room, is_daylight=True)
+    disabled = motion_room(make_room)
+    disabled.is_enabled = False
+
+    async def run():
+        daylight.record_motion()
+        disabled.record_motion()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert daylight.motion_task is None and disabled.motion_task is None
+    assert not daylight.is_light_on and not disabled.is_light_on
+    assert http.requests == []
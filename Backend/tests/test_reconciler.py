@@ -0,0 +1,64 @@
+import asyncio
+
+from color import Color
+from db.models.room import ColorType
+from reconciler import DeviceReconciler, same_color
+
+
+def led_state(color: str) -> dict:
+    return {'rgbw': {'desiredColor': color}}
+
+
+def test_same_color_ignores_channel_count_and_case():
+    assert same_color('00FF00', '00ff000000')
+    assert not same_color('00ff0001', '00ff000000')
+
+
+def test_reconcile_writes_only_to_devices_out_of_sync(make_room, http):
+    in_sync = make_room(1)
+    drifted = make_room(2)
+    offline = make_room(3)
+    for manager in (in_sync, drifted, offline):
+        manager.is_light_on = True
+        manager.color = Color.from_str_blebox('00ff000000')
+    http.states = {
+        'http://10.0.0.1/api/rgbw/state': led_state('00FF00'),
+        'http://10.0.0.2/api/rgbw/state': led_state('ff00000000'),
+        'http://10.0.0.3/api/rgbw/state': ConnectionError('timeout'),
+    }
+    reconciler = DeviceReconciler(http)
+
+    summary = asyncio.run(reconciler.reconcile([in_sync, drifted, offline]))
+
+    assert summary == {'in_sync': 1, 'corrected': 1, 'unreachable': 1}
+    writes = [request[1] for request in http.requests if '/s/' in request[1]]
+    assert writes == ['http://10.0.0.2/s/00ff000000']
+    # Zgodne urządzenie trafia do cache - ten sam kolor nie zostanie wysłany ponownie
+    assert http.state_cache.is_current('http://10.0.0.1', '00ff000000')
+    assert http.state_cache.is_current('http://10.0.0.2', '00ff000000')
+    assert reconciler.get_stats()['writes_saved'] == 1
+
+
+def test_reconcile_single_device_and_shared_closets(make_room, http):
+    closets = ['http://10.0.1.1']
+    first = make_room(1, closet_urls=closets, type=ColorType.WRGB_BLEXBOX_WITH_CLOSET, closet_brightness=128)
+    second = make_room(2, closet_urls=closets, type=ColorType.WRGB_BLEXBOX_WITH_CLOSET, closet_brightness=255)
+    first.is_light_on = True
+    http.states = {'http://10.0.1.1/json/state': {'on': True, 'bri': 255}}
+    reconciler = DeviceReconciler(http)
+
+    # Tylko szafka - taśm pokoi nie odpytujemy; jej stan wyznacza pierwszy pokój
+    summary = asyncio.run(reconciler.reconcile([first, second], device='http://10.0.1.1'))
+
+    assert summary == {'in_sync': 0, 'corrected': 1, 'unreachable': 0}
+    assert http.requests == [
+        ('GET', 'http://10.0.1.1/json/state'),
+        ('POST', 'http://10.0.1.1/json/state', {'on': True, 'bri': '128'}),
+    ]
+
+
+def test_reconcile_skips_rooms_running_an_effect(make_room, http):
+    manager = make_room()
+    manager.effect_engine.runs[manager] = object()
+    assert asyncio.run(DeviceReconciler(http).reconcile([manager])) == {'in_sync': 0, 'corrected': 0, 'unreachable': 0}
+    assert http.requests == []
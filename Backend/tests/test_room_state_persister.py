@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from color import Color
+from db.async_db import AsyncDatabase
+from db.db_init import Base
+from db.models.house import House
+from db.models.room import Room
+from room_state_persister import RoomStatePersister
+
+
+def room(room_id: int, color: str = 'ff00000000') -> SimpleNamespace:
+    # Persister czyta z managera tylko id, kolor i jasność szafki
+    return SimpleNamespace(room_id=room_id, color=Color.from_str_blebox(color), closet_brightness=10)
+
+
+def sqlite_database(tmp_path) -> AsyncDatabase:
+    engine = create_engine(f'sqlite:///{tmp_path / "rooms.db"}')
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as session:
+        session.add(House(id=1, name='h', description='test'))
+        session.add_all(Room(id=room_id, name=f'r{room_id}', house_id=1, desired_color='0000000000')
+                        for room_id in (1, 2))
+        session.commit()
+    return AsyncDatabase(session_factory)
+
+
+class FlakyDatabase:
+    """Bulk UPDATE zawsze się nie udaje, a zapis wiersz po wierszu - tylko dla pokoi z broken"""
+
+    def __init__(self, broken):
+        self.broken = set(broken)
+        self.written = []
+
+    async def update_rooms(self, rows):
+        raise RuntimeError('bulk failed')
+
+    async def update_rooms_each(self, rows):
+        failed = [row['id'] for row in rows if row['id'] in self.broken]
+        self.written.extend(row['id'] for row in rows if row['id'] not in self.broken)
+        return [], failed
+
+
+def test_missing_row_does_not_block_other_rooms(tmp_path):
+    database = sqlite_database(tmp_path)
+    persister = RoomStatePersister(database)
+    for manager in (room(1, '00ff000000'), room(99)):
+        persister.on_state_changed(manager, 'color')
+    try:
+        assert asyncio.run(persister.flush()) == 1
+        # Usunięty pokój odpada - kolejne zmiany zapisują się już zwykłym bulk UPDATE
+        assert persister.dirty == {}
+        assert persister.rows_dropped == 1
+        persister.on_state_changed(room(2, '0000ff0000'), 'color')
+        assert asyncio.run(persister.flush()) == 1
+        with database.session_factory() as session:
+            assert session.get(Room, 1).desired_color == str(Color.from_str_blebox('00ff000000'))
+            assert session.get(Room, 2).desired_color == str(Color.from_str_blebox('0000ff0000'))
+    finally:
+        database.close()
+
+
+def test_failing_row_is_retried_a_limited_number_of_times():
+    database = FlakyDatabase(broken=[2])
+    persister = RoomStatePersister(database)
+    persister.max_retries = 2
+    persister.on_state_changed(room(1), 'color')
+    persister.on_state_changed(room(2), 'color')
+
+    assert asyncio.run(persister.flush()) == 1
+    assert list(persister.dirty) == [2]
+    assert asyncio.run(persister.flush()) == 0
+    assert list(persister.dirty) == [2]
+    asyncio.run(persister.flush())
+    assert persister.dirty == {}
+    assert persister.rows_dropped == 1
+    assert database.written == [1]
+
+
+def test_unreachable_database_keeps_all_rows():
+    class DownDatabase:
+        async def update_rooms(self, rows):
+            raise ConnectionError('down')
+
+        async def update_rooms_each(self, rows):
+            raise ConnectionError('down')
+
+    persister = RoomStatePersister(DownDatabase())
+    persister.max_retries = 1
+    persister.on_state_changed(room(1), 'color')
+    for _ in range(3):
+        assert asyncio.run(persister.flush()) == 0
+    # Awaria całej bazy nie zużywa limitu prób pojedynczych wierszy
+    assert list(persister.dirty) == [1]
+    assert persister.rows_dropped == 0
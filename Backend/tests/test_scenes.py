@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from color import Color
+from db.models.room import ColorType
+from scenes import OFF_SCENE, SceneDefinition, SceneEngine, SceneRoomTarget
+
+GREEN = str(Color.from_str_blebox('00ff000000'))
+BLUE = str(Color.from_str_blebox('0000ff0000'))
+CLOSETS = ['http://10.0.1.1']
+
+
+@pytest.fixture
+def house(make_room):
+    """Salon i jadalnia na jednym sterowniku taśmy, sypialnia osobno; wszystkie dzielą szafkę"""
+    rooms = {
+        'living': make_room(1, CLOSETS, type=ColorType.WRGB_BLEXBOX_WITH_CLOSET, closet_brightness=64),
+        'dining': make_room(2, CLOSETS, url='http://10.0.0.1', type=ColorType.WRGB_BLEXBOX_WITH_CLOSET,
+                            closet_brightness=200),
+        'bedroom': make_room(3, CLOSETS, type=ColorType.WRGB_BLEXBOX_WITH_CLOSET, closet_brightness=255),
+    }
+    yield rooms
+    for manager in rooms.values():
+        manager.close()
+
+
+def evening(fade_ms: int = 500) -> SceneDefinition:
+    return SceneDefinition('evening', fade_ms, [
+        SceneRoomTarget(1, True, GREEN, None),
+        SceneRoomTarget(2, True, BLUE, None),
+        SceneRoomTarget(3, False, None, None),
+        SceneRoomTarget(99, True, GREEN, None),  # pokój usunięty z domu
+    ])
+
+
+def test_plan_sends_one_write_per_device(house):
+    engine = SceneEngine(None)
+
+    async def plan():
+        return engine.plan(house, evening())
+
+    writes = asyncio.run(plan())
+
+    assert house['living'].is_light_on and str(house['living'].color) == GREEN
+    assert not house['bedroom'].is_light_on
+    # Wspólny sterownik dostaje jeden zapis, a szafka świeci najjaśniej z włączonych pokoi
+    assert [(write.method, write.url, write.payload) for write in writes] == [
+        ('GET', f'http://10.0.0.1/s/{BLUE}/colorFadeMs/500', None),
+        ('GET', 'http://10.0.0.3/s/0000000000/colorFadeMs/500', None),
+        ('POST', 'http://10.0.1.1/json/state', {'on': True, 'bri': '200'}),
+    ]
+
+
+def test_apply_skips_devices_already_in_scene_state(house, http):
+    engine = SceneEngine(http)
+    engine.scenes = {'h': {'evening': evening(fade_ms=0)}}
+
+    async def run():
+        first = await engine.apply('h', house, 'evening')
+        second = await engine.apply('h', house, 'evening')
+        forced = await engine.apply('h', house, 'evening', force=True)
+        return first, second, forced
+
+    first, second, forced = asyncio.run(run())
+    assert [device['result'] for device in first['devices']] == ['ok', 'ok', 'ok']
+    assert [device['result'] for device in second['devices']] == ['unchanged'] * 3
+    assert [device['result'] for device in forced['devices']] == ['ok', 'ok', 'ok']
+    assert len(http.requests) == 6
+    assert engine.get_stats()['device_writes'] == 6
+
+
+def test_failed_write_is_reported_and_not_cached(house, http):
+    engine = SceneEngine(http)
+
+    async def unreachable(url):
+        raise ConnectionError('refused')
+
+    http.get = unreachable
+    result = asyncio.run(engine.apply('h', house, OFF_SCENE))
+
+    assert result['scene'] == OFF_SCENE
+    assert result['failed'] == 2
+    assert not any(manager.is_light_on for manager in house.values())
+    assert not http.state_cache.is_current('http://10.0.0.1', '0000000000')
+    assert http.state_cache.is_current('http://10.0.1.1/json/state', 'False:0')
+
+
+def test_unknown_scene(house, http):
+    engine = SceneEngine(http)
+    assert engine.names('h') == [OFF_SCENE]
+    with pytest.raises(KeyError):
+        asyncio.run(engine.apply('h', house, 'party'))
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from color import Color
+from db.db_init import SessionLocal
+from db.models.house import House
+from db.models.room import Room
+from sharding import HashRing, ShardCoordinator
+
+
+@pytest.fixture
+def shard(app, monkeypatch):
+    """Węzeł w0 z dwóch; w1 na starcie martwy, więc w0 obsługuje wszystkie domy"""
+    monkeypatch.setenv('SHARD_WORKERS', 'w0=http://w0:1,w1=http://w1:1')
+    monkeypatch.setenv('SHARD_SELF', 'w0')
+    coordinator = ShardCoordinator()
+    coordinator.live = {'w0'}
+    coordinator._rebuild(notify=False)
+    monkeypatch.setattr(app, 'shard', coordinator)
+    return coordinator
+
+
+@pytest.fixture
+def w1_house(app, room_row):
+    """Dom, który po powrocie w1 należy do w1"""
+    name = next(f'house{i}' for i in range(100) if HashRing(['w0', 'w1']).owner(f'house{i}') == 'w1')
+    with SessionLocal() as session:
+        session.add(House(id=2, name=name, description='test'))
+        session.add(room_row(3, 'attic', house_id=2))
+        session.commit()
+    return name
+
+
+def load(app) -> None:
+    app.apply_db_config(asyncio.run(app.database.load_houses()))
+
+
+def test_snapshot_state_trusted_only_within_failover_time(app, shard):
+    fresh = {'node': 'w0', 'saved_at': time.time()}
+    assert app.snapshot_state_trusted(fresh)
+    # Po dłuższej przerwie domy przejęli inni, a migawka innego węzła nigdy nie opisuje naszych domów
+    assert not app.snapshot_state_trusted(dict(fresh, saved_at=time.time() - shard.failover_seconds - 1))
+    assert not app.snapshot_state_trusted(dict(fresh, node='w1'))
+
+
+def test_handoff_writes_state_and_releases_houses(app, shard, w1_house):
+    load(app)
+    attic = app.managers_dict[w1_house]['attic']
+    attic.color = Color.from_str_blebox('00ff000000')
+    attic._emit_state_change('color')
+
+    response = asyncio.run(app.shard_handoff('w1'))
+
+    assert w1_house in response['released']
+    assert shard.live == {'w0', 'w1'}
+    assert sorted(app.managers_dict) == sorted(house for house in ('h', w1_house) if shard.owns(house))
+    assert attic.closed
+    with SessionLocal() as session:
+        assert session.get(Room, 3).desired_color == str(attic.color)
+
+
+def test_rebalance_loads_state_after_previous_owner_handoff(app, shard, w1_house, monkeypatch):
+    # Ten węzeł jest w1 i przejmuje dom od w0 - w0 zapisuje przy oddaniu nowszy kolor
+    shard.self_name = 'w1'
+    shard.live = {'w0'}
+    shard._rebuild(notify=False)
+    shard.live = {'w0', 'w1'}
+    shard._rebuild(notify=False)
+    requested = []
+
+    async def request_handoff(nodes):
+        requested.append(set(nodes))
+        with SessionLocal() as session:
+            session.get(Room, 3).desired_color = str(Color.from_str_blebox('0000ff0000'))
+            session.commit()
+        return sorted(nodes)
+
+    monkeypatch.setattr(shard, 'request_handoff', request_handoff)
+    asyncio.run(app.rebalance())
+
+    assert requested == [{'w0'}]
+    assert w1_house in app.managers_dict
+    assert str(app.managers_dict[w1_house]['attic'].color) == str(Color.from_str_blebox('0000ff0000'))
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from sharding import HashRing, ShardCoordinator
+
+HOUSES = [f'house{i}' for i in range(1000)]
+
+
+def test_owner_is_stable_and_deterministic():
+    ring = HashRing(['w0', 'w1', 'w2'])
+    again = HashRing(['w2', 'w0', 'w1'])
+    assert [ring.owner(house) for house in HOUSES] == [again.owner(house) for house in HOUSES]
+
+
+def test_vnodes_spread_houses_evenly():
+    counts = Counter(HashRing(['w0', 'w1', 'w2']).owner(house) for house in HOUSES)
+    assert set(counts) == {'w0', 'w1', 'w2'}
+    assert min(counts.values()) > len(HOUSES) / 3 * 0.7
+
+
+def test_removing_node_moves_only_its_houses():
+    before = HashRing(['w0', 'w1', 'w2'])
+    after = HashRing(['w0', 'w2'])
+    for house in HOUSES:
+        if before.owner(house) != 'w1':
+            assert after.owner(house) == before.owner(house)
+        else:
+            assert after.owner(house) in ('w0', 'w2')
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([]).owner('house') is None
+
+
+def test_starts_with_all_configured_nodes(monkeypatch):
+    # Węzeł, który jeszcze nie odpowiedział na ping, nadal jest właścicielem swoich domów
+    monkeypatch.setenv('SHARD_WORKERS', 'w0=http://a:1,w1=http://b:1,w2=http://c:1')
+    monkeypatch.setenv('SHARD_SELF', 'w0')
+    coordinator = ShardCoordinator()
+    owned = [house for house in HOUSES if coordinator.owns(house)]
+    assert owned == [house for house in HOUSES if HashRing(['w0', 'w1', 'w2']).owner(house) == 'w0']
+
+
+def test_single_process_owns_everything(monkeypatch):
+    monkeypatch.delenv('SHARD_WORKERS', raising=False)
+    coordinator = ShardCoordinator()
+    assert all(coordinator.owns(house) for house in HOUSES)
@@ -0,0 +1,62 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from device_health import CircuitState, DeviceUnavailableError, device_key
+from http_client import DeviceHttpClient
+from simulator import DeviceSimulator, FaultProfile, VirtualDevice
+
+
+def test_virtual_device_requires_handle():
+    with pytest.raises(TypeError):
+        VirtualDevice('abstract')
+
+
+@pytest.mark.parametrize('own_port', [True, False], ids=['own_port', 'shared_port'])
+def test_devices_have_separate_health_keys_and_dropped_requests_disconnect(own_port):
+    async def run():
+        simulator = DeviceSimulator()
+        simulator.add_device('ok', 'blebox', own_port=own_port)
+        simulator.add_device('broken', 'blebox', FaultProfile(drop_rate=1.0), own_port=own_port)
+        await simulator.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{simulator.url_for('ok')}/s/ff00000000") as response:
+                    assert response.status == 200
+                    assert (await response.json())['rgbw']['desiredColor'] == 'ff00000000'
+                with pytest.raises(aiohttp.ClientError):
+                    async with session.get(f"{simulator.url_for('broken')}/s/ff00000000") as response:
+                        await response.read()
+        finally:
+            await simulator.stop()
+        return simulator
+
+    simulator = asyncio.run(run())
+    assert device_key(simulator.url_for('ok')) != device_key(simulator.url_for('broken'))
+    assert simulator.devices['broken'].get_stats()['outcomes'] == {'dropped': 1}
+    assert simulator.devices['ok'].get_stats()['outcomes'] == {'ok': 1}
+    # Komendy na wspólnym porcie trafiają do urządzenia już bez prefiksu
+    assert [command.path for command in simulator.commands('ok')] == ['/s/ff00000000']
+
+
+def test_broken_device_on_shared_port_opens_only_its_circuit():
+    async def run():
+        simulator = DeviceSimulator()
+        simulator.add_device('ok', 'blebox', own_port=False)
+        simulator.add_device('broken', 'blebox', FaultProfile(drop_rate=1.0), own_port=False)
+        await simulator.start()
+        http_client = DeviceHttpClient()
+        try:
+            for _ in range(http_client.health.failure_threshold):
+                with pytest.raises(aiohttp.ClientError):
+                    await http_client.get(f"{simulator.url_for('broken')}/s/ff00000000")
+            with pytest.raises(DeviceUnavailableError):
+                await http_client.get(f"{simulator.url_for('broken')}/s/ff00000000")
+            await http_client.get(f"{simulator.url_for('ok')}/s/00ff000000")
+            assert http_client.health.get(device_key(simulator.url_for('ok'))).state is CircuitState.CLOSED
+        finally:
+            await http_client.close()
+            await simulator.stop()
+
+    asyncio.run(run())
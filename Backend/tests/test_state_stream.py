@@ -0,0 +1,104 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from color import Color
+from state_stream import StateStream
+
+
+def stream_for(manager) -> StateStream:
+    stream = StateStream()
+    stream.managers_dict = {'h': {manager.room.name: manager}}
+    stream.watch(manager)
+    return stream
+
+
+def sse_data(event: str) -> dict:
+    return json.loads(event.split('data: ', 1)[1])
+
+
+def test_snapshot_is_rebuilt_only_after_a_streamed_change(make_room):
+    manager = make_room()
+    stream = stream_for(manager)
+    etag = stream.etag
+
+    body = stream.snapshot()
+    assert stream.snapshot() is body
+    assert json.loads(body)['houses'] == {'h': {'r1': {
+        'is_light_on': False, 'is_enabled': True, 'color': 'ff00000000', 'mode': manager.current_mode_index,
+        'closet_brightness': 0}}}
+    # Pole spoza migawki nie unieważnia ETag
+    manager._emit_state_change('last_move')
+    assert stream.etag == etag
+
+    manager.color = Color.from_str_blebox('00ff000000')
+    manager._emit_state_change('color')
+    assert stream.etag != etag
+    assert json.loads(stream.snapshot())['houses']['h']['r1']['color'] == '00ff000000'
+    assert stream.get_stats()['snapshots_built'] == 2
+
+
+def test_get_state_returns_304_for_current_etag(app):
+    app.apply_db_config(asyncio.run(app.database.load_houses()))
+
+    def get_state(etag=None):
+        headers = {'if-none-match': etag} if etag else {}
+        return asyncio.run(app.get_state(SimpleNamespace(headers=headers)))
+
+    response = get_state()
+    etag = response.headers['etag']
+    assert response.status_code == 200
+    assert set(json.loads(response.body)['houses']['h']) == {'kitchen', 'hall'}
+    assert get_state(etag).status_code == 304
+
+    kitchen = app.managers_dict['h']['kitchen']
+    kitchen.is_light_on = True
+    kitchen._emit_state_change('is_light_on')
+    response = get_state(etag)
+    assert response.status_code == 200
+    assert json.loads(response.body)['houses']['h']['kitchen']['is_light_on']
+
+
+def test_sse_streams_changes_and_unsubscribes_on_disconnect(make_room):
+    manager = make_room()
+    stream = stream_for(manager)
+
+    async def run():
+        events = stream.subscribe_events()
+        hello = await events.__anext__()
+        assert stream.get_stats()['clients'][0]['queued'] == 0
+        manager.is_light_on = True
+        manager._emit_state_change('is_light_on')
+        change = await events.__anext__()
+        await events.aclose()
+        return hello, change
+
+    hello, change = asyncio.run(run())
+    assert hello.startswith('event: hello\n')
+    assert change.startswith(f'id: {stream.version}\nevent: change\n')
+    assert sse_data(change) == {'version': stream.version, 'house': 'h', 'room': 'r1', 'field': 'is_light_on',
+                                'value': True}
+    assert stream.clients == set()
+
+
+def test_slow_client_gets_resync_instead_of_backlog(make_room):
+    manager = make_room()
+    stream = stream_for(manager)
+    stream.queue_size = 2
+    stream.heartbeat = 0.01
+
+    async def run():
+        events = stream.subscribe_events()
+        await events.__anext__()
+        for i in range(3):
+            manager.closet_brightness = i
+            manager._emit_state_change('closet_brightness')
+        received = [await events.__anext__(), await events.__anext__()]
+        await events.aclose()
+        return received
+
+    resync, heartbeat = asyncio.run(run())
+    assert 'event: resync\n' in resync
+    assert sse_data(resync) == {'version': stream.version, 'resync': True}
+    assert heartbeat == ': heartbeat\n\n'
+    assert stream.overflows == 1
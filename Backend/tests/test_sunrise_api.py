@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from sunrise_api import DAY_SECONDS, DEFAULT_LATITUDE, DEFAULT_LONGITUDE, SunTable, SunriseSunsetAPI, compute_sun_times
+
+WROCLAW = (51.1309, 17.10175)
+SYDNEY = (-33.87, 151.21)
+SVALBARD = (78.2, 15.6)
+
+
+def utc(*args) -> datetime.datetime:
+    return datetime.datetime(*args)
+
+
+@pytest.mark.parametrize('day, sunrise, sunset', [
+    # Wrocław: 4:36 / 21:10 czasu letniego i 7:52 / 15:46 zimowego
+    (datetime.date(2024, 6, 21), 2 * 3600 + 36 * 60, 19 * 3600 + 10 * 60),
+    (datetime.date(2024, 12, 21), 6 * 3600 + 52 * 60, 14 * 3600 + 46 * 60),
+])
+def test_compute_sun_times_matches_almanac(day, sunrise, sunset):
+    computed_sunrise, computed_sunset = compute_sun_times(day, *WROCLAW)
+    assert abs(computed_sunrise - sunrise) < 5 * 60
+    assert abs(computed_sunset - sunset) < 5 * 60
+
+
+def test_polar_day_and_night():
+    sunrise, sunset = compute_sun_times(datetime.date(2024, 6, 21), *SVALBARD)
+    assert (sunrise, sunset) == (-DAY_SECONDS, 2 * DAY_SECONDS)
+    sunrise, sunset = compute_sun_times(datetime.date(2024, 12, 21), *SVALBARD)
+    assert sunrise >= sunset
+
+    table = SunTable(*SVALBARD, 2024)
+    assert table.is_daylight(utc(2024, 6, 21, 0, 0))
+    assert not table.is_daylight(utc(2024, 12, 21, 12, 0))
+    # Noc polarna do końca roku - wracamy po dobie, kiedy tabela przeliczy się na nowy rok
+    assert table.seconds_until_daylight(utc(2024, 12, 21, 12, 0)) == DAY_SECONDS
+    # W styczniu pierwszy wschód jest dopiero w połowie lutego
+    assert table.seconds_until_daylight(utc(2024, 1, 10, 12, 0)) > 30 * DAY_SECONDS
+
+
+def test_daylight_and_seconds_until_daylight():
+    table = SunTable(*WROCLAW, 2024)
+    sunrise, _ = compute_sun_times(datetime.date(2024, 6, 21), *WROCLAW)
+
+    assert table.is_daylight(utc(2024, 6, 21, 12, 0))
+    assert table.seconds_until_daylight(utc(2024, 6, 21, 12, 0)) == 0
+    assert not table.is_daylight(utc(2024, 6, 21, 0, 0))
+    assert table.seconds_until_daylight(utc(2024, 6, 21, 0, 0)) == sunrise + 1
+    # Po zachodzie czekamy na jutrzejszy wschód
+    after_sunset = table.seconds_until_daylight(utc(2024, 6, 21, 22, 0))
+    assert 0 < after_sunset - (DAY_SECONDS - 22 * 3600) < 3 * 3600
+
+
+def test_daylight_crossing_utc_midnight():
+    # W Sydney w grudniu wschód wypada poprzedniego dnia w UTC
+    table = SunTable(*SYDNEY, 2024)
+    assert table.is_daylight(utc(2024, 12, 21, 2, 0))
+    assert table.is_daylight(utc(2024, 12, 21, 20, 0))
+    assert not table.is_daylight(utc(2024, 12, 21, 12, 0))
+
+
+def test_house_location_defaults_and_table_reuse():
+    api = SunriseSunsetAPI()
+    api.set_house_location('home', None, None)
+    api.set_house_location('cabin', *WROCLAW)
+    assert api.locations['home'] == (DEFAULT_LATITUDE, DEFAULT_LONGITUDE)
+    # Domy w tym samym miejscu dzielą jedną tabelę
+    assert len(api.tables) == 1
+
+    table = api._table_for_house('unknown', utc(2030, 1, 1))
+    assert (table.latitude, table.longitude, table.year) == (DEFAULT_LATITUDE, DEFAULT_LONGITUDE, 2030)
+    assert isinstance(api.is_daylight_now('home'), bool)
+    assert api.seconds_until_daylight('home') >= 0
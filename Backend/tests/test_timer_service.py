@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+
+from timer_service import TimerService
+
+
+def test_timer_fires_once_at_deadline_and_reschedule_moves_it():
+    timers = TimerService()
+    fired = []
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        timers.schedule('a', 0.05, lambda: fired.append(('first', loop.time() - started)))
+        # Ten sam klucz - poprzedni termin przepada
+        timers.schedule('a', 0.1, lambda: fired.append(('second', loop.time() - started)))
+        assert 0.05 < timers.time_left('a') <= 0.1
+        await asyncio.sleep(0.15)
+
+    asyncio.run(run())
+    assert [name for name, _ in fired] == ['second']
+    assert fired[0][1] >= 0.1
+    assert timers.time_left('a') is None
+    assert timers.get_stats() == {'scheduled': 0, 'running': 0, 'fired': 1}
+
+
+def test_cancel_and_coroutine_callbacks():
+    timers = TimerService()
+    fired = []
+
+    async def callback(name):
+        await asyncio.sleep(0)
+        fired.append(name)
+
+    async def run():
+        timers.schedule('cancelled', 0.01, callback, 'cancelled')
+        timers.schedule('kept', 0.01, callback, 'kept')
+        timers.cancel('cancelled')
+        timers.cancel('missing')
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert fired == ['kept']
+
+
+def daylight(manager, is_daylight: bool, seconds_until_daylight: float = 3600) -> None:
+    manager.sunrise_api.is_daylight_now = lambda house_name: is_daylight
+    manager.sunrise_api.seconds_until_daylight = lambda house_name: seconds_until_daylight
+
+
+def test_light_switches_off_at_motion_deadline(make_room):
+    manager = make_room(use_motion_detector=True)
+    manager.duration_seconds = 0.1
+    daylight(manager, True)
+
+    async def run():
+        manager.last_move = datetime.datetime.utcnow()
+        await manager.set_light(True)
+        await asyncio.sleep(0.05)
+        # Ruch przed terminem - timer przesuwa wyłączenie dopiero, gdy nadejdzie (t=0.1 -> 0.15)
+        manager.last_move = datetime.datetime.utcnow()
+        await asyncio.sleep(0.07)
+        assert manager.is_light_on
+        await asyncio.sleep(0.08)
+
+    asyncio.run(run())
+    assert not manager.is_light_on
+    assert manager.timer_service.get_stats()['fired'] == 2
+
+
+def test_light_stays_on_until_daylight(make_room):
+    manager = make_room(use_motion_detector=True)
+    manager.duration_seconds = 0.01
+    daylight(manager, False, seconds_until_daylight=0.05)
+
+    async def run():
+        manager.last_move = datetime.datetime.utcnow()
+        await manager.set_light(True)
+        await asyncio.sleep(0.03)
+        assert manager.is_light_on
+        # Po wschodzie słońca timer gasi światło
+        daylight(manager, True)
+        await asyncio.sleep(0.06)
+
+    asyncio.run(run())
+    assert not manager.is_light_on
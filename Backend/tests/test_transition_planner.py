@@ -0,0 +1,57 @@
+from transition_planner import DEFAULT_FADE_MS, MAX_INTERVAL, MIN_INTERVAL, TransitionPlanner
+
+
+def test_slow_updates_go_out_immediately_with_default_fade():
+    planner = TransitionPlanner()
+    now = 0.0
+    for _ in range(5):
+        planner.on_update(now)
+        assert planner.plan(now) == (0.0, DEFAULT_FADE_MS)
+        now += 0.5
+    assert planner.paced == 0
+
+
+def test_fast_updates_are_spaced_with_fade_equal_to_interval():
+    planner = TransitionPlanner()
+    now = 0.0
+    planner.on_update(now)
+    assert planner.plan(now) == (0.0, DEFAULT_FADE_MS)
+
+    now += 0.02
+    planner.on_update(now)
+    delay, fade_ms = planner.plan(now)
+    # Zmiany co 20 ms - zapis dopiero w kolejnym slocie, przejście na cały odstęp między zapisami
+    assert abs(delay - (MIN_INTERVAL - 0.02)) < 1e-9
+    assert fade_ms == int(MIN_INTERVAL * 1000)
+
+    send_at = now + delay
+    delay, fade_ms = planner.plan(send_at)
+    assert abs(delay - MIN_INTERVAL) < 1e-9
+    assert planner.paced == 2
+
+
+def test_send_interval_follows_input_rate_within_bounds():
+    planner = TransitionPlanner()
+    now = 0.0
+    for _ in range(20):
+        planner.on_update(now)
+        now += 0.15
+    delay, fade_ms = planner.plan(now)
+    assert MIN_INTERVAL * 1000 <= fade_ms <= MAX_INTERVAL * 1000
+    assert abs(fade_ms - 150) <= 1
+
+
+def test_idle_gap_and_reset_start_over():
+    planner = TransitionPlanner()
+    for i in range(5):
+        planner.on_update(i * 0.02)
+    assert planner.interval is not None
+    planner.on_update(5.0)
+    assert planner.interval is None
+
+    for i in range(5):
+        planner.on_update(10 + i * 0.02)
+    planner.plan(10.1)
+    planner.reset()
+    # Akcja dyskretna (np. włączenie światła) idzie od razu
+    assert planner.plan(10.11) == (0.0, DEFAULT_FADE_MS)
@@ -0,0 +1,57 @@
+import asyncio
+import contextvars
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+
+class TimerService:
+    """Centralne timery z terminem na monotonicznym zegarze pętli zdarzeń.
+
+    Terminy trzyma kopiec pętli asyncio (call_at), więc nic nie działa dla bezczynnych pokoi.
+    Każdy timer ma klucz - ponowne zaplanowanie z tym samym kluczem przesuwa termin.
+    Callback może być zwykłą funkcją albo korutyną (wtedy uruchamiamy ją jako task).
+    """
+
+    def __init__(self):
+        self.handles: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.tasks: Set[asyncio.Task] = set()
+        self.fired = 0
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[..., Any], *args: Any) -> None:
+        loop = asyncio.get_running_loop()
+        self.cancel(key)
+        deadline = loop.time() + max(delay, 0.0)
+        # Świeży kontekst - timer nie dziedziczy zmiennych kontekstowych (np. czasu wiadomości MQTT)
+        self.handles[key] = loop.call_at(deadline, self._fire, key, callback, args, context=contextvars.Context())
+
+    def cancel(self, key: Hashable) -> None:
+        handle = self.handles.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    def time_left(self, key: Hashable) -> Optional[float]:
+        handle = self.handles.get(key)
+        if handle is None:
+            return None
+        return handle.when() - asyncio.get_running_loop().time()
+
+    def _fire(self, key: Hashable, callback: Callable[..., Any], args: tuple) -> None:
+        self.handles.pop(key, None)
+        self.fired += 1
+        try:
+            result = callback(*args)
+        except Exception as e:
+            print(f"Error in timer {key}: {e}")
+            return
+        if asyncio.iscoroutine(result):
+            task = asyncio.ensure_future(result)
+            # Trzymamy referencję, żeby task nie został zebrany przez GC w trakcie działania
+            self.tasks.add(task)
+            task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in timer task: {task.exception()}")
+
+    def get_stats(self) -> dict:
+        return {'scheduled': len(self.handles), 'running': len(self.tasks), 'fired': self.fired}
@@ -0,0 +1,77 @@
+import os
+import time
+from typing import Optional, Tuple
+
+DEFAULT_FADE_MS = 300  # pojedyncza zmiana (włączenie, scena, wolny ruch pokrętła)
+MIN_INTERVAL = float(os.getenv('TRANSITION_MIN_INTERVAL_MS', 100)) / 1000
+MAX_INTERVAL = float(os.getenv('TRANSITION_MAX_INTERVAL_MS', 200)) / 1000
+IDLE_RESET = 1.0  # po takiej przerwie ruch pokrętła liczymy od nowa
+RATE_SMOOTHING = 0.3
+
+
+class TransitionPlanner:
+    """Dobiera odstęp i czas przejścia zapisów koloru do tempa, w jakim przychodzą zmiany pokoju.
+
+    Przy szybkim kręceniu pokrętłem (zmiany częściej niż co MAX_INTERVAL) zapisy wychodzą co 100-200 ms
+    z colorFadeMs równym temu odstępowi - sterownik sam płynnie przechodzi między kolejnymi kolorami, a
+    odłożony zapis wysyła najnowszy kolor pokoju, więc wartości pośrednie przepadają. Wolne zmiany idą
+    od razu ze zwykłym przejściem. Akcje dyskretne (włączenie, wyłączenie, scena) wołają reset() i idą
+    od razu, bez czekania na slot.
+    """
+
+    def __init__(self):
+        self.interval: Optional[float] = None  # średni odstęp między zmianami [s]
+        self.last_arrival: Optional[float] = None
+        self.next_send = 0.0
+        self.arrivals = 0
+        self.immediate = 0
+        self.paced = 0  # zapisy odłożone do slotu
+        self.merged = 0  # zmiany dołączone do odłożonego już zapisu
+        self.discarded = 0  # odłożone zapisy anulowane przez akcję dyskretną
+
+    def on_update(self, now: Optional[float] = None) -> None:
+        """Nowa wartość dla pokoju (po filtrze ADC) - aktualizuje tempo zmian"""
+        now = time.monotonic() if now is None else now
+        self.arrivals += 1
+        if self.last_arrival is not None:
+            gap = now - self.last_arrival
+            if gap > IDLE_RESET:
+                self.interval = None
+            elif self.interval is None:
+                self.interval = gap
+            else:
+                self.interval += RATE_SMOOTHING * (gap - self.interval)
+        self.last_arrival = now
+
+    def plan(self, now: Optional[float] = None) -> Tuple[float, int]:
+        """Zwraca (ile poczekać przed zapisem [s], colorFadeMs) dla bieżącej zmiany"""
+        now = time.monotonic() if now is None else now
+        if self.interval is None or self.interval >= MAX_INTERVAL:
+            self.immediate += 1
+            # Jeśli to początek szybkiego ruchu, następny zapis i tak poczeka co najmniej MIN_INTERVAL
+            self.next_send = now + MIN_INTERVAL
+            return 0.0, DEFAULT_FADE_MS
+        send_interval = min(max(self.interval, MIN_INTERVAL), MAX_INTERVAL)
+        delay = max(self.next_send - now, 0.0)
+        self.next_send = now + delay + send_interval
+        if delay > 0:
+            self.paced += 1
+        else:
+            self.immediate += 1
+        return delay, int(send_interval * 1000)
+
+    def reset(self) -> None:
+        """Akcja dyskretna - następny zapis bez czekania, tempo liczymy od nowa"""
+        self.next_send = 0.0
+        self.interval = None
+        self.last_arrival = None
+
+    def get_stats(self) -> dict:
+        return {
+            'arrivals': self.arrivals,
+            'immediate': self.immediate,
+            'paced': self.paced,
+            'merged': self.merged,
+            'discarded': self.discarded,
+            'interval_ms': self.interval * 1000 if self.interval is not None else None,
+        }
@@ -1,7 +1,7 @@
 import gc
 
 from machine import Pin, ADC
-from time import sleep
+from time import sleep, ticks_ms, ticks_diff
 import urequests
 # import json
 import network
@@ -31,13 +31,18 @@ def notify_detected():
 led = Pin(2, Pin.OUT)
 sen = Pin(5, Pin.IN)
 prev = 0
+last_notify = 0
+NOTIFY_INTERVAL_MS = 5000  # przy ciągłym ruchu przypominamy się co tyle - serwer i tak przedłuża czas świecenia
 connect_network()
 while True:
     try:
         gc.collect()
         val = int(sen.value())
-        if val:
+        if val and (not prev or ticks_diff(ticks_ms(), last_notify) >= NOTIFY_INTERVAL_MS):
             notify_detected()
+            last_notify = ticks_ms()
+        prev = val
+        sleep(0.05)
         # if val != prev:
         #     if val:
         #         print('ruch')